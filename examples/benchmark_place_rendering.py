@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""
+Measure the size of Places tool results before and after compact rendering.
+
+"Before" is what a ToolMessage contained when the search tools returned the
+raw ``List[places_v1.Place]``: the protobufs' text-format ``str()``. "After"
+is the table produced by ``render_places``. Tokens are counted with
+``count_tokens`` (the gpt-4o / gpt-4.1 ``o200k_base`` encoding when available).
+
+Time is reported separately for ``to_records`` (protobuf to records) and
+``render_places`` (records to table). Together they take several times as
+long as a raw ``str()`` (roughly 4x, a few tenths of a millisecond for 20
+places): the compact path buys tokens, not CPU, and that cost is small next
+to a model call.
+
+Usage:
+    PYTHONPATH=. python examples/benchmark_place_rendering.py --places 20
+"""
+
+import argparse
+import time
+
+from google.maps import places_v1
+
+from src.agent.place_records import render_places, to_records
+from src.agent.utils import count_tokens
+
+
+def make_places(count: int) -> list[places_v1.Place]:
+    """Build places shaped like a real text search response."""
+    return [
+        places_v1.Place(
+            id=f"ChIJ{i:04d}r5Nq6KNMpBIRyBxLmVY73GQ",
+            display_name={"text": f"Restaurante Casa Example {i}", "language_code": "es"},
+            formatted_address=f"Carrer de Example, {i}, Ciutat Vella, 08002 Barcelona, Spain",
+            location={"latitude": 41.3825 + i / 1000, "longitude": 2.1769 - i / 1000},
+            google_maps_uri=f"https://maps.google.com/?cid={1234567890123456789 + i}",
+        )
+        for i in range(count)
+    ]
+
+
+def timed(fn, repeat: int = 200) -> tuple[str, float]:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = fn()
+    return result, (time.perf_counter() - start) * 1000 / repeat
+
+
+def main(count: int) -> None:
+    places = make_places(count)
+    records = to_records(places)
+
+    before, before_ms = timed(lambda: str(places))
+    _, convert_ms = timed(lambda: to_records(places))
+    after, render_ms = timed(lambda: render_places(records))
+
+    print(f"{'raw protobuf':<13} bytes={len(before.encode()):<7} tokens={count_tokens(before):<6} "
+          f"str={before_ms:.3f}ms")
+    print(f"{'compact':<13} bytes={len(after.encode()):<7} tokens={count_tokens(after):<6} "
+          f"to_records={convert_ms:.3f}ms render={render_ms:.3f}ms total={convert_ms + render_ms:.3f}ms")
+    print(f"reduction     bytes={1 - len(after.encode()) / len(before.encode()):.0%} "
+          f"tokens={1 - count_tokens(after) / count_tokens(before):.0%} "
+          f"time={(convert_ms + render_ms) / before_ms:.1f}x slower")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--places", type=int, default=20, help="places per tool result")
+    args = parser.parse_args()
+    main(args.places)
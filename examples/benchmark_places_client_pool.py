@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+"""
+Benchmark Places text search latency with and without the client pool.
+
+Starts a local fake Places gRPC server (TLS with a throwaway self-signed
+certificate, so the per-client handshake cost is real) and times
+``search_text`` calls made either through a fresh client per call, which is
+what ``_text_search_places`` used to do, or through ``PlacesClientPool``.
+
+Needs the ``bench`` extra for the certificate (``pip install -e ".[bench]"``).
+
+Usage:
+    PYTHONPATH=. python examples/benchmark_places_client_pool.py --calls 200 --concurrency 8
+"""
+
+import argparse
+import asyncio
+import datetime
+import statistics
+import time
+
+import grpc
+from cryptography import x509
+from cryptography.hazmat.primitives import hashes, serialization
+from cryptography.hazmat.primitives.asymmetric import ec
+from cryptography.x509.oid import NameOID
+from google.maps import places_v1
+from google.maps.places_v1.services.places.transports.grpc_asyncio import (
+    PlacesGrpcAsyncIOTransport,
+)
+
+from src.agent.places_client_pool import PlacesClientPool
+
+
+def make_self_signed_cert() -> tuple[bytes, bytes]:
+    """Return a (certificate, private key) PEM pair for ``localhost``."""
+    key = ec.generate_private_key(ec.SECP256R1())
+    name = x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, "localhost")])
+    now = datetime.datetime.now(datetime.timezone.utc)
+    cert = (
+        x509.CertificateBuilder()
+        .subject_name(name)
+        .issuer_name(name)
+        .public_key(key.public_key())
+        .serial_number(x509.random_serial_number())
+        .not_valid_before(now - datetime.timedelta(minutes=1))
+        .not_valid_after(now + datetime.timedelta(hours=1))
+        .add_extension(x509.SubjectAlternativeName([x509.DNSName("localhost")]), critical=False)
+        .sign(key, hashes.SHA256())
+    )
+    key_pem = key.private_bytes(
+        serialization.Encoding.PEM,
+        serialization.PrivateFormat.PKCS8,
+        serialization.NoEncryption(),
+    )
+    return cert.public_bytes(serialization.Encoding.PEM), key_pem
+
+
+async def start_fake_places_server(cert_pem: bytes, key_pem: bytes, latency_ms: float) -> tuple[grpc.aio.Server, int]:
+    """Start a fake ``google.maps.places.v1.Places`` service on a free port."""
+    response = places_v1.SearchTextResponse(
+        places=[
+            places_v1.Place(
+                id=f"fake-place-{i}",
+                display_name={"text": f"Fake Place {i}"},
+                formatted_address=f"{i} Fake Street",
+                location={"latitude": 41.38 + i / 1000, "longitude": 2.17},
+                google_maps_uri=f"https://maps.google.com/?cid={i}",
+            )
+            for i in range(10)
+        ]
+    )
+
+    async def search_text(request, context):
+        if latency_ms:
+            await asyncio.sleep(latency_ms / 1000)
+        return response
+
+    handler = grpc.method_handlers_generic_handler(
+        "google.maps.places.v1.Places",
+        {
+            "SearchText": grpc.unary_unary_rpc_method_handler(
+                search_text,
+                request_deserializer=places_v1.SearchTextRequest.deserialize,
+                response_serializer=places_v1.SearchTextResponse.serialize,
+            )
+        },
+    )
+    server = grpc.aio.server()
+    server.add_generic_rpc_handlers((handler,))
+    port = server.add_secure_port(
+        "localhost:0", grpc.ssl_server_credentials([(key_pem, cert_pem)])
+    )
+    await server.start()
+    return server, port
+
+
+def make_client_factory(port: int, cert_pem: bytes):
+    """Return a factory for clients pointed at the fake server."""
+    credentials = grpc.ssl_channel_credentials(root_certificates=cert_pem)
+
+    def factory() -> places_v1.PlacesAsyncClient:
+        channel = grpc.aio.secure_channel(
+            f"localhost:{port}",
+            credentials,
+            options=[("grpc.use_local_subchannel_pool", 1)],
+        )
+        return places_v1.PlacesAsyncClient(
+            transport=PlacesGrpcAsyncIOTransport(channel=channel)
+        )
+
+    return factory
+
+
+async def run_calls(call, calls: int, concurrency: int) -> list[float]:
+    """Run ``calls`` invocations of ``call`` and return per-call latencies in ms."""
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies: list[float] = []
+
+    async def one() -> None:
+        async with semaphore:
+            start = time.perf_counter()
+            await call()
+            latencies.append((time.perf_counter() - start) * 1000)
+
+    await asyncio.gather(*(one() for _ in range(calls)))
+    return latencies
+
+
+def report(label: str, latencies: list[float]) -> None:
+    ordered = sorted(latencies)
+    p95 = ordered[int(len(ordered) * 0.95) - 1]
+    print(
+        f"{label:<12} calls={len(ordered):<5} mean={statistics.mean(ordered):7.2f}ms "
+        f"p50={statistics.median(ordered):7.2f}ms p95={p95:7.2f}ms"
+    )
+
+
+async def main(calls: int, concurrency: int, channels: int, latency_ms: float) -> None:
+    cert_pem, key_pem = make_self_signed_cert()
+    server, port = await start_fake_places_server(cert_pem, key_pem, latency_ms)
+    factory = make_client_factory(port, cert_pem)
+    request = places_v1.SearchTextRequest(text_query="restaurants in Barcelona", min_rating=4.0)
+    metadata = [("x-goog-fieldmask", "places.id,places.displayName")]
+
+    async def unpooled_call() -> None:
+        client = factory()
+        try:
+            await client.search_text(request=request, metadata=metadata)
+        finally:
+            await client.transport.close()
+
+    pool = PlacesClientPool(size=channels, client_factory=factory)
+
+    async def pooled_call() -> None:
+        await pool.get_client().search_text(request=request, metadata=metadata)
+
+    try:
+        await pool.warm()
+        report("unpooled", await run_calls(unpooled_call, calls, concurrency))
+        report("pooled", await run_calls(pooled_call, calls, concurrency))
+    finally:
+        await pool.aclose()
+        await server.stop(None)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calls", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--channels", type=int, default=2, help="pooled channels per event loop")
+    parser.add_argument("--server-latency-ms", type=float, default=0.0)
+    args = parser.parse_args()
+    asyncio.run(main(args.calls, args.concurrency, args.channels, args.server_latency_ms))
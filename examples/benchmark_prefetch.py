@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+Measure time-to-first-itinerary of the trip planner with and without prefetch.
+
+The planner graph is built as in production, with a stand-in model and stand-in
+search tools that only sleep for configurable latencies. Without prefetch,
+the model first spends a round-trip asking for hotels, attractions,
+restaurants and the weather, then plans. With prefetch those searches run
+before the first model call, so the first call already writes the itinerary.
+The clock stops at the first streamed message containing an ``itinerary``
+block.
+
+Usage:
+    PYTHONPATH=. python examples/benchmark_prefetch.py --model-latency 1.5 --tool-latency 0.6
+"""
+
+import argparse
+import asyncio
+import time
+from unittest.mock import patch
+
+from langchain_core.language_models.fake_chat_models import GenericFakeChatModel
+from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+from langchain_core.tools import StructuredTool
+
+from src.agent.context_window import ITINERARY_MARKER
+from src.agent.graph import _build_graph
+from src.agent.prefetch import PREFETCH_TOOLS
+
+REQUEST = "5 days in Tokyo in April"
+
+
+class PlannerModel(GenericFakeChatModel):
+    """Asks for the obvious searches unless it already has their results, then plans."""
+
+    latency: float = 1.0
+
+    def bind_tools(self, tools, **kwargs):
+        return self
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs):
+        await asyncio.sleep(self.latency)
+        if any(isinstance(m, ToolMessage) for m in messages):
+            message = AIMessage(f"Here is your trip\n{ITINERARY_MARKER}\n{{}}\n```")
+        else:
+            message = AIMessage("", tool_calls=[
+                {"name": name, "args": {"location": "Tokyo"}, "id": f"call_{name}"} for name in PREFETCH_TOOLS
+            ])
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+
+def make_tools(latency: float) -> list[StructuredTool]:
+    def make(name: str) -> StructuredTool:
+        async def search(location: str, date: str = None) -> str:
+            await asyncio.sleep(latency)
+            return f"{name} results for {location}"
+
+        return StructuredTool.from_function(coroutine=search, name=name, description=f"Stand-in for {name}.")
+
+    return [make(name) for name in PREFETCH_TOOLS]
+
+
+async def time_to_first_itinerary(prefetch: bool, model_latency: float, tool_latency: float) -> float:
+    with patch("src.agent.graph.get_tools", return_value=make_tools(tool_latency)), \
+            patch("src.agent.graph.load_chat_model", return_value=PlannerModel(messages=iter([]), latency=model_latency)):
+        graph = _build_graph("openai/gpt-4o-mini", list(PREFETCH_TOOLS), "Plan trips.", "trip_planner", prefetch=prefetch)
+
+    start = time.perf_counter()
+    async for update in graph.astream({"messages": [HumanMessage(REQUEST)]}, stream_mode="updates"):
+        for node_update in update.values():
+            for message in (node_update or {}).get("messages", []):
+                if isinstance(message, AIMessage) and ITINERARY_MARKER in message.text:
+                    return time.perf_counter() - start
+    raise RuntimeError("No itinerary produced")
+
+
+async def main(model_latency: float, tool_latency: float, runs: int) -> None:
+    for prefetch in (False, True):
+        samples = [await time_to_first_itinerary(prefetch, model_latency, tool_latency) for _ in range(runs)]
+        print(f"prefetch={str(prefetch):5}  time-to-first-itinerary mean={sum(samples) / runs:.2f}s")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model-latency", type=float, default=1.5, help="Seconds per model call")
+    parser.add_argument("--tool-latency", type=float, default=0.6, help="Seconds per search")
+    parser.add_argument("--runs", type=int, default=3)
+    args = parser.parse_args()
+    asyncio.run(main(args.model_latency, args.tool_latency, args.runs))
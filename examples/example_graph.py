@@ -7,12 +7,13 @@ from langgraph.checkpoint.memory import MemorySaver
 from typing_extensions import TypedDict
 
 import os
-import json
 from langchain.chat_models import init_chat_model
 
 from langchain_core.tools import tool
 from langgraph.types import interrupt, Command
 
+from src.agent.tool_node import ConcurrentToolNode
+
 @tool
 def human_assistance(query: str) -> str:
     """
@@ -41,32 +42,8 @@ llm_with_tools = llm.bind_tools(tools)
 def chatbot(state: State):
     return {"messages": [llm_with_tools.invoke(state["messages"])]}
 
-class BasicToolNode:
-    """A node that runs the tools requested in the last AIMessage."""
-
-    def __init__(self, tools: list) -> None:
-        self.tools_by_name = {tool.name: tool for tool in tools}
-
-    def __call__(self, inputs: dict):
-        if messages := inputs.get("messages", []):
-            message = messages[-1]
-        else:
-            raise ValueError("No message found in input")
-        outputs = []
-        for tool_call in message.tool_calls:
-            tool_result = self.tools_by_name[tool_call["name"]].invoke(
-                tool_call["args"]
-            )
-            outputs.append(
-                ToolMessage(
-                    content=json.dumps(tool_result),
-                    name=tool_call["name"],
-                    tool_call_id=tool_call["id"],
-                )
-            )
-        return {"messages": outputs}
-
-tool_node = BasicToolNode(tools)
+# Tool calls from one message run concurrently; one failing tool doesn't lose the others' results
+tool_node = ConcurrentToolNode(tools)
 
 def route_tools(state: State):
     """
@@ -4,15 +4,14 @@ from langgraph.graph import START, END, StateGraph, MessagesState
 from langgraph.graph.message import add_messages
 from typing_extensions import TypedDict
 
-import json
 from langchain.chat_models import init_chat_model
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.messages import SystemMessage
 
-from langchain_core.messages import ToolMessage
 from langchain_core.tools import tool
 from langgraph.types import interrupt
 
+from src.agent.tool_node import ConcurrentToolNode
 from src.agent.tools import search_restaurants, search_hotels, search_attractions, search_flights, search_weather
 
 @tool
@@ -199,32 +198,8 @@ IMPORTANT GUIDELINES:
 def chatbot(state: MessagesState):
     return {"messages": [llm_with_tools.invoke(prompt.invoke(state["messages"]))]}
 
-class BasicToolNode:
-    """A node that runs the tools requested in the last AIMessage."""
-
-    def __init__(self, tools: list) -> None:
-        self.tools_by_name = {tool.name: tool for tool in tools}
-
-    def __call__(self, inputs: dict):
-        if messages := inputs.get("messages", []):
-            message = messages[-1]
-        else:
-            raise ValueError("No message found in input")
-        outputs = []
-        for tool_call in message.tool_calls:
-            tool_result = self.tools_by_name[tool_call["name"]].invoke(
-                tool_call["args"]
-            )
-            outputs.append(
-                ToolMessage(
-                    content=json.dumps(tool_result),
-                    name=tool_call["name"],
-                    tool_call_id=tool_call["id"],
-                )
-            )
-        return {"messages": outputs}
-
-tool_node = BasicToolNode(tools)
+# Tool calls from one message run concurrently; one failing tool doesn't lose the others' results
+tool_node = ConcurrentToolNode(tools)
 
 def route_tools(state: MessagesState):
     """
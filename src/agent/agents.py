@@ -1,11 +1,7 @@
-import getpass
-import os
-from typing import Any
+from typing import Any, Optional
 from venv import logger
-from langchain_openai import ChatOpenAI
 from langchain_tavily import TavilySearch
 from langgraph.prebuilt.chat_agent_executor import create_react_agent
-from typing import Any
 from src.agent.configuration import Configuration
 from src.agent.prompts import (
     RESEARCH_AGENT_PROMPT,
@@ -13,55 +9,53 @@ from src.agent.prompts import (
     LOGISTICS_AGENT_PROMPT,
     POI_AGENT_PROMPT
 )
+from src.agent.utils import load_chat_model
 from .tools import search_attractions, search_hotels, search_restaurants, search_flights
 
-def create_research_agent() -> Any:
+def create_research_agent(model: Optional[str] = None) -> Any:
     """Creates a research agent using the ReAct pattern."""
-    if not os.environ.get("TAVILY_API_KEY"):
-        os.environ["TAVILY_API_KEY"] = getpass.getpass("Tavily API key:\n")
-    
-    configuration = Configuration.from_context()
+    model = model or Configuration.from_context().model
 
     web_search = TavilySearch(max_results=5, topic="general")
     return create_react_agent(
-        model=ChatOpenAI(model=configuration.model),
+        model=load_chat_model(model),
         tools=[web_search],
         prompt=RESEARCH_AGENT_PROMPT,
         name="research_agent",
     )
 
-def create_restaurant_finder() -> Any:
+def create_restaurant_finder(model: Optional[str] = None) -> Any:
     """Creates a restaurant finder agent using the ReAct pattern."""
-    configuration = Configuration.from_context()
+    model = model or Configuration.from_context().model
 
-    logger.info(f"Restaurant Finder Configuration: {configuration.model}")
+    logger.info(f"Restaurant Finder Configuration: {model}")
 
     return create_react_agent(
-        model=ChatOpenAI(model=configuration.model),
+        model=load_chat_model(model),
         tools=[search_restaurants],
         prompt=RESTAURANT_FINDER_PROMPT,
         name="restaurant_finder",
     )
 
-def create_logistics_agent() -> Any:
+def create_logistics_agent(model: Optional[str] = None) -> Any:
     """Creates a logistics agent using the ReAct pattern."""
-    configuration = Configuration.from_context()
+    model = model or Configuration.from_context().model
 
-    logger.info(f"Logistics Configuration: {configuration.model}")
+    logger.info(f"Logistics Configuration: {model}")
 
     return create_react_agent(
-        model=ChatOpenAI(model=configuration.model),
+        model=load_chat_model(model),
         tools=[search_hotels, search_flights],
         prompt=LOGISTICS_AGENT_PROMPT,
         name="logistics_agent",
     )
 
-def create_poi_agent() -> Any:
+def create_poi_agent(model: Optional[str] = None) -> Any:
     """Creates a POI agent using the ReAct pattern."""
-    configuration = Configuration.from_context()
+    model = model or Configuration.from_context().model
 
     return create_react_agent(
-        model=ChatOpenAI(model=configuration.model),
+        model=load_chat_model(model),
         tools=[search_attractions],
         prompt=POI_AGENT_PROMPT,
         name="poi_agent",
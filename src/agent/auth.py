@@ -1,17 +1,55 @@
+import hashlib
 import os
+import threading
+from collections import OrderedDict
+from typing import Optional, Tuple
 from venv import logger
 import jwt
 import time
 from langgraph_sdk import Auth
 
+from src.agent.metrics import get_counters
+
 supabase_jwt_auth = Auth()
 
+ALGORITHM = "HS256"
+DEFAULT_TOKEN_CACHE_SIZE = 10_000
+# Rejected tokens are remembered briefly so a client polling with a bad token can't make us re-verify it in a loop
+DEFAULT_NEGATIVE_TTL = 30
+
+_jwt_secret: Optional[str] = None
+_token_cache: "OrderedDict[bytes, Tuple[Optional[str], float]]" = OrderedDict()
+_token_cache_lock = threading.Lock()
+_token_cache_size = int(os.getenv("AUTH_TOKEN_CACHE_SIZE", DEFAULT_TOKEN_CACHE_SIZE))
+_negative_ttl = float(os.getenv("AUTH_NEGATIVE_TTL", DEFAULT_NEGATIVE_TTL))
+_auth_counters = get_counters("auth")
+
+
+def get_jwt_secret() -> Optional[str]:
+    """Return the JWT secret, read from ``SUPABASE_JWT_SECRET`` on first use.
+
+    Only a non-empty secret is kept; while the variable is unset it is read
+    again on every call.
+    """
+    global _jwt_secret
+    if not _jwt_secret:
+        _jwt_secret = os.environ.get("SUPABASE_JWT_SECRET") or None
+    return _jwt_secret
+
+
+def reload_jwt_secret() -> None:
+    """Re-read ``SUPABASE_JWT_SECRET`` and forget every cached verification, e.g. after a secret rotation."""
+    global _jwt_secret
+    with _token_cache_lock:
+        _jwt_secret = os.environ.get("SUPABASE_JWT_SECRET") or None
+        _token_cache.clear()
+
 @supabase_jwt_auth.authenticate
 async def authenticate(authorization: str) -> str:
     token = authorization.split(" ", 1)[-1] # "Bearer <token>"
     try:
         # Verify token with your auth provider
-        user_id = verify_token(token)
+        user_id = verify_token_cached(token)
         if not user_id:
             raise Auth.exceptions.HTTPException(
                 status_code=401,
@@ -43,13 +81,52 @@ async def authorize_store(ctx: Auth.types.AuthContext, value: dict):
     namespace: tuple = value["namespace"]
     assert namespace[0] == ctx.user.identity, "Not authorized"
 
+def verify_token_cached(token: str) -> Optional[str]:
+    """Return the user id of ``token``, verifying it only the first time it is seen.
+
+    Valid tokens are cached until their ``exp``; rejected tokens are cached
+    for ``AUTH_NEGATIVE_TTL`` seconds.
+    """
+    digest = hashlib.sha256(token.encode("utf-8")).digest()
+    now = time.time()
+    with _token_cache_lock:
+        entry = _token_cache.get(digest)
+        if entry is not None:
+            if now < entry[1]:
+                _token_cache.move_to_end(digest)
+                _auth_counters.incr("hits" if entry[0] else "negative_hits")
+                return entry[0]
+            del _token_cache[digest]
+
+    user_id, exp = _verify_token(token)
+    if exp is None:
+        # Misconfigured secret: don't remember the outcome
+        return user_id
+    expires_at = exp if user_id else now + _negative_ttl
+    with _token_cache_lock:
+        _token_cache[digest] = (user_id, expires_at)
+        while len(_token_cache) > _token_cache_size:
+            _token_cache.popitem(last=False)
+            _auth_counters.incr("evictions")
+    return user_id
+
+
 def verify_token(token: str) -> str:
-    JWT_SECRET = os.environ.get("SUPABASE_JWT_SECRET")
+    return _verify_token(token)[0]
+
+
+def _verify_token(token: str) -> Tuple[Optional[str], Optional[float]]:
+    """Verify ``token`` and return its user id and ``exp``.
+
+    Rejected tokens give ``(None, 0)``; ``(None, None)`` means the token could
+    not be checked at all.
+    """
+    _auth_counters.incr("verifications")
+    JWT_SECRET = get_jwt_secret()
     if not JWT_SECRET:
         logger.error("JWT_SECRET is not set in environment variables")
-        return None
-    
-    ALGORITHM = "HS256"
+        return None, None
+
     try:
         decoded = jwt.decode(
             token,
@@ -62,17 +139,18 @@ def verify_token(token: str) -> str:
 
         # Check if token is expired
         current_time = int(time.time())
-        if decoded.get('exp', 0) < current_time:
+        exp = decoded.get('exp', 0)
+        if exp < current_time:
             logger.error("❌ Token has expired")
-            return None
+            return None, 0
 
         # Check if user is anonymous
         if decoded.get('is_anonymous', False):
             logger.error("❌ Anonymous users are not allowed")
-            return None
+            return None, 0
 
         # Return the user ID from the decoded token
-        return decoded.get('sub') or decoded.get('email')
+        return decoded.get('sub') or decoded.get('email'), exp
     except jwt.InvalidTokenError as e:
         logger.error(f"❌ Invalid token: {str(e)}")
-        return None 
\ No newline at end of file
+        return None, 0 
\ No newline at end of file
@@ -1,7 +1,9 @@
 """Define the configurable parameters for the agent."""
 
 from typing import Annotated, Literal
+from langgraph.config import get_config
 from pydantic import Field
+from pydantic.fields import FieldInfo
 
 from src.agent.prompts import TRIP_PLANNER_WITH_TOOLS_PROMPT
 
@@ -28,8 +30,81 @@ class Configuration:
         "This prompt sets the context and behavior for the agent."
     )
 
-    selected_tools: list[Literal["search_weather", "search_flights", "search_hotels", "search_attractions", "search_restaurants"]] = Field(
-        default_factory=lambda: ["search_weather", "search_flights", "search_hotels", "search_attractions", "search_restaurants"],
+    selected_tools: list[Literal["search_weather", "search_flights", "search_hotels", "search_attractions", "search_restaurants", "search_places"]] = Field(
+        default_factory=lambda: ["search_weather", "search_flights", "search_hotels", "search_attractions", "search_restaurants", "search_places"],
         description="The list of tools to use for the agent's interactions. "
         "This list should contain the names of the tools to use."
-    )
\ No newline at end of file
+    )
+
+    places_field_mask_tier: Literal["minimal", "standard", "rich"] = Field(
+        default="standard",
+        description="The Google Places field-mask tier used by the place search tools. "
+        "'minimal' returns names and links, 'standard' adds address and coordinates, "
+        "'rich' adds rating, price level and opening hours at a higher per-request cost."
+    )
+
+    tool_field_mask_tiers: dict[str, Literal["minimal", "standard", "rich"]] = Field(
+        default_factory=dict,
+        description="Per-tool overrides of places_field_mask_tier, keyed by tool name "
+        "(e.g. {\"search_restaurants\": \"rich\"})."
+    )
+
+    context_window_tokens: int = Field(
+        default=16000,
+        description="Token budget for the conversation sent to the model on each step, excluding the system prompt. "
+        "Older tool outputs are shortened and the oldest turns dropped to fit; 0 sends the full history."
+    )
+
+    context_window_recent_turns: int = Field(
+        default=2,
+        description="Number of most recent user turns always sent to the model in full."
+    )
+
+    prefetch: bool = Field(
+        default=False,
+        description="Speculatively run the hotel, attraction, restaurant and weather searches for the destination "
+        "named in the first message before the model's first call, handing the results to the model as tool outputs."
+    )
+
+    stream_itinerary: bool = Field(
+        default=True,
+        description="Stream the planner's answer and send each itinerary day to the 'custom' stream as an "
+        "'itinerary_day' event as soon as its code block is complete."
+    )
+
+    itinerary_mode: Literal["markdown", "structured"] = Field(
+        default="markdown",
+        description="How the planner produces the travel plan. 'markdown' has the model write the document and its "
+        "itinerary blocks; 'structured' has it research only, then produces the plan with the model's structured "
+        "output and renders the markdown from the validated days."
+    )
+
+    places_per_day: int = Field(
+        default=6,
+        description="Group the located places found so far into neighbourhoods of about this many places, each in "
+        "walking order, and show them to the model before each call so every day's stops stay close together; "
+        "0 disables the grouping."
+    )
+
+    supervisor_mode: Literal["sequential", "fan_out"] = Field(
+        default="sequential",
+        description="How the supervisor assistant uses its sub-agents. 'sequential' hands off to one agent at a time; "
+        "'fan_out' sends independent tasks to several agents at once and assembles their results in a single final step."
+    )
+
+    @classmethod
+    def from_context(cls) -> "Configuration":
+        """Build a configuration from the running graph's ``configurable`` values.
+
+        Fields missing from the config, or all of them when called outside a
+        run, take their declared defaults.
+        """
+        try:
+            configurable = get_config().get("configurable", {})
+        except RuntimeError:
+            configurable = {}
+        configuration = cls()
+        for name, field in vars(cls).items():
+            if isinstance(field, FieldInfo):
+                setattr(configuration, name, configurable.get(name, field.get_default(call_default_factory=True)))
+        return configuration
@@ -0,0 +1,128 @@
+"""Token-budgeted view of a conversation for the planner model.
+
+Long planning threads keep every message, including large place tables and
+search results, and the ReAct loop would resend all of it on every step.
+``fit_messages``, run by the planner's pre-model hook, gives the model a
+window that fits a token budget without touching the stored thread: the
+most recent turns and the latest itinerary are kept verbatim, older tool
+outputs are replaced by short digests and, if that is still not enough, the
+oldest turns are dropped whole so tool calls and their results stay paired.
+The system prompt is added by the agent after the hook and is never trimmed.
+"""
+
+import logging
+from typing import List, Optional, Sequence, Set
+
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage, ToolMessage
+
+from src.agent.metrics import Counters, get_counters
+from src.agent.utils import count_tokens, get_message_text
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CONTEXT_WINDOW_TOKENS = 16_000
+DEFAULT_RECENT_TURNS = 2
+DIGEST_CHARS = 160
+
+ITINERARY_MARKER = "```itinerary"
+
+
+def message_tokens(message: BaseMessage) -> int:
+    """Estimate the tokens a message costs, including any tool call arguments."""
+    tokens = count_tokens(get_message_text(message))
+    if isinstance(message, AIMessage):
+        for call in message.tool_calls:
+            tokens += count_tokens(f"{call['name']}{call['args']}")
+    return tokens
+
+
+def digest_tool_message(message: ToolMessage, tokens: int) -> ToolMessage:
+    """Replace a tool output with its first line(s) and a note of what was omitted."""
+    text = " ".join(get_message_text(message).split())
+    if len(text) > DIGEST_CHARS:
+        text = text[: DIGEST_CHARS - 1].rstrip() + "…"
+    digest = f"{text}\n[older {message.name or 'tool'} result, {tokens} tokens, shortened to save context]"
+    return ToolMessage(content=digest, tool_call_id=message.tool_call_id, name=message.name, id=message.id)
+
+
+def _recent_start(messages: Sequence[BaseMessage], recent_turns: int) -> int:
+    # A turn starts at a human message; everything from the n-th last one on is recent
+    if recent_turns <= 0:
+        return len(messages)
+    seen = 0
+    for index in range(len(messages) - 1, -1, -1):
+        if isinstance(messages[index], HumanMessage):
+            seen += 1
+            if seen == recent_turns:
+                return index
+    return 0
+
+
+def _latest_itinerary(messages: Sequence[BaseMessage]) -> int:
+    for index in range(len(messages) - 1, -1, -1):
+        message = messages[index]
+        if isinstance(message, AIMessage) and ITINERARY_MARKER in get_message_text(message):
+            return index
+    return -1
+
+
+def fit_messages(
+    messages: Sequence[BaseMessage],
+    max_tokens: int,
+    recent_turns: int = DEFAULT_RECENT_TURNS,
+    counters: Optional[Counters] = None,
+) -> List[BaseMessage]:
+    """Return ``messages`` shrunk to roughly ``max_tokens``.
+
+    Args:
+        messages: The full conversation, oldest first.
+        max_tokens: Token budget for the returned messages.
+        recent_turns: Number of most recent human turns that are never shortened.
+        counters: Where token counts before and after are recorded.
+    """
+    counters = counters if counters is not None else get_counters("context_window")
+    sizes = [message_tokens(message) for message in messages]
+    before = total = sum(sizes)
+    counters.incr("calls")
+    counters.incr("tokens_before", before)
+    if total <= max_tokens:
+        counters.incr("tokens_after", total)
+        return list(messages)
+
+    window = list(messages)
+    recent = _recent_start(messages, recent_turns)
+    itinerary = _latest_itinerary(messages)
+
+    # Oldest tool outputs go first; most of an old place table is never looked at again
+    for index in range(recent):
+        if total <= max_tokens:
+            break
+        message = window[index]
+        if isinstance(message, ToolMessage):
+            digest = digest_tool_message(message, sizes[index])
+            digest_size = message_tokens(digest)
+            if digest_size < sizes[index]:
+                total -= sizes[index] - digest_size
+                window[index], sizes[index] = digest, digest_size
+                counters.incr("digested")
+
+    # Still too long: drop whole old turns, keeping the latest itinerary
+    dropped: Set[int] = set()
+    index = 0
+    while total > max_tokens and index < recent:
+        end = index + 1
+        while end < recent and not isinstance(window[end], HumanMessage):
+            end += 1
+        for position in range(index, end):
+            if position != itinerary:
+                dropped.add(position)
+                total -= sizes[position]
+        index = end
+    if dropped:
+        counters.incr("dropped", len(dropped))
+        window = [message for position, message in enumerate(window) if position not in dropped]
+
+    counters.incr("tokens_after", total)
+    logger.debug(f"Context window: {before} -> {total} tokens ({len(messages)} -> {len(window)} messages)")
+    return window
+
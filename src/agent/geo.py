@@ -0,0 +1,246 @@
+"""Day-sized neighbourhoods and walking order for the places found so far.
+
+Place searches return coordinates that the model would otherwise have to
+reason about itself to keep each day's stops close together. This module
+groups the located places of a thread's place registry, per location searched
+and leaving hotels out, into day-sized clusters and orders each one as a
+short route, so the model gets the geography already worked out:
+
+- a haversine distance matrix, computed with NumPy in one pass
+- k-means on the unit sphere with a deterministic farthest-point start,
+  re-splitting any cluster that is still more than a day's worth of places
+  and folding leftovers of less than half a day into their nearest cluster
+- per cluster, a nearest-neighbour route improved with 2-opt, treated as an
+  open path so a day doesn't have to end where it started
+
+All of it is vectorised, so grouping a few hundred candidates takes
+milliseconds, and each location's groups are cached until its places change,
+so turns that find no new places don't group anything again.
+"""
+
+import math
+from functools import lru_cache
+from typing import List, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+from langchain_core.messages import HumanMessage
+
+from src.agent.metrics import get_counters
+from src.agent.place_handles import place_handle
+from src.agent.place_registry import PlaceRegistry, places_by_location
+
+EARTH_RADIUS_KM = 6371.0088
+DEFAULT_PLACES_PER_DAY = 6
+
+_KMEANS_ITERATIONS = 25
+_TWO_OPT_PASSES = 8
+
+DAY_GROUPS_HEADER = (
+    "Places found so far per location, hotels left out, grouped into day-sized neighbourhoods "
+    "(ref name, in walking order, route length). Plan each day around one group so its stops stay close together:"
+)
+
+_counters = get_counters("geo")
+
+
+class DayGroup(NamedTuple):
+    """One neighbourhood: indices of its places in route order and the route's length."""
+
+    route: List[int]
+    km: float
+
+
+def haversine_matrix(lat: np.ndarray, lng: np.ndarray) -> np.ndarray:
+    """Great-circle distances in km between every pair of points given in degrees."""
+    lat, lng = np.radians(lat)[:, None], np.radians(lng)[:, None]
+    a = np.sin((lat - lat.T) / 2) ** 2 + np.cos(lat) * np.cos(lat.T) * np.sin((lng - lng.T) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+def _unit_vectors(lat: np.ndarray, lng: np.ndarray) -> np.ndarray:
+    lat, lng = np.radians(lat), np.radians(lng)
+    return np.column_stack((np.cos(lat) * np.cos(lng), np.cos(lat) * np.sin(lng), np.sin(lat)))
+
+
+def _kmeans(points: np.ndarray, k: int) -> np.ndarray:
+    """Label ``points`` (unit vectors) with ``k`` clusters; deterministic for the same input."""
+    # Farthest-point start: the place farthest from the middle, then the one farthest from every centre so far
+    first = int(np.argmin(points @ points.mean(axis=0)))
+    centers = [points[first]]
+    nearest = points @ centers[0]
+    for _ in range(1, k):
+        centers.append(points[int(np.argmin(nearest))])
+        nearest = np.maximum(nearest, points @ centers[-1])
+    centers = np.array(centers)
+
+    labels = np.full(len(points), -1)
+    for _ in range(_KMEANS_ITERATIONS):
+        new_labels = np.argmax(points @ centers.T, axis=1)
+        if np.array_equal(new_labels, labels):
+            break
+        labels = new_labels
+        for cluster in range(k):
+            members = points[labels == cluster]
+            if len(members):
+                mean = members.sum(axis=0)
+                centers[cluster] = mean / (np.linalg.norm(mean) or 1.0)
+    return labels
+
+
+def _clusters(points: np.ndarray, indices: np.ndarray, places_per_day: int) -> List[np.ndarray]:
+    k = math.ceil(len(indices) / places_per_day)
+    if k <= 1:
+        return [indices]
+    labels = _kmeans(points[indices], k)
+    groups = [indices[labels == cluster] for cluster in range(k) if np.any(labels == cluster)]
+    if len(groups) == 1:
+        # Every place at the same spot; nothing to split on
+        return groups
+    result: List[np.ndarray] = []
+    for group in groups:
+        # k-means doesn't balance sizes, so a dense centre can still hold several days of places
+        if len(group) > places_per_day * 3 // 2:
+            result.extend(_clusters(points, group, places_per_day))
+        else:
+            result.append(group)
+    return result
+
+
+def _merge_small(points: np.ndarray, clusters: List[np.ndarray], places_per_day: int) -> List[np.ndarray]:
+    """Fold clusters of less than half a day into their nearest cluster when the two still fit a day."""
+    limit = places_per_day * 3 // 2
+    clusters = sorted(clusters, key=len)
+    merged = True
+    while merged and len(clusters) > 1:
+        merged = False
+        centres = np.array([points[c].mean(axis=0) for c in clusters])
+        for i, cluster in enumerate(clusters):
+            if len(cluster) * 2 >= places_per_day:
+                break
+            similarity = centres @ centres[i]
+            similarity[i] = -np.inf
+            # Only into the nearest cluster, so an outlying place never joins a far-away day
+            target = int(np.argmax(similarity))
+            if len(clusters[target]) + len(cluster) > limit:
+                continue
+            clusters[target] = np.concatenate((clusters[target], cluster))
+            del clusters[i]
+            clusters.sort(key=len)
+            merged = True
+            break
+    return clusters
+
+
+def order_route(dist: np.ndarray) -> List[int]:
+    """Order the points of distance matrix ``dist`` as a short open path.
+
+    Nearest neighbour from the point farthest from the rest, then 2-opt. A
+    dummy point at distance 0 from every other one turns the open path into a
+    tour, so the ordinary 2-opt move applies and the path's ends are free.
+    """
+    n = len(dist)
+    if n <= 2:
+        return list(range(n))
+    start = int(np.argmax(dist.sum(axis=1)))
+    route = [start]
+    unvisited = np.ones(n, dtype=bool)
+    unvisited[start] = False
+    for _ in range(n - 1):
+        row = np.where(unvisited, dist[route[-1]], np.inf)
+        route.append(int(np.argmin(row)))
+        unvisited[route[-1]] = False
+
+    m = n + 1
+    tour_dist = np.zeros((m, m))
+    tour_dist[1:, 1:] = dist
+    tour = np.array([0, *(i + 1 for i in route)])
+    for _ in range(_TWO_OPT_PASSES):
+        improved = False
+        for i in range(1, m - 1):
+            js = np.arange(i + 1, m)
+            after = tour[(js + 1) % m]
+            delta = (tour_dist[tour[i - 1], tour[js]] + tour_dist[tour[i], after]
+                     - tour_dist[tour[i - 1], tour[i]] - tour_dist[tour[js], after])
+            best = int(np.argmin(delta))
+            if delta[best] < -1e-9:
+                j = int(js[best])
+                tour[i:j + 1] = tour[i:j + 1][::-1].copy()
+                improved = True
+        if not improved:
+            break
+    return [int(i) - 1 for i in tour[1:]]
+
+
+def _route_km(dist: np.ndarray, route: Sequence[int]) -> float:
+    return float(sum(dist[a, b] for a, b in zip(route, route[1:])))
+
+
+def group_places(lat: Sequence[float], lng: Sequence[float], places_per_day: int = DEFAULT_PLACES_PER_DAY) -> List[DayGroup]:
+    """Group points into day-sized neighbourhoods, each ordered as a route.
+
+    Neighbourhoods are ordered so that consecutive ones are close to each other.
+    """
+    lat_array, lng_array = np.asarray(lat, dtype=float), np.asarray(lng, dtype=float)
+    if not len(lat_array):
+        return []
+    dist = haversine_matrix(lat_array, lng_array)
+    points = _unit_vectors(lat_array, lng_array)
+    places_per_day = max(1, places_per_day)
+    clusters = _merge_small(points, _clusters(points, np.arange(len(lat_array)), places_per_day), places_per_day)
+
+    groups = []
+    for members in clusters:
+        route = [int(members[i]) for i in order_route(dist[np.ix_(members, members)])]
+        groups.append(DayGroup(route, _route_km(dist, route)))
+
+    centres = np.array([points[group.route].mean(axis=0) for group in groups])
+    centres /= np.linalg.norm(centres, axis=1, keepdims=True)
+    centre_lat = np.degrees(np.arcsin(np.clip(centres[:, 2], -1.0, 1.0)))
+    centre_lng = np.degrees(np.arctan2(centres[:, 1], centres[:, 0]))
+    return [groups[i] for i in order_route(haversine_matrix(centre_lat, centre_lng))]
+
+
+@lru_cache(maxsize=256)
+def _render_location(location: str, places: Tuple[Tuple[str, str, float, float], ...], places_per_day: int) -> str:
+    groups = group_places([p[2] for p in places], [p[3] for p in places], places_per_day)
+    _counters.incr("groupings")
+    _counters.incr("places_grouped", len(places))
+    lines = [f"{location}:"]
+    for number, group in enumerate(groups, 1):
+        stops = " > ".join(f"{place_handle(places[i][0])} {places[i][1]}" for i in group.route)
+        lines.append(f"{number}. {stops} ({group.km:.1f} km)")
+    return "\n".join(lines)
+
+
+def render_day_groups(registry: PlaceRegistry, places_per_day: int = DEFAULT_PLACES_PER_DAY) -> Optional[str]:
+    """Describe each location's neighbourhoods for the model, or ``None`` if no location has two located places."""
+    if places_per_day <= 0:
+        return None
+    entries = registry.get("places", {})
+    sections = []
+    for location, place_ids in places_by_location(registry).items():
+        places = tuple(
+            (place_id, entries[place_id][0], entries[place_id][2], entries[place_id][3])
+            for place_id in place_ids
+            if place_id in entries and entries[place_id][2] is not None and entries[place_id][3] is not None
+        )
+        if len(places) >= 2:
+            sections.append(_render_location(location, places, places_per_day))
+    if not sections:
+        return None
+    return "\n".join([DAY_GROUPS_HEADER, *sections])
+
+
+DAY_GROUPS_MESSAGE_NAME = "day_groups"
+
+
+def day_groups_message(registry: PlaceRegistry, places_per_day: int = DEFAULT_PLACES_PER_DAY) -> Optional[HumanMessage]:
+    """The neighbourhoods as a message to append after the latest turn, or ``None`` if there are none.
+
+    It changes whenever a place is found, so it goes last: everything before it
+    stays identical between model calls and keeps hitting the provider's prompt
+    cache. It is a user message because a trailing system message breaks some
+    providers' message-order rules.
+    """
+    text = render_day_groups(registry, places_per_day)
+    return HumanMessage(text, name=DAY_GROUPS_MESSAGE_NAME) if text else None
@@ -1,16 +1,151 @@
-import os
-from typing import Optional, List
+import asyncio
+import math
+import time
+from typing import AsyncIterator, Callable, Dict, Literal, NamedTuple, Optional, List, Sequence, Tuple
 from dotenv import load_dotenv
+from google.geo.type.types import Viewport
 from google.maps import places_v1
+from google.type.latlng_pb2 import LatLng
+
+from src.agent.metrics import get_counters, get_timings
+from src.agent.places_cache import get_places_cache, make_cache_key, response_size
+from src.agent.places_client_pool import get_places_client_pool
+from src.agent.rate_limit import get_rate_limiter
+from src.agent.resilience import get_resilience
+from src.agent.singleflight import SingleFlight
 
 # Load environment variables from .env file
 load_dotenv()
 
+# Text search pagination (page_token / next_page_token) is only exposed by
+# google-maps-places releases whose protos carry those fields; older ones get
+# a single page per query.
+SUPPORTS_PAGINATION = "page_token" in places_v1.SearchTextRequest.meta.fields
+
+# Named field-mask tiers. Places bills text search by the most expensive field
+# requested, so assistants that don't need ratings or opening hours should stay
+# on "standard" (or "minimal" when only links are needed).
+FieldMaskTier = Literal["minimal", "standard", "rich"]
+DEFAULT_FIELD_MASK_TIER: FieldMaskTier = "standard"
+_MINIMAL_FIELDS = "places.id,places.displayName,places.googleMapsUri"
+_STANDARD_FIELDS = f"{_MINIMAL_FIELDS},places.formattedAddress,places.location"
+_RICH_FIELDS = f"{_STANDARD_FIELDS},places.rating,places.userRatingCount,places.priceLevel,places.currentOpeningHours"
+FIELD_MASK_TIERS: Dict[str, str] = {
+    tier: f"{fields},nextPageToken" if SUPPORTS_PAGINATION else fields
+    for tier, fields in (("minimal", _MINIMAL_FIELDS), ("standard", _STANDARD_FIELDS), ("rich", _RICH_FIELDS))
+}
+
+# Fields requested from the Places API for every text search by default
+PLACES_FIELD_MASK = FIELD_MASK_TIERS[DEFAULT_FIELD_MASK_TIER]
+
+# Result pages iter_text_search_places follows before giving up (the API serves at most 3)
+DEFAULT_MAX_PAGES = 3
+
+EARTH_RADIUS_METERS = 6_371_008.8
+
+# Upper bound on concurrent upstream searches issued by one batch
+DEFAULT_BATCH_CONCURRENCY = 4
+
+# Radius of a nearby search when none is given; about a 20 minute walk
+DEFAULT_NEARBY_RADIUS_METERS = 1500
+# Largest radius the Places API accepts for a location bias circle
+MAX_NEARBY_RADIUS_METERS = 50_000
+
+SearchAreaMode = Literal["bias", "restrict"]
+
+
+class SearchArea(NamedTuple):
+    """A circle to search around.
+
+    ``bias`` ranks places inside the circle first and can still return places
+    outside it; ``restrict`` only returns places inside it.
+    """
+
+    latitude: float
+    longitude: float
+    radius_meters: float = DEFAULT_NEARBY_RADIUS_METERS
+    mode: SearchAreaMode = "bias"
+
+    def normalized(self) -> "SearchArea":
+        """Round to about 10 m, so searches around the same spot share a cache entry."""
+        radius = min(max(round(self.radius_meters), 1), MAX_NEARBY_RADIUS_METERS)
+        return SearchArea(round(self.latitude, 4), round(self.longitude, 4), radius, self.mode)
+
+# Identical searches in flight at the same time share one upstream request
+_search_flights = SingleFlight(get_counters("places_singleflight"))
+
+def _build_search_query(location: str, category: str, subcategory: Optional[str] = None) -> str:
+    if subcategory:
+        return f"{subcategory} {category} in {location}"
+    return f"{category} in {location}"
+
+async def iter_text_search_places(
+    location: str,
+    category: str,
+    subcategory: Optional[str] = None,
+    min_rating: float = 4.0,
+    open_now: bool = False,
+    predicate: Optional[Callable[[places_v1.Place], bool]] = None,
+    max_results: Optional[int] = None,
+    max_pages: int = DEFAULT_MAX_PAGES,
+    tier: FieldMaskTier = DEFAULT_FIELD_MASK_TIER,
+    area: Optional[SearchArea] = None,
+) -> AsyncIterator[places_v1.Place]:
+    """
+    Stream places for a text search, following pagination lazily.
+    
+    The next page is only requested once every place of the current page has
+    been consumed, so stopping early (or reaching ``max_results``) never pays
+    for pages that are not needed.
+    
+    Args:
+        location: The location to search in
+        category: The main category (e.g., 'restaurants', 'hotels', 'attractions')
+        subcategory: Optional subcategory (e.g., 'italian' for restaurants, 'museum' for attractions)
+        min_rating: Minimum rating filter (default: 4.0)
+        open_now: Only return places that are currently open
+        predicate: Optional client-side filter; places it rejects are skipped
+            and do not count towards ``max_results``
+        max_results: Stop after this many places have been yielded
+        max_pages: Maximum number of result pages to request
+        tier: Field-mask tier deciding which place fields are returned
+        area: Optional circle to bias the results towards or restrict them to
+    
+    Yields:
+        Places matching the search criteria, in result order
+    """
+    search_query = _build_search_query(location, category, subcategory)
+    if area is not None:
+        area = area.normalized()
+    in_area = _in_area(area)
+    yielded = 0
+    page_token = ""
+    for _ in range(max_pages):
+        response = await _search_text_page(search_query, category, min_rating, open_now, page_token, tier, area)
+        for place in response.places:
+            if predicate is not None and not predicate(place):
+                continue
+            if in_area is not None and not in_area(place):
+                continue
+            yield place
+            yielded += 1
+            if max_results is not None and yielded >= max_results:
+                return
+        page_token = response.next_page_token if SUPPORTS_PAGINATION else ""
+        if not page_token:
+            return
+
 async def _text_search_places(
     location: str, 
     category: str, 
     subcategory: Optional[str] = None,
-    min_rating: float = 4.0
+    min_rating: float = 4.0,
+    open_now: bool = False,
+    predicate: Optional[Callable[[places_v1.Place], bool]] = None,
+    max_results: Optional[int] = None,
+    max_pages: int = 1,
+    tier: FieldMaskTier = DEFAULT_FIELD_MASK_TIER,
+    area: Optional[SearchArea] = None,
 ) -> List[places_v1.Place]:
     """
     Generic text search function for places using Google Places API.
@@ -20,71 +155,176 @@ async def _text_search_places(
         category: The main category (e.g., 'restaurants', 'hotels', 'attractions')
         subcategory: Optional subcategory (e.g., 'italian' for restaurants, 'museum' for attractions)
         min_rating: Minimum rating filter (default: 4.0)
+        open_now: Only return places that are currently open
+        predicate: Optional client-side filter applied to every place
+        max_results: Maximum number of places to return
+        max_pages: Maximum number of result pages to request (default: 1)
+        tier: Field-mask tier deciding which place fields are returned (default: 'standard')
+        area: Optional circle to bias the results towards or restrict them to
     
     Returns:
         List of places matching the search criteria
     """
-    # Build search query
-    if subcategory:
-        search_query = f"{subcategory} {category} in {location}"
-    else:
-        search_query = f"{category} in {location}"
-    
-    client = places_v1.PlacesAsyncClient(
-        client_options={"api_key": os.getenv("GPLACES_API_KEY")}
+    return [
+        place
+        async for place in iter_text_search_places(
+            location,
+            category,
+            subcategory,
+            min_rating=min_rating,
+            open_now=open_now,
+            predicate=predicate,
+            max_results=max_results,
+            max_pages=max_pages,
+            tier=tier,
+            area=area,
+        )
+    ]
+
+def _in_area(area: Optional[SearchArea]) -> Optional[Callable[[places_v1.Place], bool]]:
+    # The API only restricts to rectangles, so drop the corners of the circle's bounding box;
+    # places without coordinates (minimal tier) can't be checked and are kept
+    if area is None or area.mode != "restrict":
+        return None
+    inside = within_distance(area.latitude, area.longitude, area.radius_meters)
+    return lambda place: not places_v1.Place.pb(place).HasField("location") or inside(place)
+
+def _bounding_box(area: SearchArea) -> Viewport:
+    d_lat = math.degrees(area.radius_meters / EARTH_RADIUS_METERS)
+    d_lng = d_lat / max(math.cos(math.radians(area.latitude)), 1e-6)
+    return Viewport(
+        low=LatLng(latitude=max(area.latitude - d_lat, -90.0), longitude=max(area.longitude - d_lng, -180.0)),
+        high=LatLng(latitude=min(area.latitude + d_lat, 90.0), longitude=min(area.longitude + d_lng, 180.0)),
     )
-    
+
+def _apply_area(request: places_v1.SearchTextRequest, area: SearchArea) -> None:
+    if area.mode == "restrict":
+        request.location_restriction = places_v1.SearchTextRequest.LocationRestriction(rectangle=_bounding_box(area))
+    else:
+        circle = places_v1.Circle(
+            center=LatLng(latitude=area.latitude, longitude=area.longitude), radius=area.radius_meters
+        )
+        request.location_bias = places_v1.SearchTextRequest.LocationBias(circle=circle)
+
+async def _search_text_page(
+    search_query: str,
+    category: str,
+    min_rating: float,
+    open_now: bool = False,
+    page_token: str = "",
+    tier: FieldMaskTier = DEFAULT_FIELD_MASK_TIER,
+    area: Optional[SearchArea] = None,
+) -> places_v1.SearchTextResponse:
+    """Fetch one page of text search results, through the cache."""
     # Create the search request
     request = places_v1.SearchTextRequest(
         text_query=search_query,
         min_rating=min_rating,
+        open_now=open_now,
     )
+    if page_token:
+        request.page_token = page_token
+    if area is not None:
+        _apply_area(request, area)
+    field_mask = FIELD_MASK_TIERS[tier]
 
-    # Set the field mask
-    field_mask = "places.formattedAddress,places.displayName,places.id,places.location,places.googleMapsUri"
-    
-    # Send the request
-    response = await client.search_text(request=request, metadata=[("x-goog-fieldmask", field_mask)])
-    return response.places
+    # Serve repeated searches from the cache, keyed on the normalized query and
+    # search area; concurrent misses for the same key are coalesced into a single request
+    cache_key = make_cache_key(search_query, min_rating, field_mask, open_now, page_token, *([area] if area else []))
+    return await get_places_cache().get_or_fetch(
+        cache_key,
+        category,
+        lambda: _search_flights.do(cache_key, lambda: _search_text(request, field_mask, tier)),
+    )
 
-async def text_search_restaurants(location: str, food_type: Optional[str] = None) -> List[places_v1.Place]:
+async def _search_text(
+    request: places_v1.SearchTextRequest,
+    field_mask: str,
+    tier: FieldMaskTier = DEFAULT_FIELD_MASK_TIER,
+) -> places_v1.SearchTextResponse:
+    """Send a text search request to the Places API over a pooled client.
+
+    Slow requests are hedged, transient failures retried and every request
+    waits for its turn under the Places rate limit.
+    """
+    client = get_places_client_pool().get_client()
+    limiter = get_rate_limiter("places")
+    latency = get_timings(f"places.search_text.{tier}")
+
+    async def send(timeout: float) -> places_v1.SearchTextResponse:
+        start = time.perf_counter()
+        response = await client.search_text(
+            request=request, metadata=[("x-goog-fieldmask", field_mask)], timeout=timeout
+        )
+        # Report upstream latency and response size per tier so each assistant's
+        # choice of fields can be weighed against what it costs
+        latency.observe((time.perf_counter() - start) * 1000)
+        return response
+
+    # Each attempt and each hedge waits for its own turn under the rate limit
+    response = await get_resilience("places").call(send, latency=latency, limiter=limiter)
+    tier_counters = get_counters("places_tiers")
+    tier_counters.incr(f"{tier}.requests")
+    tier_counters.incr(f"{tier}.response_bytes", response_size(response))
+    return response
+
+async def text_search_restaurants(
+    location: str,
+    food_type: Optional[str] = None,
+    tier: FieldMaskTier = DEFAULT_FIELD_MASK_TIER,
+    area: Optional[SearchArea] = None,
+) -> List[places_v1.Place]:
     """
     Search for restaurants in a specific location.
     
     Args:
         location: The location to search in
         food_type: Optional food type/cuisine (e.g., 'italian', 'chinese')
+        tier: Field-mask tier deciding which place fields are returned
+        area: Optional circle to bias the results towards or restrict them to
     
     Returns:
         List of restaurant places
     """
-    return await _text_search_places(location, "restaurants", food_type)
+    return await _text_search_places(location, "restaurants", food_type, tier=tier, area=area)
 
-async def text_search_hotels(location: str, hotel_type: Optional[str] = None) -> List[places_v1.Place]:
+async def text_search_hotels(
+    location: str,
+    hotel_type: Optional[str] = None,
+    tier: FieldMaskTier = DEFAULT_FIELD_MASK_TIER,
+) -> List[places_v1.Place]:
     """
     Search for hotels in a specific location.
     
     Args:
         location: The location to search in
         hotel_type: Optional hotel type (e.g., 'luxury', 'budget', 'boutique')
+        tier: Field-mask tier deciding which place fields are returned
     
     Returns:
         List of hotel places
     """
-    return await _text_search_places(location, "hotels", hotel_type)
+    return await _text_search_places(location, "hotels", hotel_type, tier=tier)
 
-async def text_search_attractions(location: str, attraction_type: Optional[str] = None) -> List[places_v1.Place]:
+async def text_search_attractions(
+    location: str,
+    attraction_type: Optional[str] = None,
+    tier: FieldMaskTier = DEFAULT_FIELD_MASK_TIER,
+    area: Optional[SearchArea] = None,
+) -> List[places_v1.Place]:
     """
     Search for attractions/points of interest in a specific location.
     
     Args:
         location: The location to search in
         attraction_type: Optional attraction type (e.g., 'museum', 'amusement park', 'landmark')
+        tier: Field-mask tier deciding which place fields are returned
+        area: Optional circle to bias the results towards or restrict them to
     
     Returns:
         List of attraction places
     """
-    return await _text_search_places(location, "attractions", attraction_type)
+    return await _text_search_places(location, "attractions", attraction_type, tier=tier, area=area)
 
 # Convenience functions for specific attraction types
 async def text_search_museums(location: str) -> List[places_v1.Place]:
@@ -97,4 +337,77 @@ async def text_search_landmarks(location: str) -> List[places_v1.Place]:
 
 async def text_search_amusement_parks(location: str) -> List[places_v1.Place]:
     """Search for amusement parks in a specific location."""
-    return await _text_search_places(location, "attractions", "amusement park")
\ No newline at end of file
+    return await _text_search_places(location, "attractions", "amusement park")
+
+async def text_search_places_batch(
+    location: str,
+    searches: Sequence[Tuple[str, Optional[str]]],
+    min_rating: float = 4.0,
+    max_concurrency: int = DEFAULT_BATCH_CONCURRENCY,
+    tier: FieldMaskTier = DEFAULT_FIELD_MASK_TIER,
+) -> Dict[Tuple[str, Optional[str]], List[places_v1.Place]]:
+    """
+    Run several category searches for one location concurrently.
+    
+    Args:
+        location: The location to search in
+        searches: (category, subcategory) pairs, e.g. [('hotels', None), ('restaurants', 'italian')]
+        min_rating: Minimum rating filter (default: 4.0)
+        max_concurrency: Maximum number of searches in flight at once
+        tier: Field-mask tier deciding which place fields are returned
+    
+    Returns:
+        Places grouped by (category, subcategory) in request order. A place
+        returned by more than one search only appears in the first group.
+    """
+    # Repeated pairs would only search twice for the same places
+    unique_searches = list(dict.fromkeys(searches))
+    semaphore = asyncio.Semaphore(max(1, max_concurrency))
+
+    async def run(category: str, subcategory: Optional[str]) -> List[places_v1.Place]:
+        async with semaphore:
+            return await _text_search_places(location, category, subcategory, min_rating, tier=tier)
+
+    tasks = [asyncio.ensure_future(run(*search)) for search in unique_searches]
+    try:
+        results = await asyncio.gather(*tasks)
+    except BaseException:
+        for task in tasks:
+            task.cancel()
+        raise
+
+    grouped: Dict[Tuple[str, Optional[str]], List[places_v1.Place]] = {}
+    seen_ids = set()
+    for search, places in zip(unique_searches, results):
+        grouped[search] = []
+        for place in places:
+            if place.id:
+                if place.id in seen_ids:
+                    continue
+                seen_ids.add(place.id)
+            grouped[search].append(place)
+    return grouped
+
+# Predicates for iter_text_search_places
+def within_distance(latitude: float, longitude: float, max_meters: float) -> Callable[[places_v1.Place], bool]:
+    """Keep places within ``max_meters`` (great-circle distance) of a point."""
+    def predicate(place: places_v1.Place) -> bool:
+        location = places_v1.Place.pb(place).location
+        return haversine_meters(latitude, longitude, location.latitude, location.longitude) <= max_meters
+    return predicate
+
+def rating_at_least(min_rating: float) -> Callable[[places_v1.Place], bool]:
+    """Keep places rated at least ``min_rating`` (needs ``places.rating`` in the field mask)."""
+    return lambda place: places_v1.Place.pb(place).rating >= min_rating
+
+def is_open_now(place: places_v1.Place) -> bool:
+    """Keep places that are open now (needs ``places.currentOpeningHours`` in the field mask)."""
+    return places_v1.Place.pb(place).current_opening_hours.open_now
+
+def haversine_meters(lat1: float, lng1: float, lat2: float, lng2: float) -> float:
+    """Return the great-circle distance between two points in meters."""
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    d_phi = phi2 - phi1
+    d_lambda = math.radians(lng2 - lng1)
+    a = math.sin(d_phi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(d_lambda / 2) ** 2
+    return 2 * EARTH_RADIUS_METERS * math.asin(math.sqrt(a))
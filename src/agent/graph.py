@@ -1,11 +1,255 @@
-from langgraph.prebuilt.chat_agent_executor import create_react_agent
+import asyncio
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from typing import Annotated, Any, Callable, Dict, Hashable, Optional, Sequence, Tuple
+
+from langchain_core.messages import AIMessage, RemoveMessage, SystemMessage
+from langgraph.config import get_stream_writer
+from langgraph.graph import END, START, MessagesState, StateGraph
+from langgraph.graph.state import CompiledStateGraph
+from langgraph.prebuilt.chat_agent_executor import AgentState, create_react_agent
 
 from src.agent.configuration import Configuration
-from langchain_core.runnables import RunnableConfig
+from src.agent.context_window import DEFAULT_CONTEXT_WINDOW_TOKENS, DEFAULT_RECENT_TURNS, fit_messages
+from langchain_core.runnables import Runnable, RunnableConfig, RunnableLambda
 
+from src.agent.geo import DEFAULT_PLACES_PER_DAY, day_groups_message
+from src.agent.itinerary import TripPlan, day_to_json, render_markdown
+from src.agent.itinerary_stream import ITINERARY_DAY_EVENT, ItineraryStreamHandler
+from src.agent.metrics import get_counters
+from src.agent.place_handles import collect_places, expand_value, make_expand_handles_hook
+from src.agent.place_registry import (
+    PlaceRegistry,
+    collect_deltas,
+    merge_place_registry,
+    place_refs,
+    registry_from_state,
+    trailing_tool_messages,
+)
+from src.agent.prefetch import Prefetcher
+from src.agent.singleflight import SingleFlight
 from src.agent.tools import get_tools
-from src.agent.prompts import ITINERARY_MARKDOWN_FORMAT, TRIP_PLANNER_WITH_TOOLS_PROMPT
-from src.agent.utils import load_chat_model
+from src.agent.prompts import (
+    RESEARCH_COMPLETE_MARKER,
+    TRIP_ASSEMBLY_PROMPT,
+    TRIP_PLANNER_WITH_TOOLS_PROMPT,
+    resolve_system_prompt,
+)
+from src.agent.utils import get_message_text, load_chat_model
+
+DEFAULT_GRAPH_CACHE_SIZE = 64
+
+# Compiled graphs are immutable and hold no per-run state, so one graph can
+# serve every run of the assistants that share its configuration.
+_graph_cache: "OrderedDict[Hashable, CompiledStateGraph]" = OrderedDict()
+_graph_cache_lock = threading.Lock()
+_graph_cache_size = int(os.getenv("GRAPH_CACHE_MAX_ENTRIES", DEFAULT_GRAPH_CACHE_SIZE))
+_graph_counters = get_counters("graph_cache")
+_graph_flights = SingleFlight(get_counters("graph_singleflight"))
+
+
+def _graph_cache_key(llm: str, selected_tools: Sequence[str], system_prompt: str, name: str, *extra: Hashable) -> Tuple[Hashable, ...]:
+    prompt_hash = hashlib.sha256(system_prompt.encode("utf-8")).hexdigest()
+    return (llm, tuple(sorted(set(selected_tools))), prompt_hash, name, *extra)
+
+
+def _cached_graph(key: Hashable) -> Optional[CompiledStateGraph]:
+    with _graph_cache_lock:
+        graph = _graph_cache.get(key)
+        if graph is not None:
+            _graph_cache.move_to_end(key)
+        return graph
+
+
+def _store_graph(key: Hashable, graph: CompiledStateGraph) -> None:
+    with _graph_cache_lock:
+        _graph_cache[key] = graph
+        _graph_cache.move_to_end(key)
+        while len(_graph_cache) > _graph_cache_size:
+            _graph_cache.popitem(last=False)
+            _graph_counters.incr("evictions")
+
+
+def clear_graph_cache() -> None:
+    """Drop every cached graph, e.g. after a prompt or tool implementation changed."""
+    with _graph_cache_lock:
+        _graph_cache.clear()
+
+
+class PlannerState(AgentState):
+    """State of the planner agent: the thread plus the places found in it so far."""
+
+    places: Annotated[PlaceRegistry, merge_place_registry]
+
+
+def _make_pre_model_hook(
+    prefetcher: Optional[Prefetcher],
+    context_window_tokens: int,
+    context_window_recent_turns: int,
+    places_per_day: int = DEFAULT_PLACES_PER_DAY,
+) -> RunnableLambda:
+    """Combine speculative prefetch, the place registry, the context window and the
+    places' day groups into one pre-model hook."""
+
+    def _update(state: Dict[str, Any], prefetched: Sequence[Any]) -> Dict[str, Any]:
+        messages = state["messages"]
+        update: Dict[str, Any] = {}
+        # Register the places of the tool results the model is about to see
+        places = collect_deltas([*trailing_tool_messages(messages), *prefetched])
+        if places:
+            update["places"] = places
+        if prefetched:
+            # Stored in the thread so the model never fetches these again
+            update["messages"] = list(prefetched)
+            messages = [*messages, *prefetched]
+        if context_window_tokens > 0:
+            messages = fit_messages(messages, context_window_tokens, context_window_recent_turns)
+        # Never stored, so it always covers every place found so far; it follows the latest
+        # turn so the system prompt and history before it stay a stable cache prefix
+        day_groups = day_groups_message(merge_place_registry(registry_from_state(state), places), places_per_day)
+        update["llm_input_messages"] = [*messages, day_groups] if day_groups else list(messages)
+        return update
+
+    def pre_model_hook(state: Dict[str, Any], config: RunnableConfig) -> Dict[str, Any]:
+        prefetched = prefetcher.prefetch(state["messages"], config, state) if prefetcher else []
+        return _update(state, prefetched)
+
+    async def apre_model_hook(state: Dict[str, Any], config: RunnableConfig) -> Dict[str, Any]:
+        prefetched = await prefetcher.aprefetch(state["messages"], config, state) if prefetcher else []
+        return _update(state, prefetched)
+
+    return RunnableLambda(pre_model_hook, afunc=apre_model_hook, name="pre_model_hook")
+
+
+def _known_places(state: Dict[str, Any]) -> Dict[str, Any]:
+    return place_refs(registry_from_state(state))
+
+
+def _streaming_model(model: Runnable) -> Callable[[Dict[str, Any], Any], Runnable]:
+    """Resolve the model per call with a stream handler that knows the thread's registered places,
+    so streamed days expand the same handles as the final message."""
+
+    def resolve(state: Dict[str, Any], runtime: Any) -> Runnable:
+        return model.with_config(callbacks=[ItineraryStreamHandler(known_places=_known_places(state))])
+
+    return resolve
+
+
+class TripPlannerState(MessagesState):
+    """State of the structured-itinerary planner: the thread, its places and the last plan as data."""
+
+    places: Annotated[PlaceRegistry, merge_place_registry]
+    itinerary: Dict[str, Any]
+
+
+def _make_assemble_node(
+    llm: str,
+    name: str,
+    context_window_tokens: int,
+    context_window_recent_turns: int,
+    places_per_day: int = DEFAULT_PLACES_PER_DAY,
+) -> RunnableLambda:
+    """Turn the research in the thread into a ``TripPlan`` with the model's structured output.
+
+    The research agent's hand-off message is replaced by the plan rendered as
+    markdown, and each day is written to the ``custom`` stream as well.
+    """
+    # Built once per compiled graph; every run reuses the converted schema and the pydantic validator
+    assembler = load_chat_model(llm).with_structured_output(TripPlan)
+
+    def _input(state: Dict[str, Any]) -> list:
+        messages = state["messages"][:-1]
+        if context_window_tokens > 0:
+            messages = fit_messages(messages, context_window_tokens, context_window_recent_turns)
+        day_groups = day_groups_message(registry_from_state(state), places_per_day)
+        return [SystemMessage(TRIP_ASSEMBLY_PROMPT), *messages, *([day_groups] if day_groups else [])]
+
+    def _update(state: Dict[str, Any], plan: TripPlan) -> Dict[str, Any]:
+        # Swap the place handles the model cited for the links and ids from the research
+        places = {**_known_places(state), **collect_places(state["messages"])}
+        plan = TripPlan.model_validate(expand_value(plan.model_dump(), places))
+        writer = get_stream_writer()
+        days = [day_to_json(day) for day in plan.days]
+        for index, day in enumerate(days):
+            writer({"event": ITINERARY_DAY_EVENT, "index": index, "day": day})
+        return {
+            "messages": [RemoveMessage(id=state["messages"][-1].id), AIMessage(render_markdown(plan), name=name)],
+            "itinerary": plan.model_dump(exclude_none=True),
+        }
+
+    def assemble(state: Dict[str, Any], config: RunnableConfig) -> Dict[str, Any]:
+        return _update(state, assembler.invoke(_input(state), config))
+
+    async def aassemble(state: Dict[str, Any], config: RunnableConfig) -> Dict[str, Any]:
+        return _update(state, await assembler.ainvoke(_input(state), config))
+
+    return RunnableLambda(assemble, afunc=aassemble, name="assemble")
+
+
+def _route_research(state: Dict[str, Any]) -> str:
+    # The researcher only hands over for a travel plan; other answers go straight to the user
+    if RESEARCH_COMPLETE_MARKER in get_message_text(state["messages"][-1]):
+        return "assemble"
+    return END
+
+
+def _build_graph(
+    llm: str,
+    selected_tools: Sequence[str],
+    system_prompt: str,
+    name: str,
+    context_window_tokens: int = DEFAULT_CONTEXT_WINDOW_TOKENS,
+    context_window_recent_turns: int = DEFAULT_RECENT_TURNS,
+    prefetch: bool = False,
+    stream_itinerary: bool = True,
+    itinerary_mode: str = "markdown",
+    places_per_day: int = DEFAULT_PLACES_PER_DAY,
+) -> CompiledStateGraph:
+    tools = get_tools(selected_tools)
+    structured = itinerary_mode == "structured"
+    model = load_chat_model(llm)
+    # In structured mode the agent only researches; the plan never goes through its token stream
+    if stream_itinerary and not structured:
+        # Always stream the answer so each itinerary day reaches the client once it's written
+        model = _streaming_model(model.bind_tools(tools, stream=True))
+
+    # Register the places tools found, keep long threads within the token budget (0
+    # disables trimming), group the places into days (0 disables) and optionally run the
+    # obvious first-turn searches before the model is called
+    pre_model_hook = _make_pre_model_hook(
+        Prefetcher(tools) if prefetch else None, context_window_tokens, context_window_recent_turns, places_per_day
+    )
+
+    # Compile the builder into an executable graph
+    # You can customize this by adding interrupt points for state updates
+    agent = create_react_agent(
+        model=model,
+        tools=tools,
+        prompt=system_prompt,
+        pre_model_hook=pre_model_hook,
+        # The plan is assembled separately in structured mode; otherwise expand the place handles the model cited
+        post_model_hook=None if structured else make_expand_handles_hook(_known_places),
+        state_schema=PlannerState,
+        config_schema=Configuration,
+        name="research" if structured else name
+    )
+    if not structured:
+        return agent
+
+    # Research with the tools, then produce the plan as schema-validated structured output
+    builder = StateGraph(TripPlannerState, config_schema=Configuration)
+    builder.add_node("research", agent)
+    builder.add_node(
+        "assemble",
+        _make_assemble_node(llm, name, context_window_tokens, context_window_recent_turns, places_per_day),
+    )
+    builder.add_edge(START, "research")
+    builder.add_conditional_edges("research", _route_research, ["assemble", END])
+    builder.add_edge("assemble", END)
+    return builder.compile(name=name)
+
 
 async def create_trip_planner_graph(config: RunnableConfig):
 
@@ -14,24 +258,42 @@ async def create_trip_planner_graph(config: RunnableConfig):
 
     # get values from configuration
     llm = configurable.get("model", "openai/gpt-4o-mini")
-    selected_tools = configurable.get("selected_tools", ["search_weather", "search_flights", "search_hotels", "search_attractions", "search_restaurants"])
+    selected_tools = configurable.get("selected_tools", ["search_weather", "search_flights", "search_hotels", "search_attractions", "search_restaurants", "search_places"])
     system_prompt = configurable.get("system_prompt", TRIP_PLANNER_WITH_TOOLS_PROMPT)
 
-    # if prompt contains ***itinerary_markdown_format***, replace it with ITINERARY_MARKDOWN_FORMAT
-    if "***itinerary_markdown_format***" in system_prompt:
-        system_prompt = system_prompt.replace("***itinerary_markdown_format***", ITINERARY_MARKDOWN_FORMAT)
-    
+    # The default prompt is compiled for the selected tools; custom prompts get their placeholders expanded
+    itinerary_mode = configurable.get("itinerary_mode", "markdown")
+    system_prompt = resolve_system_prompt(system_prompt, tuple(selected_tools), itinerary_mode)
+
     # specify the name for use in supervisor architecture
     name = configurable.get("name", "trip_planner")
 
-    # Compile the builder into an executable graph
-    # You can customize this by adding interrupt points for state updates
-    graph = create_react_agent(
-        model=load_chat_model(llm), 
-        tools=get_tools(selected_tools),
-        prompt=system_prompt, 
-        config_schema=Configuration,
-        name=name
+    context_window_tokens = configurable.get("context_window_tokens", DEFAULT_CONTEXT_WINDOW_TOKENS)
+    context_window_recent_turns = configurable.get("context_window_recent_turns", DEFAULT_RECENT_TURNS)
+    prefetch = configurable.get("prefetch", False)
+    stream_itinerary = configurable.get("stream_itinerary", True)
+    places_per_day = configurable.get("places_per_day", DEFAULT_PLACES_PER_DAY)
+
+    key = _graph_cache_key(
+        llm, selected_tools, system_prompt, name, context_window_tokens, context_window_recent_turns, prefetch,
+        stream_itinerary, itinerary_mode, places_per_day,
     )
+    graph = _cached_graph(key)
+    if graph is not None:
+        _graph_counters.incr("hits")
+        return graph
+    _graph_counters.incr("misses")
+
+    async def build() -> CompiledStateGraph:
+        # Runs that raced past the lookup above share this build
+        graph = _cached_graph(key)
+        if graph is None:
+            graph = await asyncio.to_thread(
+                _build_graph,
+                llm, selected_tools, system_prompt, name, context_window_tokens, context_window_recent_turns, prefetch,
+                stream_itinerary, itinerary_mode, places_per_day,
+            )
+            _store_graph(key, graph)
+        return graph
 
-    return graph
\ No newline at end of file
+    return await _graph_flights.do(key, build)
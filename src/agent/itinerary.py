@@ -0,0 +1,78 @@
+"""The itinerary contract as pydantic models, and its markdown rendering.
+
+Clients render each day of a plan from an ```itinerary JSON block. In
+``structured`` itinerary mode the model produces a ``TripPlan`` through its
+native structured output instead of writing those blocks by hand, and
+``render_markdown`` turns the validated plan into the same markdown document
+the prompt-driven mode produces. ``ItineraryDay`` also validates the days
+parsed from streamed markdown.
+"""
+
+import json
+from typing import Any, Dict, List, Optional
+
+from pydantic import BaseModel, Field
+
+
+class Suggestion(BaseModel):
+    """A suggested place, tip or event with an optional link."""
+
+    title: str
+    description: str
+    link: Optional[str] = Field(default=None, description="The place's handle: '@' followed by its ref, e.g. '@P4KQ7Z'")
+    website: Optional[str] = None
+
+
+class Activity(BaseModel):
+    """One activity within a part of the day."""
+
+    title: str
+    description: str
+
+
+class ItineraryItem(BaseModel):
+    """What happens during one part of the day."""
+
+    timeOfDay: str = Field(description="Morning, Afternoon or Evening")
+    iconName: Optional[str] = Field(default=None, description="Icon for this part of the day, e.g. coffee, sun, sunset")
+    activities: List[Activity] = []
+    accommodationSuggestions: List[Suggestion] = []
+    restaurantSuggestions: List[Suggestion] = []
+    pointOfInterestSuggestions: List[Suggestion] = []
+
+
+class ItineraryDay(BaseModel):
+    """One day of the plan, rendered by clients from an ```itinerary block."""
+
+    title: str = Field(description="Title of the day, e.g. 'Tokyo Day 1'")
+    date: Optional[str] = Field(default=None, description="Date of the day as YYYY-MM-DD, if known")
+    location: Optional[str] = None
+    description: Optional[str] = Field(
+        default=None, description="Summary of the day; refer to a place as `geo:@` followed by its ref"
+    )
+    itineraryItems: List[ItineraryItem] = []
+    accommodationSuggestions: List[Suggestion] = []
+    practicalTips: List[Suggestion] = []
+    specialEvents: List[Suggestion] = []
+
+
+class TripPlan(BaseModel):
+    """A complete day-by-day travel plan."""
+
+    overview: str = Field(description="Markdown overview of the trip: destination, dates, travellers and highlights")
+    days: List[ItineraryDay]
+
+
+def day_to_json(day: ItineraryDay) -> Dict[str, Any]:
+    """Return ``day`` in the shape of an ```itinerary block, without unset optional fields."""
+    return day.model_dump(exclude_none=True)
+
+
+def render_markdown(plan: TripPlan) -> str:
+    """Render ``plan`` as the markdown document clients expect from the planner."""
+    parts = ["# Trip Overview\n", plan.overview.strip(), "\n\n## Daily Itinerary\n"]
+    for day in plan.days:
+        parts.append("\n```itinerary\n")
+        parts.append(json.dumps(day_to_json(day), indent=4, ensure_ascii=False))
+        parts.append("\n```\n")
+    return "".join(parts)
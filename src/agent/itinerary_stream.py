@@ -0,0 +1,219 @@
+"""Emit itinerary days to streaming clients as soon as each one is written.
+
+The planner writes one ```itinerary JSON block per day inside a long markdown
+answer, so a client that parses the finished message waits for the last day
+before it can show the first. ``ItineraryStreamParser`` consumes the model's
+tokens and returns each day as soon as its code block closes; it keeps only
+the start of the current line outside a block and the open block itself
+(capped at ``max_block_chars``), never the whole message.
+
+``ItineraryStreamHandler`` runs the parser on the planner model's token
+callbacks and writes every validated day to the graph's ``custom`` stream:
+
+    {"event": "itinerary_day", "index": 0, "day": {...}}
+"""
+
+import json
+import threading
+from typing import Any, Dict, List, Optional
+from uuid import UUID
+
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.messages import BaseMessage
+from langchain_core.outputs import LLMResult
+from langgraph.config import get_stream_writer
+
+from src.agent.context_window import ITINERARY_MARKER
+from src.agent.itinerary import ItineraryDay
+from src.agent.metrics import get_counters
+from src.agent.place_handles import PlaceRef, collect_places, expand_value
+
+ITINERARY_DAY_EVENT = "itinerary_day"
+
+DEFAULT_MAX_BLOCK_CHARS = 32_768
+
+_FENCE = "```"
+# Outside a block only this much of a line is needed to recognise the opening fence
+_MAX_SCAN_CHARS = 80
+
+
+def validate_day(day: Any) -> Dict[str, Any]:
+    """Check ``day`` against the ``ItineraryDay`` schema and return it unchanged.
+
+    Raises:
+        ValueError: If a required field is missing or has the wrong type.
+    """
+    ItineraryDay.model_validate(day)
+    return day
+
+
+class ItineraryStreamParser:
+    """Incrementally extract itinerary days from streamed markdown.
+
+    Args:
+        max_block_chars: Blocks longer than this are dropped instead of buffered.
+        counters: Counters for parsed, invalid and oversized blocks.
+    """
+
+    def __init__(self, max_block_chars: int = DEFAULT_MAX_BLOCK_CHARS, counters=None) -> None:
+        self.max_block_chars = max_block_chars
+        self.counters = counters or get_counters("itinerary_stream")
+        self.days_emitted = 0
+        self._line: List[str] = []
+        self._line_len = 0
+        self._block: Optional[List[str]] = None
+        self._block_len = 0
+        self._oversized = False
+
+    @property
+    def in_block(self) -> bool:
+        return self._block is not None
+
+    def feed(self, text: str) -> List[Dict[str, Any]]:
+        """Consume the next piece of the stream and return the days it completed."""
+        days = []
+        start = 0
+        while start < len(text):
+            end = text.find("\n", start)
+            if end < 0:
+                self._append(text[start:])
+                break
+            self._append(text[start:end])
+            day = self._end_line()
+            if day is not None:
+                days.append(day)
+            start = end + 1
+        return days
+
+    def close(self) -> List[Dict[str, Any]]:
+        """Finish the stream; a closing fence without a trailing newline still completes its day."""
+        day = self._end_line()
+        self._block = None
+        return [day] if day is not None else []
+
+    def _append(self, text: str) -> None:
+        if self._block is not None and not self._oversized and (
+            self._block_len + self._line_len + len(text) > self.max_block_chars
+        ):
+            self._oversized = True
+            self._block.clear()
+            self._block_len = 0
+            self.counters.incr("oversized")
+        if self._block is None or self._oversized:
+            # Only a fence matters here, and the rest of a long line can't turn it into one
+            text = text[:max(0, _MAX_SCAN_CHARS - self._line_len)]
+        if not text:
+            return
+        self._line.append(text)
+        self._line_len += len(text)
+
+    def _end_line(self) -> Optional[Dict[str, Any]]:
+        line = "".join(self._line)
+        self._line, self._line_len = [], 0
+        stripped = line.strip()
+
+        if self._block is None:
+            if stripped == ITINERARY_MARKER:
+                self._block, self._block_len, self._oversized = [], 0, False
+            return None
+
+        if stripped != _FENCE:
+            if not self._oversized:
+                self._block.append(line)
+                self._block_len += len(line) + 1
+            return None
+
+        block, oversized = self._block, self._oversized
+        self._block = None
+        if oversized:
+            return None
+        try:
+            day = validate_day(json.loads("\n".join(block)))
+        except ValueError:
+            self.counters.incr("invalid")
+            return None
+        self.counters.incr("days")
+        self.days_emitted += 1
+        return day
+
+
+def _stream_writer():
+    try:
+        return get_stream_writer()
+    except RuntimeError:
+        # Called outside a graph run, nobody is listening
+        return lambda chunk: None
+
+
+class ItineraryStreamHandler(BaseCallbackHandler):
+    """Write each itinerary day to the ``custom`` stream as the model finishes it.
+
+    Parsers are kept per model run and dropped when the run ends. Models that
+    don't stream are parsed from their final message instead. Place handles in
+    a day are expanded from ``known_places`` and the tool results the model was
+    given, the same places the final message is expanded from.
+
+    Args:
+        max_block_chars: Blocks longer than this are dropped instead of buffered.
+        known_places: Places known beyond the model's input, such as the
+            thread's place registry, which also covers tables the context
+            window has shortened.
+    """
+
+    run_inline = True
+
+    def __init__(
+        self, max_block_chars: int = DEFAULT_MAX_BLOCK_CHARS, known_places: Optional[Dict[str, PlaceRef]] = None
+    ) -> None:
+        self.max_block_chars = max_block_chars
+        self.known_places = known_places or {}
+        self._parsers: Dict[UUID, ItineraryStreamParser] = {}
+        self._places: Dict[UUID, Dict[str, PlaceRef]] = {}
+        self._lock = threading.Lock()
+
+    def _parser(self, run_id: UUID) -> ItineraryStreamParser:
+        with self._lock:
+            parser = self._parsers.get(run_id)
+            if parser is None:
+                parser = self._parsers[run_id] = ItineraryStreamParser(self.max_block_chars)
+            return parser
+
+    def _emit(self, parser: ItineraryStreamParser, days: List[Dict[str, Any]], places: Dict[str, PlaceRef]) -> None:
+        if not days:
+            return
+        writer = _stream_writer()
+        first = parser.days_emitted - len(days)
+        for offset, day in enumerate(days):
+            writer({"event": ITINERARY_DAY_EVENT, "index": first + offset, "day": expand_value(day, places)})
+
+    def on_chat_model_start(
+        self, serialized: Dict[str, Any], messages: List[List[BaseMessage]], *, run_id: UUID, **kwargs: Any
+    ) -> None:
+        places = {**self.known_places, **collect_places(message for batch in messages for message in batch)}
+        if places:
+            with self._lock:
+                self._places[run_id] = places
+
+    def on_llm_new_token(self, token: str, *, run_id: UUID, **kwargs: Any) -> None:
+        if token:
+            parser = self._parser(run_id)
+            self._emit(parser, parser.feed(token), self._places.get(run_id, {}))
+
+    def on_llm_end(self, response: LLMResult, *, run_id: UUID, **kwargs: Any) -> None:
+        with self._lock:
+            parser = self._parsers.pop(run_id, None)
+            places = self._places.pop(run_id, {})
+        if parser is not None:
+            self._emit(parser, parser.close(), places)
+            return
+        # No tokens were streamed, so parse the whole answer at once
+        parser = ItineraryStreamParser(self.max_block_chars)
+        for generations in response.generations:
+            for generation in generations:
+                self._emit(parser, parser.feed(generation.text), places)
+        self._emit(parser, parser.close(), places)
+
+    def on_llm_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any) -> None:
+        with self._lock:
+            self._parsers.pop(run_id, None)
+            self._places.pop(run_id, None)
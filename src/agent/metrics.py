@@ -0,0 +1,131 @@
+"""In-process metrics shared by the agent's caches and upstream clients.
+
+Components record named counters under a namespace (``get_counters("places_cache")``)
+and latency samples under a name (``get_timings("places.search_text.standard")``);
+``snapshot()`` returns everything recorded so far, ready to be logged or
+exported by whatever scrapes the server.
+"""
+
+import math
+import threading
+import time
+from collections import defaultdict, deque
+from contextlib import contextmanager
+from typing import Any, Deque, Dict, Iterator, Optional
+
+
+class Counters:
+    """A thread-safe set of named integer counters."""
+
+    def __init__(self) -> None:
+        self._values: Dict[str, int] = defaultdict(int)
+        self._lock = threading.Lock()
+
+    def incr(self, name: str, amount: int = 1) -> None:
+        """Increment counter ``name`` by ``amount``."""
+        with self._lock:
+            self._values[name] += amount
+
+    def get(self, name: str) -> int:
+        """Return the current value of counter ``name``."""
+        with self._lock:
+            return self._values.get(name, 0)
+
+    def snapshot(self) -> Dict[str, int]:
+        """Return a copy of all counters."""
+        with self._lock:
+            return dict(self._values)
+
+    def reset(self) -> None:
+        """Reset all counters to zero."""
+        with self._lock:
+            self._values.clear()
+
+
+class Timings:
+    """Latency samples (in milliseconds) over a sliding window of recent observations.
+
+    Args:
+        max_samples: Number of most recent samples percentiles are computed over.
+    """
+
+    def __init__(self, max_samples: int = 1024) -> None:
+        self._samples: Deque[float] = deque(maxlen=max_samples)
+        self._count = 0
+        self._total = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value_ms: float) -> None:
+        """Record one sample."""
+        with self._lock:
+            self._samples.append(value_ms)
+            self._count += 1
+            self._total += value_ms
+
+    @contextmanager
+    def time(self) -> Iterator[None]:
+        """Record the wall-clock duration of the ``with`` block."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe((time.perf_counter() - start) * 1000)
+
+    @property
+    def count(self) -> int:
+        """Number of samples ever recorded."""
+        return self._count
+
+    def percentile(self, q: float) -> Optional[float]:
+        """Return the ``q``-th percentile (0-100) of the recent samples, if any."""
+        with self._lock:
+            ordered = sorted(self._samples)
+        if not ordered:
+            return None
+        index = min(len(ordered) - 1, max(0, math.ceil(q / 100 * len(ordered)) - 1))
+        return ordered[index]
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Return the sample count, mean and p50/p95/p99."""
+        with self._lock:
+            count, total = self._count, self._total
+        return {
+            "count": count,
+            "mean": total / count if count else None,
+            "p50": self.percentile(50),
+            "p95": self.percentile(95),
+            "p99": self.percentile(99),
+        }
+
+
+_counters: Dict[str, Counters] = {}
+_timings: Dict[str, Timings] = {}
+_registry_lock = threading.Lock()
+
+
+def get_counters(namespace: str) -> Counters:
+    """Return the shared counters for ``namespace``, creating them on first use."""
+    with _registry_lock:
+        counters = _counters.get(namespace)
+        if counters is None:
+            counters = _counters[namespace] = Counters()
+        return counters
+
+
+def get_timings(name: str) -> Timings:
+    """Return the shared timings for ``name``, creating them on first use."""
+    with _registry_lock:
+        timings = _timings.get(name)
+        if timings is None:
+            timings = _timings[name] = Timings()
+        return timings
+
+
+def snapshot() -> Dict[str, Dict[str, Any]]:
+    """Return a copy of every registered metric: counters by namespace and timings by name."""
+    with _registry_lock:
+        counters, timings = dict(_counters), dict(_timings)
+    return {
+        "counters": {namespace: c.snapshot() for namespace, c in counters.items()},
+        "timings": {name: t.snapshot() for name, t in timings.items()},
+    }
@@ -0,0 +1,211 @@
+"""Process-wide registry of shared chat model instances.
+
+Chat models are stateless between calls and safe to share across threads and
+runs, yet every graph and sub-agent used to construct its own, each with a
+fresh HTTP client and cold TLS connections. The registry hands out one
+instance per (provider, model, params), and every OpenAI model it builds
+talks through the same tuned connection pool; async calls get one pool per
+event loop, since an httpx async pool belongs to the loop that opened it.
+"""
+
+import asyncio
+import logging
+import os
+import threading
+import weakref
+from typing import Any, Dict, Hashable, Iterable, Optional, Tuple
+
+import httpx
+from langchain.chat_models import init_chat_model
+from langchain_core.language_models import BaseChatModel
+
+from src.agent.metrics import Counters, get_counters
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_CONNECTIONS = 100
+DEFAULT_TIMEOUT = 120.0
+OPENAI_API_BASE = "https://api.openai.com/v1"
+
+# Providers whose chat models accept caller-supplied httpx clients
+_HTTPX_PROVIDERS = {"openai", "azure_openai"}
+
+
+def _freeze(value: Any) -> Hashable:
+    if isinstance(value, dict):
+        return tuple(sorted((k, _freeze(v)) for k, v in value.items()))
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(v) for v in value)
+    return value
+
+
+def model_key(fully_specified_name: str, **params: Any) -> Tuple[Hashable, ...]:
+    """Build the registry key for a ``provider/model`` name and its parameters."""
+    provider, model = fully_specified_name.split("/", maxsplit=1)
+    return (provider, model, _freeze(params))
+
+
+class _PerLoopTransport(httpx.AsyncBaseTransport):
+    """Sends each request over a connection pool of the running event loop."""
+
+    def __init__(self, limits: httpx.Limits) -> None:
+        self._limits = limits
+        self._transports: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, httpx.AsyncHTTPTransport]" = (
+            weakref.WeakKeyDictionary()
+        )
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._transports)
+
+    def _transport(self) -> httpx.AsyncHTTPTransport:
+        loop = asyncio.get_running_loop()
+        transport = self._transports.get(loop)
+        if transport is None:
+            with self._lock:
+                transport = self._transports.get(loop)
+                if transport is None:
+                    transport = self._transports[loop] = httpx.AsyncHTTPTransport(limits=self._limits)
+        return transport
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        return await self._transport().handle_async_request(request)
+
+    async def aclose(self) -> None:
+        """Close the running loop's pool; other loops' pools go with their loop."""
+        with self._lock:
+            transport = self._transports.pop(asyncio.get_running_loop(), None)
+        if transport is not None:
+            await transport.aclose()
+
+
+class ModelRegistry:
+    """Shared chat model instances over pooled HTTP connections.
+
+    Args:
+        max_connections: Connection pool size shared by all models. Defaults to
+            ``LLM_MAX_CONNECTIONS`` or 100.
+        timeout: Per-request timeout in seconds. Defaults to ``LLM_TIMEOUT`` or 120.
+        counters: Where hit/miss counters are recorded.
+    """
+
+    def __init__(
+        self,
+        max_connections: Optional[int] = None,
+        timeout: Optional[float] = None,
+        counters: Optional[Counters] = None,
+    ) -> None:
+        if max_connections is None:
+            max_connections = int(os.getenv("LLM_MAX_CONNECTIONS", DEFAULT_MAX_CONNECTIONS))
+        if timeout is None:
+            timeout = float(os.getenv("LLM_TIMEOUT", DEFAULT_TIMEOUT))
+        self.max_connections = max_connections
+        self.timeout = timeout
+        self.counters = counters if counters is not None else get_counters("model_registry")
+        self._models: Dict[Hashable, BaseChatModel] = {}
+        self._http_client: Optional[httpx.Client] = None
+        self._http_async_client: Optional[httpx.AsyncClient] = None
+        self._lock = threading.RLock()
+
+    def __len__(self) -> int:
+        return len(self._models)
+
+    def _limits(self) -> httpx.Limits:
+        return httpx.Limits(
+            max_connections=self.max_connections,
+            max_keepalive_connections=self.max_connections,
+        )
+
+    @property
+    def http_client(self) -> httpx.Client:
+        """The connection pool shared by blocking model calls."""
+        with self._lock:
+            if self._http_client is None:
+                self._http_client = httpx.Client(timeout=self.timeout, limits=self._limits())
+            return self._http_client
+
+    @property
+    def http_async_client(self) -> httpx.AsyncClient:
+        """The client shared by async model calls, with one connection pool per event loop."""
+        with self._lock:
+            if self._http_async_client is None:
+                self._http_async_client = httpx.AsyncClient(
+                    timeout=self.timeout, transport=_PerLoopTransport(self._limits())
+                )
+            return self._http_async_client
+
+    def get(self, fully_specified_name: str, **params: Any) -> BaseChatModel:
+        """Return the shared model for a ``provider/model`` name and parameters.
+
+        Args:
+            fully_specified_name: String in the format 'provider/model'.
+            **params: Extra model parameters such as ``temperature``.
+        """
+        key = model_key(fully_specified_name, **params)
+        model = self._models.get(key)
+        if model is not None:
+            self.counters.incr("hits")
+            return model
+        with self._lock:
+            model = self._models.get(key)
+            if model is None:
+                self.counters.incr("misses")
+                model = self._models[key] = self._create(fully_specified_name, params)
+            else:
+                self.counters.incr("hits")
+        return model
+
+    def _create(self, fully_specified_name: str, params: Dict[str, Any]) -> BaseChatModel:
+        provider, model = fully_specified_name.split("/", maxsplit=1)
+        if provider in _HTTPX_PROVIDERS:
+            params = {"http_client": self.http_client, "http_async_client": self.http_async_client, **params}
+        return init_chat_model(model, model_provider=provider, **params)
+
+    async def warm(self, fully_specified_names: Iterable[str], timeout: float = 10.0) -> None:
+        """Build the given models and open connections to their APIs ahead of the first run.
+
+        Failures are logged, not raised: a cold pool only costs latency.
+        """
+        base_urls = set()
+        for name in fully_specified_names:
+            try:
+                model = self.get(name)
+            except Exception as e:
+                logger.warning(f"Could not build chat model {name!r}: {e!r}")
+                continue
+            if name.split("/", maxsplit=1)[0] in _HTTPX_PROVIDERS:
+                base_urls.add(getattr(model, "openai_api_base", None) or OPENAI_API_BASE)
+
+        async def connect(url: str) -> None:
+            try:
+                # Any answer, even 404, leaves a TLS connection in the pool
+                await self.http_async_client.head(url, timeout=timeout)
+            except Exception as e:
+                logger.warning(f"Could not warm connection to {url}: {e!r}")
+
+        await asyncio.gather(*(connect(url) for url in base_urls))
+
+    async def aclose(self) -> None:
+        """Close the shared connection pools and forget every model."""
+        with self._lock:
+            http_client, self._http_client = self._http_client, None
+            http_async_client, self._http_async_client = self._http_async_client, None
+            self._models.clear()
+        if http_async_client is not None:
+            await http_async_client.aclose()
+        if http_client is not None:
+            http_client.close()
+
+
+_default_registry: Optional[ModelRegistry] = None
+_default_registry_lock = threading.Lock()
+
+
+def get_model_registry() -> ModelRegistry:
+    """Return the process-wide model registry."""
+    global _default_registry
+    if _default_registry is None:
+        with _default_registry_lock:
+            if _default_registry is None:
+                _default_registry = ModelRegistry()
+    return _default_registry
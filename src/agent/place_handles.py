@@ -0,0 +1,161 @@
+"""Short place handles in model output, expanded into canonical links and ids.
+
+Every row of a place table carries a short ``ref`` handle derived from the
+place id, e.g. ``P4KQ7Z``. The model cites a place by its handle instead of
+copying its Google Maps URL and place id: ``@P4KQ7Z`` where a link goes and
+``geo:@P4KQ7Z`` where a geo reference goes. After generation the handles are
+expanded from the tool results in the thread, so each citation costs a few
+output tokens instead of dozens and can't be mistyped. Handles that don't
+match any tool result are left in place, logged and counted.
+"""
+
+import base64
+import hashlib
+import logging
+import re
+from typing import Any, Callable, Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+from langchain_core.messages import AIMessage, BaseMessage, ToolMessage
+from langchain_core.runnables import RunnableLambda
+
+from src.agent.metrics import get_counters
+from src.agent.utils import get_message_text
+
+logger = logging.getLogger(__name__)
+
+HANDLE_CHARS = 5
+
+_HANDLE_RE = re.compile(r"(geo:)?@(P[A-Z2-7]{%d})\b" % HANDLE_CHARS)
+
+_counters = get_counters("place_handles")
+
+
+def place_handle(place_id: str) -> str:
+    """Return the short, stable handle for ``place_id``."""
+    digest = hashlib.sha1(place_id.encode("utf-8")).digest()
+    return "P" + base64.b32encode(digest).decode("ascii")[:HANDLE_CHARS]
+
+
+class PlaceRef(NamedTuple):
+    """What a handle expands to."""
+
+    id: str
+    name: str
+    maps_uri: str
+
+
+def places_from_table(text: str) -> Dict[str, PlaceRef]:
+    """Read the handles out of one tool output holding place tables."""
+    places: Dict[str, PlaceRef] = {}
+    columns: Optional[List[str]] = None
+    for line in text.splitlines():
+        cells = line.split("|")
+        if "ref" in cells and "id" in cells:
+            columns = cells
+            continue
+        if columns is None or len(cells) != len(columns):
+            # A blank line or a group label ends the table
+            columns = None
+            continue
+        row = dict(zip(columns, cells))
+        places[row["ref"]] = PlaceRef(row["id"], row.get("name", ""), row.get("maps", ""))
+    return places
+
+
+def collect_places(messages: Iterable[BaseMessage]) -> Dict[str, PlaceRef]:
+    """Collect every handle defined by the tool results in ``messages``."""
+    places: Dict[str, PlaceRef] = {}
+    for message in messages:
+        if isinstance(message, ToolMessage):
+            places.update(places_from_table(get_message_text(message)))
+    return places
+
+
+def _geo(place: PlaceRef) -> str:
+    # The reference often sits inside a JSON string, so keep quotes and pipes out of the name
+    name = place.name.replace('"', "'").replace("|", "/")
+    return f"geo:{name}|{place.id}"
+
+
+def expand_handles(text: str, places: Dict[str, PlaceRef]) -> Tuple[str, List[str]]:
+    """Expand the handles in ``text``; return the new text and the handles that didn't resolve."""
+    unresolved: List[str] = []
+
+    def expand(match: "re.Match[str]") -> str:
+        place = places.get(match.group(2))
+        if place is None:
+            unresolved.append(match.group(2))
+            return match.group(0)
+        if match.group(1):
+            return _geo(place)
+        return place.maps_uri or match.group(0)
+
+    if "@P" not in text:
+        return text, unresolved
+    return _HANDLE_RE.sub(expand, text), unresolved
+
+
+def _expand(value: Any, places: Dict[str, PlaceRef], unresolved: List[str]) -> Any:
+    if isinstance(value, str):
+        text, missing = expand_handles(value, places)
+        unresolved.extend(missing)
+        return text
+    if isinstance(value, list):
+        return [_expand(item, places, unresolved) for item in value]
+    if isinstance(value, dict):
+        return {key: _expand(item, places, unresolved) for key, item in value.items()}
+    return value
+
+
+def _record(unresolved: List[str], expanded: bool) -> None:
+    if expanded:
+        _counters.incr("expanded")
+    if unresolved:
+        _counters.incr("unresolved", len(unresolved))
+        logger.warning(f"Unresolved place handles in model output: {sorted(set(unresolved))}")
+
+
+def expand_value(value: Any, places: Dict[str, PlaceRef]) -> Any:
+    """Expand the handles in every string of a JSON-like value."""
+    unresolved: List[str] = []
+    expanded = _expand(value, places, unresolved)
+    _record(unresolved, expanded != value)
+    return expanded
+
+
+def expand_message(message: AIMessage, places: Dict[str, PlaceRef]) -> Optional[AIMessage]:
+    """Return ``message`` with its handles expanded, or ``None`` if it cites none.
+
+    Handles that don't resolve are listed in ``additional_kwargs["unresolved_place_handles"]``.
+    """
+    unresolved: List[str] = []
+    content = _expand(message.content, places, unresolved)
+    if content == message.content and not unresolved:
+        return None
+    _record(unresolved, content != message.content)
+    update: Dict[str, Any] = {"content": content}
+    if unresolved:
+        update["additional_kwargs"] = {**message.additional_kwargs, "unresolved_place_handles": sorted(set(unresolved))}
+    return message.model_copy(update=update)
+
+
+def make_expand_handles_hook(
+    known_places: Optional[Callable[[Dict[str, Any]], Dict[str, PlaceRef]]] = None,
+) -> RunnableLambda:
+    """Post-model hook replacing the model's latest message with its handles expanded.
+
+    Args:
+        known_places: Returns places the state knows beyond the tool results in its messages.
+    """
+
+    def expand_handles_hook(state: Dict[str, Any]) -> Dict[str, Any]:
+        messages = state["messages"]
+        message = messages[-1]
+        if not isinstance(message, AIMessage):
+            return {}
+        places = {**known_places(state), **collect_places(messages)} if known_places else collect_places(messages)
+        expanded = expand_message(message, places)
+        # Same id, so the message is replaced rather than appended
+        return {"messages": [expanded]} if expanded is not None else {}
+
+    return RunnableLambda(expand_handles_hook, name="expand_place_handles")
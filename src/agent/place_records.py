@@ -0,0 +1,160 @@
+"""Compact place records and their token-efficient rendering for tool messages.
+
+Raw ``places_v1.Place`` protobufs stringify into verbose text-format dumps.
+Tools instead convert each place once into a slotted ``PlaceRecord`` holding
+only the fields the prompts use, and render a batch of records as a dense
+pipe-separated table whose columns follow the field-mask tier the places were
+fetched with.
+"""
+
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from google.maps import places_v1
+
+from src.agent.google_places_client import DEFAULT_FIELD_MASK_TIER, FieldMaskTier
+from src.agent.place_handles import place_handle
+
+# Longest rendered name/address before truncation
+DEFAULT_MAX_FIELD_CHARS = 80
+
+NO_PLACES_FOUND = "No places found."
+
+# Columns rendered for each field-mask tier; fields a tier doesn't fetch would only be empty cells
+TIER_COLUMNS: Dict[str, Tuple[str, ...]] = {
+    "minimal": ("ref", "name", "id", "maps"),
+    "standard": ("ref", "name", "id", "address", "maps", "lat,lng"),
+    "rich": ("ref", "name", "id", "address", "maps", "lat,lng", "rating", "price", "open"),
+}
+
+PLACE_TABLE_HEADER = "|".join(TIER_COLUMNS[DEFAULT_FIELD_MASK_TIER])
+
+_PRICE_LEVELS = {
+    places_v1.PriceLevel.PRICE_LEVEL_FREE: "free",
+    places_v1.PriceLevel.PRICE_LEVEL_INEXPENSIVE: "$",
+    places_v1.PriceLevel.PRICE_LEVEL_MODERATE: "$$",
+    places_v1.PriceLevel.PRICE_LEVEL_EXPENSIVE: "$$$",
+    places_v1.PriceLevel.PRICE_LEVEL_VERY_EXPENSIVE: "$$$$",
+}
+
+
+class PlaceRecord:
+    """The subset of a Place that the planner needs."""
+
+    __slots__ = ("id", "name", "address", "maps_uri", "lat", "lng", "rating", "rating_count", "price", "open_now")
+
+    def __init__(
+        self,
+        id: str,
+        name: str,
+        address: str = "",
+        maps_uri: str = "",
+        lat: Optional[float] = None,
+        lng: Optional[float] = None,
+        rating: Optional[float] = None,
+        rating_count: Optional[int] = None,
+        price: Optional[str] = None,
+        open_now: Optional[bool] = None,
+    ) -> None:
+        self.id = id
+        self.name = name
+        self.address = address
+        self.maps_uri = maps_uri
+        self.lat = lat
+        self.lng = lng
+        self.rating = rating
+        self.rating_count = rating_count
+        self.price = price
+        self.open_now = open_now
+
+    @classmethod
+    def from_place(cls, place: places_v1.Place) -> "PlaceRecord":
+        """Convert a Places API protobuf into a record."""
+        # Read the underlying protobuf directly; proto-plus attribute access
+        # wraps every nested message and dominates the conversion cost.
+        pb = places_v1.Place.pb(place)
+        has_location = pb.HasField("location")
+        has_hours = pb.HasField("current_opening_hours") and pb.current_opening_hours.HasField("open_now")
+        return cls(
+            id=pb.id,
+            name=pb.display_name.text,
+            address=pb.formatted_address,
+            maps_uri=pb.google_maps_uri,
+            lat=pb.location.latitude if has_location else None,
+            lng=pb.location.longitude if has_location else None,
+            rating=pb.rating or None,
+            rating_count=pb.user_rating_count if pb.HasField("user_rating_count") else None,
+            price=_PRICE_LEVELS.get(pb.price_level),
+            open_now=pb.current_opening_hours.open_now if has_hours else None,
+        )
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, PlaceRecord):
+            return NotImplemented
+        return all(getattr(self, f) == getattr(other, f) for f in self.__slots__)
+
+    def __repr__(self) -> str:
+        return f"PlaceRecord(id={self.id!r}, name={self.name!r})"
+
+
+def to_records(places: Iterable[places_v1.Place]) -> List[PlaceRecord]:
+    """Convert Places API protobufs into records."""
+    return [PlaceRecord.from_place(place) for place in places]
+
+
+def _text(value: str, max_chars: int) -> str:
+    # The table is pipe/newline delimited, so those characters can't appear in cells
+    value = " ".join(value.replace("|", "/").split())
+    if len(value) > max_chars:
+        value = value[: max_chars - 1].rstrip() + "…"
+    return value
+
+
+def _coords(record: PlaceRecord) -> str:
+    if record.lat is None or record.lng is None:
+        return ""
+    return f"{record.lat:.5f},{record.lng:.5f}"
+
+
+def _rating(record: PlaceRecord) -> str:
+    if record.rating is None:
+        return ""
+    if record.rating_count is None:
+        return f"{record.rating:.1f}"
+    return f"{record.rating:.1f}({record.rating_count})"
+
+
+def _open_now(record: PlaceRecord) -> str:
+    return "" if record.open_now is None else ("y" if record.open_now else "n")
+
+
+# Ids and Maps URIs are never truncated because the model's place handles expand into them
+_CELLS: Dict[str, Callable[[PlaceRecord, int], str]] = {
+    "ref": lambda record, _: place_handle(record.id),
+    "name": lambda record, max_chars: _text(record.name, max_chars),
+    "id": lambda record, _: record.id,
+    "address": lambda record, max_chars: _text(record.address, max_chars),
+    "maps": lambda record, _: record.maps_uri,
+    "lat,lng": lambda record, _: _coords(record),
+    "rating": lambda record, _: _rating(record),
+    "price": lambda record, _: record.price or "",
+    "open": lambda record, _: _open_now(record),
+}
+
+
+def render_places(
+    records: Iterable[PlaceRecord],
+    tier: FieldMaskTier = DEFAULT_FIELD_MASK_TIER,
+    max_field_chars: int = DEFAULT_MAX_FIELD_CHARS,
+) -> str:
+    """Render records as a header line followed by one pipe-separated row per place.
+
+    The columns are those fetched by ``tier``; names and addresses are capped
+    at ``max_field_chars``.
+    """
+    columns = TIER_COLUMNS[tier]
+    cells = [_CELLS[column] for column in columns]
+    rows = ["|".join(cell(record, max_field_chars) for cell in cells) for record in records]
+    if not rows:
+        return NO_PLACES_FOUND
+    return "\n".join(["|".join(columns), *rows])
+
@@ -0,0 +1,239 @@
+"""Places found in earlier turns, kept in the planner's graph state.
+
+Follow-ups like "swap the Day 2 dinner" make the model repeat searches it has
+already run and resend places it has already seen. Every place search returns
+a compact registry delta as its ``ToolMessage`` artifact, and the planner's
+pre-model hook merges those deltas into the ``places`` state channel:
+
+    {"places": {place_id: [name, maps_uri, lat, lng]},
+     "searches": {search_key: [place_id, ...]}}
+
+Place tools read the registry first. A search already in it is answered
+without calling the Places API, and places the model has seen before are
+listed by handle and name only instead of as full table rows. The registry is
+capped at ``PLACE_REGISTRY_MAX_PLACES`` places and
+``PLACE_REGISTRY_MAX_SEARCHES`` searches, dropping the oldest first, and its
+plain lists and dicts keep checkpoints small.
+"""
+
+import os
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage, ToolMessage
+
+from src.agent.google_places_client import DEFAULT_FIELD_MASK_TIER, FieldMaskTier
+from src.agent.metrics import get_counters
+from src.agent.place_handles import PlaceRef, place_handle
+from src.agent.place_records import PlaceRecord, render_places
+from src.agent.utils import get_message_text
+
+DEFAULT_MAX_PLACES = 500
+DEFAULT_MAX_SEARCHES = 100
+
+KNOWN_PLACES_HEADER = "Already found earlier (cite by ref):\nref|name"
+
+PlaceRegistry = Dict[str, Dict[str, list]]
+
+_max_places = int(os.getenv("PLACE_REGISTRY_MAX_PLACES", DEFAULT_MAX_PLACES))
+_max_searches = int(os.getenv("PLACE_REGISTRY_MAX_SEARCHES", DEFAULT_MAX_SEARCHES))
+_counters = get_counters("place_registry")
+
+
+def _normalize(value: Optional[str]) -> str:
+    return " ".join((value or "").lower().split())
+
+
+def search_key(tool_name: str, location: str, detail: Optional[str], tier: FieldMaskTier) -> str:
+    """Identify a search; differences in case and spacing don't change the key."""
+    return "|".join((tool_name, _normalize(location), _normalize(detail), tier))
+
+
+def _entry(record: PlaceRecord) -> list:
+    return [record.name, record.maps_uri, record.lat, record.lng]
+
+
+def place_delta(searches: Dict[str, Sequence[PlaceRecord]]) -> PlaceRegistry:
+    """Registry entries for the places each search returned, to merge into state."""
+    places: Dict[str, list] = {}
+    for records in searches.values():
+        for record in records:
+            places[record.id] = _entry(record)
+    return {
+        "places": places,
+        "searches": {key: [record.id for record in records] for key, records in searches.items()},
+    }
+
+
+def _capped(entries: Dict[str, Any], limit: int) -> Dict[str, Any]:
+    if len(entries) <= limit:
+        return entries
+    return dict(list(entries.items())[len(entries) - limit:])
+
+
+def merge_place_registry(left: Optional[PlaceRegistry], right: Optional[PlaceRegistry]) -> PlaceRegistry:
+    """Reducer for the ``places`` state channel: newer entries win and move to the end."""
+    left, right = left or {}, right or {}
+    places = dict(left.get("places", {}))
+    for place_id, entry in right.get("places", {}).items():
+        places.pop(place_id, None)
+        places[place_id] = entry
+    places = _capped(places, _max_places)
+
+    searches = dict(left.get("searches", {}))
+    for key, ids in right.get("searches", {}).items():
+        searches.pop(key, None)
+        searches[key] = ids
+    # A search whose places were evicted has to run again
+    searches = {key: ids for key, ids in searches.items() if all(place_id in places for place_id in ids)}
+    return {"places": places, "searches": _capped(searches, _max_searches)}
+
+
+def registry_from_state(state: Optional[Dict[str, Any]]) -> PlaceRegistry:
+    """The registry held by an injected graph state, empty outside the planner."""
+    return (state or {}).get("places") or {}
+
+
+def known_search(registry: PlaceRegistry, key: str) -> Optional[List[str]]:
+    """The place ids a previous identical search returned, or ``None`` if it hasn't run."""
+    ids = registry.get("searches", {}).get(key)
+    if ids is not None:
+        _counters.incr("searches_reused")
+    return ids
+
+
+def render_known(registry: PlaceRegistry, place_ids: Iterable[str]) -> str:
+    """List places the model has already seen by handle and name."""
+    places = registry.get("places", {})
+    rows = [f"{place_handle(place_id)}|{places[place_id][0].replace('|', '/')}" for place_id in place_ids]
+    return "\n".join([KNOWN_PLACES_HEADER, *rows])
+
+
+def render_new_and_known(
+    records: Sequence[PlaceRecord],
+    registry: PlaceRegistry,
+    tier: FieldMaskTier = DEFAULT_FIELD_MASK_TIER,
+) -> str:
+    """Render unseen places as a full table and places already in the registry by reference."""
+    places = registry.get("places", {})
+    new = [record for record in records if record.id not in places]
+    known = [record.id for record in records if record.id in places]
+    _counters.incr("places_new", len(new))
+    _counters.incr("places_known", len(known))
+    parts = []
+    if new or not known:
+        parts.append(render_places(new, tier))
+    if known:
+        parts.append(render_known(registry, known))
+    return "\n\n".join(parts)
+
+
+def place_refs(registry: PlaceRegistry) -> Dict[str, PlaceRef]:
+    """Handles of every registered place, for expanding the model's citations."""
+    return {
+        place_handle(place_id): PlaceRef(place_id, entry[0], entry[1])
+        for place_id, entry in registry.get("places", {}).items()
+    }
+
+
+def collect_deltas(messages: Sequence[BaseMessage]) -> Optional[PlaceRegistry]:
+    """Merge the registry deltas of the tool results since the model's last call."""
+    merged = None
+    for message in messages:
+        if isinstance(message, ToolMessage) and isinstance(message.artifact, dict) and "places" in message.artifact:
+            merged = merge_place_registry(merged, message.artifact)
+    return merged
+
+
+def trailing_tool_messages(messages: Sequence[BaseMessage]) -> List[BaseMessage]:
+    """The tool results at the end of the thread, i.e. those the model hasn't seen yet."""
+    start = len(messages)
+    while start > 0 and isinstance(messages[start - 1], ToolMessage):
+        start -= 1
+    return list(messages[start:])
+
+
+def place_location(registry: PlaceRegistry, ref: str) -> Optional[Tuple[float, float]]:
+    """Coordinates of the registered place with handle or id ``ref``, if known."""
+    places = registry.get("places", {})
+    entry = places.get(ref)
+    if entry is None:
+        entry = next((entry for place_id, entry in places.items() if place_handle(place_id) == ref), None)
+    if entry is None or entry[2] is None or entry[3] is None:
+        return None
+    return entry[2], entry[3]
+
+
+def _search_parts(key: str) -> Optional[Tuple[str, str, str]]:
+    """The tool, normalized location and detail of a search key, or ``None`` if it isn't one."""
+    parts = key.split("|")
+    if len(parts) < 4:
+        return None
+    return parts[0], "|".join(parts[1:-2]), parts[-2]
+
+
+def _is_lodging(tool_name: str, detail: str) -> bool:
+    return tool_name == "search_hotels" or (tool_name == "search_places" and detail.startswith("hotels"))
+
+
+def _hotel_ids(registry: PlaceRegistry, location: str) -> List[str]:
+    ids: Dict[str, None] = {}
+    for key, place_ids in registry.get("searches", {}).items():
+        parts = _search_parts(key)
+        if parts is not None and parts[1] == _normalize(location) and _is_lodging(parts[0], parts[2]):
+            ids.update(dict.fromkeys(place_ids))
+    return list(ids)
+
+
+def places_by_location(registry: PlaceRegistry) -> Dict[str, List[str]]:
+    """Ids of the registered places other than lodging, per (normalized) location searched.
+
+    A place found in several locations counts for the one searched last.
+    """
+    lodging = set()
+    locations: Dict[str, str] = {}
+    for key, place_ids in registry.get("searches", {}).items():
+        parts = _search_parts(key)
+        if parts is None:
+            continue
+        tool_name, location, detail = parts
+        if _is_lodging(tool_name, detail):
+            lodging.update(place_ids)
+            continue
+        for place_id in place_ids:
+            locations.pop(place_id, None)
+            locations[place_id] = location
+    by_location: Dict[str, List[str]] = {}
+    for place_id, location in locations.items():
+        if place_id not in lodging:
+            by_location.setdefault(location, []).append(place_id)
+    return by_location
+
+
+def chosen_hotel(state: Optional[Dict[str, Any]], location: str) -> Optional[str]:
+    """The id of the hotel the thread settled on for ``location``, if any.
+
+    That is the hotel cited or named first in the latest message mentioning
+    any hotel found for ``location``, or the only one found there.
+    """
+    registry = registry_from_state(state)
+    hotels = _hotel_ids(registry, location)
+    if len(hotels) <= 1:
+        return hotels[0] if hotels else None
+    places = registry["places"]
+    for message in reversed((state or {}).get("messages", [])):
+        if isinstance(message, AIMessage):
+            text = get_message_text(message)
+            marks = {place_id: (place_id, places[place_id][1], f"@{place_handle(place_id)}") for place_id in hotels}
+        elif isinstance(message, HumanMessage):
+            text = get_message_text(message).lower()
+            marks = {place_id: (places[place_id][0].lower(),) for place_id in hotels}
+        else:
+            continue
+        positions = {}
+        for place_id in hotels:
+            found = [text.find(mark) for mark in marks[place_id] if mark and mark in text]
+            if found:
+                positions[place_id] = min(found)
+        if positions:
+            return min(positions, key=positions.get)
+    return None
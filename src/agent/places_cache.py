@@ -0,0 +1,216 @@
+"""Bounded in-process cache for Google Places text searches.
+
+Popular queries ("restaurants in Barcelona") repeat across users all day, so
+search responses are kept in an LRU bounded both by entry count and by
+serialized size. Each category has its own TTL; once an entry goes stale it is
+still served for a grace window while a background task refreshes it
+(stale-while-revalidate), so popular destinations almost never wait on the API.
+"""
+
+import asyncio
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Set, Tuple
+
+from google.maps import places_v1
+
+from src.agent.metrics import Counters, get_counters
+from src.agent.rate_limit import PRIORITY_BACKGROUND, request_priority
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_ENTRIES = 2048
+DEFAULT_MAX_BYTES = 32 * 1024 * 1024
+DEFAULT_TTL = 6 * 60 * 60
+DEFAULT_STALE_TTL = 60 * 60
+
+# Hotels and sights change slowly; restaurants open, close and change hours more often.
+DEFAULT_CATEGORY_TTLS: Dict[str, float] = {
+    "restaurants": 6 * 60 * 60,
+    "hotels": 24 * 60 * 60,
+    "attractions": 24 * 60 * 60,
+}
+
+
+def make_cache_key(query: str, min_rating: float, field_mask: str, *extra: Hashable) -> Tuple[Hashable, ...]:
+    """Build a cache key from a text query, rating filter and field mask.
+
+    The query is lower-cased and whitespace-collapsed so trivially different
+    spellings of the same search share an entry. Any other request parameters
+    that change the response are passed as ``extra``.
+    """
+    return (" ".join(query.lower().split()), float(min_rating), field_mask, *extra)
+
+
+def response_size(response: places_v1.SearchTextResponse) -> int:
+    """Return the serialized size of a search response in bytes."""
+    return places_v1.SearchTextResponse.pb(response).ByteSize()
+
+
+class _Entry:
+    __slots__ = ("value", "size", "fresh_until", "stale_until", "refreshing")
+
+    def __init__(self, value: Any, size: int, fresh_until: float, stale_until: float) -> None:
+        self.value = value
+        self.size = size
+        self.fresh_until = fresh_until
+        self.stale_until = stale_until
+        self.refreshing = False
+
+
+class PlacesSearchCache:
+    """An async TTL/LRU cache with stale-while-revalidate refresh.
+
+    Args:
+        max_entries: Maximum number of cached responses.
+        max_bytes: Maximum total serialized size of cached responses.
+        category_ttls: Seconds an entry stays fresh, per search category.
+        default_ttl: Freshness for categories missing from ``category_ttls``.
+        stale_ttl: Seconds a stale entry is still served while it refreshes.
+        sizeof: Callable returning the size in bytes of a cached value.
+        counters: Where hit/miss/eviction counters are recorded.
+        clock: Monotonic time source, overridable for tests.
+    """
+
+    def __init__(
+        self,
+        max_entries: Optional[int] = None,
+        max_bytes: Optional[int] = None,
+        category_ttls: Optional[Dict[str, float]] = None,
+        default_ttl: float = DEFAULT_TTL,
+        stale_ttl: float = DEFAULT_STALE_TTL,
+        sizeof: Callable[[Any], int] = response_size,
+        counters: Optional[Counters] = None,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        if max_entries is None:
+            max_entries = int(os.getenv("GPLACES_CACHE_MAX_ENTRIES", DEFAULT_MAX_ENTRIES))
+        if max_bytes is None:
+            max_bytes = int(os.getenv("GPLACES_CACHE_MAX_BYTES", DEFAULT_MAX_BYTES))
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.category_ttls = dict(DEFAULT_CATEGORY_TTLS if category_ttls is None else category_ttls)
+        self.default_ttl = default_ttl
+        self.stale_ttl = stale_ttl
+        self.counters = counters if counters is not None else get_counters("places_cache")
+        self._sizeof = sizeof
+        self._clock = clock
+        self._entries: "OrderedDict[Hashable, _Entry]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._refresh_tasks: Set[asyncio.Task] = set()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @property
+    def total_bytes(self) -> int:
+        """Total serialized size of the cached values."""
+        return self._bytes
+
+    async def get_or_fetch(
+        self,
+        key: Hashable,
+        category: str,
+        fetch: Callable[[], Awaitable[Any]],
+    ) -> Any:
+        """Return the cached value for ``key``, calling ``fetch`` on a miss.
+
+        A stale entry inside its grace window is returned immediately and
+        refreshed in the background with ``fetch``.
+        """
+        now = self._clock()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and now >= entry.stale_until:
+                self._remove(key)
+                self.counters.incr("expired")
+                entry = None
+            if entry is not None:
+                self._entries.move_to_end(key)
+                if now < entry.fresh_until:
+                    self.counters.incr("hits")
+                    return entry.value
+                self.counters.incr("stale_hits")
+                start_refresh = not entry.refreshing
+                entry.refreshing = True
+                value = entry.value
+            else:
+                self.counters.incr("misses")
+
+        if entry is not None:
+            if start_refresh:
+                task = asyncio.create_task(self._refresh(key, category, fetch))
+                self._refresh_tasks.add(task)
+                task.add_done_callback(self._refresh_tasks.discard)
+            return value
+
+        value = await fetch()
+        self.put(key, category, value)
+        return value
+
+    async def _refresh(self, key: Hashable, category: str, fetch: Callable[[], Awaitable[Any]]) -> None:
+        try:
+            # Nobody is waiting on a refresh, so it queues behind user-facing requests
+            with request_priority(PRIORITY_BACKGROUND):
+                value = await fetch()
+        except Exception as e:
+            self.counters.incr("refresh_errors")
+            logger.warning(f"Background refresh of {key!r} failed: {e!r}")
+        else:
+            self.counters.incr("refreshes")
+            self.put(key, category, value)
+        finally:
+            # Also runs on cancellation, so a later stale hit can start a new refresh
+            with self._lock:
+                entry = self._entries.get(key)
+                if entry is not None:
+                    entry.refreshing = False
+
+    def put(self, key: Hashable, category: str, value: Any) -> None:
+        """Store ``value`` under ``key`` and evict least-recently-used entries."""
+        size = self._sizeof(value)
+        if size > self.max_bytes:
+            return
+        ttl = self.category_ttls.get(category, self.default_ttl)
+        now = self._clock()
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = _Entry(value, size, now + ttl, now + ttl + self.stale_ttl)
+            self._bytes += size
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self.counters.incr("evictions")
+
+    def _remove(self, key: Hashable) -> None:
+        entry = self._entries.pop(key)
+        self._bytes -= entry.size
+
+    def clear(self) -> None:
+        """Drop every cached entry."""
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self) -> Dict[str, int]:
+        """Return the cache counters together with its current size."""
+        return {**self.counters.snapshot(), "entries": len(self._entries), "bytes": self._bytes}
+
+
+_default_cache: Optional[PlacesSearchCache] = None
+_default_cache_lock = threading.Lock()
+
+
+def get_places_cache() -> PlacesSearchCache:
+    """Return the process-wide Places search cache."""
+    global _default_cache
+    if _default_cache is None:
+        with _default_cache_lock:
+            if _default_cache is None:
+                _default_cache = PlacesSearchCache()
+    return _default_cache
@@ -0,0 +1,154 @@
+"""Process-wide pool of Google Places async clients.
+
+Building a ``places_v1.PlacesAsyncClient`` opens a new gRPC channel, which
+means a fresh TCP connection, TLS handshake and auth setup. The pool keeps a
+small set of clients per event loop (gRPC aio channels are bound to the loop
+that created them) and hands them out round-robin so every lookup reuses a
+warm channel.
+"""
+
+import asyncio
+import functools
+import logging
+import os
+import threading
+import weakref
+from typing import Callable, List, Optional
+
+from google.maps import places_v1
+from google.maps.places_v1.services.places.transports.grpc_asyncio import (
+    PlacesGrpcAsyncIOTransport,
+)
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CHANNEL_COUNT = 1
+DEFAULT_WARM_TIMEOUT = 10.0
+
+# Each pooled channel gets its own subchannel (and therefore its own HTTP/2
+# connection) instead of sharing grpc's process-global one, otherwise a
+# channel count above one would not spread streams over more connections.
+# Keepalive pings stop idle connections from being torn down between bursts.
+_CHANNEL_OPTIONS = [
+    ("grpc.use_local_subchannel_pool", 1),
+    ("grpc.keepalive_time_ms", 30_000),
+    ("grpc.keepalive_timeout_ms", 10_000),
+    ("grpc.keepalive_permit_without_calls", 1),
+    ("grpc.http2.max_pings_without_data", 0),
+]
+
+
+def _create_channel(*args, options=None, **kwargs):
+    """Create a Places gRPC channel with the pool's channel options."""
+    return PlacesGrpcAsyncIOTransport.create_channel(
+        *args, options=[*(options or []), *_CHANNEL_OPTIONS], **kwargs
+    )
+
+
+def create_places_client() -> places_v1.PlacesAsyncClient:
+    """Create a Places client authenticated with ``GPLACES_API_KEY``."""
+    return places_v1.PlacesAsyncClient(
+        transport=functools.partial(PlacesGrpcAsyncIOTransport, channel=_create_channel),
+        client_options={"api_key": os.getenv("GPLACES_API_KEY")},
+    )
+
+
+class _LoopClients:
+    """The clients owned by a single event loop."""
+
+    __slots__ = ("clients", "next_index")
+
+    def __init__(self, clients: List[places_v1.PlacesAsyncClient]) -> None:
+        self.clients = clients
+        self.next_index = 0
+
+
+class PlacesClientPool:
+    """A round-robin pool of ``PlacesAsyncClient`` instances per event loop.
+
+    Args:
+        size: Number of clients (gRPC channels) per event loop. Defaults to
+            ``GPLACES_CHANNEL_COUNT`` or 1.
+        client_factory: Callable building a new client. Defaults to
+            ``create_places_client``.
+    """
+
+    def __init__(
+        self,
+        size: Optional[int] = None,
+        client_factory: Optional[Callable[[], places_v1.PlacesAsyncClient]] = None,
+    ) -> None:
+        if size is None:
+            size = int(os.getenv("GPLACES_CHANNEL_COUNT", DEFAULT_CHANNEL_COUNT))
+        self.size = max(1, size)
+        self._client_factory = client_factory or create_places_client
+        self._loops: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, _LoopClients]" = (
+            weakref.WeakKeyDictionary()
+        )
+        self._lock = threading.Lock()
+
+    def _clients_for_running_loop(self) -> _LoopClients:
+        loop = asyncio.get_running_loop()
+        entry = self._loops.get(loop)
+        if entry is None:
+            with self._lock:
+                entry = self._loops.get(loop)
+                if entry is None:
+                    entry = _LoopClients(
+                        [self._client_factory() for _ in range(self.size)]
+                    )
+                    self._loops[loop] = entry
+        return entry
+
+    def get_client(self) -> places_v1.PlacesAsyncClient:
+        """Return the next pooled client for the running event loop."""
+        entry = self._clients_for_running_loop()
+        client = entry.clients[entry.next_index % len(entry.clients)]
+        entry.next_index += 1
+        return client
+
+    async def warm(self, timeout: float = DEFAULT_WARM_TIMEOUT) -> None:
+        """Open every channel of the running loop before the first request.
+
+        A channel that does not become ready within ``timeout`` seconds is
+        logged and left to connect lazily on its first call.
+        """
+        entry = self._clients_for_running_loop()
+        results = await asyncio.gather(
+            *(
+                asyncio.wait_for(client.transport.grpc_channel.channel_ready(), timeout)
+                for client in entry.clients
+            ),
+            return_exceptions=True,
+        )
+        for result in results:
+            if isinstance(result, BaseException):
+                logger.warning(f"Places channel warm-up failed: {result!r}")
+
+    async def aclose(self) -> None:
+        """Close the clients owned by the running loop.
+
+        Other loops' channels can only be closed on their own loop, so their
+        clients stay pooled until that loop calls ``aclose`` or is gone.
+        """
+        with self._lock:
+            entry = self._loops.pop(asyncio.get_running_loop(), None)
+        if entry is not None:
+            await asyncio.gather(
+                *(client.transport.close() for client in entry.clients),
+                return_exceptions=True,
+            )
+
+
+_default_pool: Optional[PlacesClientPool] = None
+_default_pool_lock = threading.Lock()
+
+
+def get_places_client_pool() -> PlacesClientPool:
+    """Return the process-wide Places client pool."""
+    global _default_pool
+    if _default_pool is None:
+        with _default_pool_lock:
+            if _default_pool is None:
+                _default_pool = PlacesClientPool()
+    return _default_pool
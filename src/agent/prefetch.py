@@ -0,0 +1,187 @@
+"""Speculative prefetch of the obvious searches for a first-turn trip request.
+
+For a request like "5 days in Tokyo in April" the planner always starts by
+searching hotels, attractions, restaurants and the weather for the
+destination, which costs one or two model round-trips before any search even
+starts. A cheap, deterministic parser pulls the destination, dates and party
+out of the first message, and those searches are run concurrently before the
+model is called. The results are added to the thread as a tool-calling
+``AIMessage`` followed by its ``ToolMessage`` results, exactly as if the model
+had asked for them, so it goes straight to planning instead of fetching them
+again.
+"""
+
+import re
+from typing import Any, Dict, List, Optional, Sequence
+
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage, ToolCall
+from langchain_core.runnables import RunnableConfig
+from langchain_core.tools import BaseTool
+
+from src.agent.metrics import get_counters
+from src.agent.tool_node import ConcurrentToolNode
+from src.agent.utils import get_message_text
+
+# Tools prefetched for a recognised request, when the assistant has them
+PREFETCH_TOOLS = ("search_hotels", "search_attractions", "search_restaurants", "search_weather")
+
+MONTHS = (
+    "january", "february", "march", "april", "may", "june",
+    "july", "august", "september", "october", "november", "december",
+)
+
+_NUMBER_WORDS = {
+    "a": 1, "an": 1, "one": 1, "two": 2, "three": 3, "four": 4, "five": 5, "six": 6, "seven": 7,
+    "eight": 8, "nine": 9, "ten": 10, "eleven": 11, "twelve": 12, "fourteen": 14,
+}
+_NUMBER = r"(\d+|" + "|".join(_NUMBER_WORDS) + r")"
+_MONTH = r"(" + "|".join(m.capitalize() for m in MONTHS) + r"|" + "|".join(m[:3].capitalize() for m in MONTHS) + r")"
+
+_DURATION_RE = re.compile(_NUMBER + r"[\s-]+(day|night|week)s?\b", re.IGNORECASE)
+_ISO_DATE_RE = re.compile(r"\b(\d{4}-\d{2}-\d{2})\b")
+_MONTH_DATE_RE = re.compile(r"\b(?:" + _MONTH + r"\.?\s+(\d{1,2})(?:st|nd|rd|th)?\b|(\d{1,2})(?:st|nd|rd|th)?\s+(?:of\s+)?" + _MONTH + r"\b|" + _MONTH + r"\b)")
+_PARTY_RE = re.compile(_NUMBER + r"\s+(?:people|persons|adults|travell?ers|friends|of us)\b", re.IGNORECASE)
+# A destination is a run of capitalised words after "in", "to" or "visit"
+_DESTINATION_RE = re.compile(r"\b(?:in|to|visit(?:ing)?|around)\s+((?:[A-Z][\w'’.-]*)(?:(?:\s+|,\s*|\s+de\s+|\s+del\s+)[A-Z][\w'’.-]*)*)")
+
+
+class TripRequest:
+    """The trip details a first message states explicitly."""
+
+    __slots__ = ("destination", "date", "days", "travellers")
+
+    def __init__(self, destination: str, date: Optional[str] = None, days: Optional[int] = None, travellers: Optional[int] = None) -> None:
+        self.destination = destination
+        self.date = date
+        self.days = days
+        self.travellers = travellers
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, TripRequest):
+            return NotImplemented
+        return all(getattr(self, f) == getattr(other, f) for f in self.__slots__)
+
+    def __repr__(self) -> str:
+        return f"TripRequest(destination={self.destination!r}, date={self.date!r}, days={self.days!r}, travellers={self.travellers!r})"
+
+
+def _number(value: str) -> int:
+    return int(value) if value.isdigit() else _NUMBER_WORDS[value.lower()]
+
+
+def _is_month(word: str) -> bool:
+    word = word.lower().rstrip(".")
+    return word in MONTHS or any(word == month[:3] for month in MONTHS)
+
+
+def parse_trip_request(text: str) -> Optional[TripRequest]:
+    """Extract destination, date, duration and party size from a trip request.
+
+    Returns ``None`` when no destination is stated; other details are ``None``
+    when missing. Only explicit phrasing is recognised, so the parser never
+    guesses a destination the model would not have searched for.
+    """
+    destination = None
+    for match in _DESTINATION_RE.finditer(text):
+        # "in April" is a date, and "in Tokyo April 3" ends at the month
+        words = []
+        for word in re.split(r"\s+", match.group(1)):
+            if _is_month(word.strip(",")):
+                break
+            words.append(word)
+        if words:
+            destination = " ".join(words).strip(" ,.")
+            break
+    if not destination:
+        return None
+
+    days = None
+    duration = _DURATION_RE.search(text)
+    if duration:
+        days = _number(duration.group(1))
+        if duration.group(2).lower() == "week":
+            days *= 7
+        elif duration.group(2).lower() == "night":
+            days += 1
+
+    date = None
+    iso = _ISO_DATE_RE.search(text)
+    if iso:
+        date = iso.group(1)
+    else:
+        month_date = _MONTH_DATE_RE.search(text)
+        if month_date:
+            date = " ".join(part for part in month_date.groups() if part)
+
+    party = _PARTY_RE.search(text)
+    travellers = _number(party.group(1)) if party else (2 if re.search(r"\bcouple\b|\bmy (?:wife|husband|partner)\b", text, re.IGNORECASE) else None)
+
+    return TripRequest(destination, date, days, travellers)
+
+
+def _prefetch_calls(request: TripRequest, tool_names: Sequence[str]) -> List[ToolCall]:
+    calls = []
+    for name in PREFETCH_TOOLS:
+        if name not in tool_names:
+            continue
+        args: Dict[str, Any] = {"location": request.destination}
+        if name == "search_weather" and request.date:
+            args["date"] = request.date
+        calls.append(ToolCall(name=name, args=args, id=f"prefetch_{name}", type="tool_call"))
+    return calls
+
+
+def _first_turn_request(messages: Sequence[BaseMessage]) -> Optional[str]:
+    # Only the very first user message of a thread, before the model has answered anything
+    if len(messages) != 1 or not isinstance(messages[0], HumanMessage):
+        return None
+    return get_message_text(messages[0])
+
+
+class Prefetcher:
+    """Run the obvious searches for a first-turn request concurrently.
+
+    Args:
+        tools: The assistant's tools; only those in ``PREFETCH_TOOLS`` are prefetched.
+    """
+
+    def __init__(self, tools: Sequence[BaseTool]) -> None:
+        self.tool_names = [tool.name for tool in tools if tool.name in PREFETCH_TOOLS]
+        self.tool_node = ConcurrentToolNode([tool for tool in tools if tool.name in PREFETCH_TOOLS], name="prefetch")
+        self.counters = get_counters("prefetch")
+
+    def _request_message(self, messages: Sequence[BaseMessage]) -> Optional[AIMessage]:
+        if not self.tool_names:
+            return None
+        text = _first_turn_request(messages)
+        if text is None:
+            return None
+        request = parse_trip_request(text)
+        if request is None:
+            self.counters.incr("unparsed")
+            return None
+        self.counters.incr("prefetched")
+        return AIMessage(content="", tool_calls=_prefetch_calls(request, self.tool_names))
+
+    async def aprefetch(
+        self, messages: Sequence[BaseMessage], config: RunnableConfig, state: Optional[Dict[str, Any]] = None
+    ) -> List[BaseMessage]:
+        """Return the prefetch tool-call message and its results, or ``[]`` if nothing applies.
+
+        ``state`` is the graph state handed to tools that take ``InjectedState``.
+        """
+        request_message = self._request_message(messages)
+        if request_message is None:
+            return []
+        results = await self.tool_node.ainvoke({**(state or {}), "messages": [*messages, request_message]}, config)
+        return [request_message, *results["messages"]]
+
+    def prefetch(
+        self, messages: Sequence[BaseMessage], config: RunnableConfig, state: Optional[Dict[str, Any]] = None
+    ) -> List[BaseMessage]:
+        """Blocking counterpart of ``aprefetch``."""
+        request_message = self._request_message(messages)
+        if request_message is None:
+            return []
+        results = self.tool_node.invoke({**(state or {}), "messages": [*messages, request_message]}, config)
+        return [request_message, *results["messages"]]
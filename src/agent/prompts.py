@@ -1,3 +1,12 @@
+import hashlib
+import logging
+from functools import lru_cache
+from typing import Dict, Iterable, NamedTuple, Tuple
+
+from src.agent.utils import count_tokens
+
+logger = logging.getLogger(__name__)
+
 TRIP_ASSISTANT_PROMPT = """You are a travel planning assistant and document assembler. Your role is to:
 
 1. Trip Assistant and planner RESPONSIBILITIES:
@@ -163,7 +172,7 @@ ITINERARY_MARKDOWN_FORMAT = """
         "title": "Tokyo Day 1",
         "date": "2024-04-01",
         "location": "Tokyo, Japan",
-        "description": "Exploring `geo:Shibuya|$PLACE_ID` and `geo:Harajuku|$PLACE_ID` districts",
+        "description": "Exploring `geo:@$ref` (Shibuya) and `geo:@$ref` (Harajuku) districts",
         "itineraryItems": [
             {
             "timeOfDay": "Morning",
@@ -212,31 +221,31 @@ ITINERARY_MARKDOWN_FORMAT = """
             {
                 "title": "Cerulean Tower Tokyu Hotel",
                 "description": "Luxury hotel with great city views in Shibuya",
-                "link": "$places.googleMapsUri"
+                "link": "@$ref"
             },
             {
                 "title": "Hotel Mets Shibuya",
                 "description": "Convenient mid-range option near Shibuya Station",
-                "link": "$places.googleMapsUri"
+                "link": "@$ref"
             }
         ],
         "practicalTips": [
             {
                 "title": "Transportation",
                 "description": "Get a PASMO or Suica card for easy train access",
-                "link": "$places.googleMapsUri"
+                "link": "@$ref"
             },
             {
                 "title": "Weather",
                 "description": "April is cherry blossom season - bring layers as temperatures can vary",
-                "link": "$places.googleMapsUri"
+                "link": "@$ref"
             }
         ],
         "specialEvents": [
             {
                 "title": "Cherry Blossom Festival",
                 "description": "Special evening illuminations at Yoyogi Park",
-                "link": "$places.googleMapsUri",
+                "link": "@$ref",
                 "website": "https://www.yoyogi-park.com/en/event/cherry-blossom-festival/"
             }
         ]
@@ -244,15 +253,19 @@ ITINERARY_MARKDOWN_FORMAT = """
     ```
 """
 
-TRIP_PLANNER_WITH_TOOLS_PROMPT = f"""You are a travel planning planner and document assembler. Your role is to:
+PLACE_TABLE_INSTRUCTION = "   - Place search tools return a table whose first line names the columns (e.g. ref|name|id|address|maps|lat,lng): `ref` is the place's short handle ($ref) to cite it by, `id` is the place id and `maps` the Google Maps link\n"
 
-1. Trip assistant and planner RESPONSIBILITIES:
-   - Access to all tools [search_hotels, search≈_restaurants, search_attractions] to find accommodation, restaurants, points of interest information
-   - You primary focus is to support the trip planning, please identify the location(s) and number of days, then utilize the available tools for each location and additional information
-   - Once you have the information, assemble the information into a final travel plan (see 2. DOCUMENT ASSEMBLY RESPONSIBILITIES).
-   - For other requests, please make use of the tools to find the information and respond to the user. If no relevant information is found, please respond with: I'm sorry, but I am not designed to handle that request. Please ask the appropriate agent.
+CITING_PLACES_INSTRUCTION = """       - Cite a place by its `ref` handle from the tool results ($ref, e.g. P4KQ7Z): write `@$ref` as its link and `geo:@$ref` for a geo location
+       - Never write Google Maps URLs or place ids yourself; handles are replaced by them after you answer
+"""
 
-2. DOCUMENT ASSEMBLY RESPONSIBILITIES:
+# Sections of the compiled trip planner prompt. The tool-independent part comes
+# first and is byte-identical for every assistant, so provider-side prompt
+# caching can reuse it whatever tools a variant selects; only the short
+# tool-dependent tail differs between variants.
+TRIP_PLANNER_PROMPT_PREFIX = f"""You are a travel planning planner and document assembler. Your role is to:
+
+1. DOCUMENT ASSEMBLY RESPONSIBILITIES:
    Your primary responsibility is to combine and format all information from the tools to draft the final travel plan into a beautiful, well-structured markdown document.
 
    INSTRUCTIONS:
@@ -266,11 +279,11 @@ TRIP_PLANNER_WITH_TOOLS_PROMPT = f"""You are a travel planning planner and docum
       - Bullet points for easy reading
       - Links to maps and websites
       - Emojis for visual appeal
-      - Proper markdown formatting 
-      - Don not include any other code block markdown except the daily itinerary (see 2.1)
-      - Custom Markdown for daily itinerary (see 2.1)
+      - Proper markdown formatting
+      - Do not include any other code block markdown except the daily itinerary (see 1.1)
+      - Custom Markdown for daily itinerary (see 1.1)
 
-   2.1 Custom Markdown for daily itinerary:
+   1.1 Custom Markdown for daily itinerary:
        - Each day should be customized code markdown with 'itinerary' as code block
        - A day should include the following information:
            * title: the title of the day
@@ -290,23 +303,190 @@ TRIP_PLANNER_WITH_TOOLS_PROMPT = f"""You are a travel planning planner and docum
            * pointOfInterestSuggestions: the point of interest suggestions of the day (if any)
 
        - Please reference the following format (as an example):
-       ***itinerary_markdown_format***
-   2.1 Special Markdown for geo location:
-       - If the location is a geo location, please use the following format:
-       `geo:$places.displayName|places.id`
-
-
+       {ITINERARY_MARKDOWN_FORMAT}
+   1.2 Citing places:
+{CITING_PLACES_INSTRUCTION}
    3. Structure the document with these sections:
       # Trip Overview
-      ## Daily Itinerary (see 2.1)
+      ## Daily Itinerary (see 1.1)
 
    4. Error Handling:
       - If any section is missing information, note it as "Information pending"
       - If an agent's response is invalid or empty, skip that section
       - Always ensure the document is valid markdown
       - Never include raw error messages or invalid content
+
+2. Trip assistant and planner RESPONSIBILITIES:
+   - You primary focus is to support the trip planning, please identify the location(s) and number of days, then utilize the available tools for each location and additional information
+"""
+
+# One line per tool, in this order, included only when the tool is selected
+TOOL_INSTRUCTIONS = {
+    "search_weather": "search_weather: to find weather information",
+    "search_flights": "search_flights: to find flights information",
+    "search_hotels": "search_hotels: to find hotels information",
+    "search_attractions": "search_attractions: to find attractions information; results near the chosen hotel come first, or pass `near` with the refs of a day's places to search around them",
+    "search_restaurants": "search_restaurants: to find restaurants information; results near the chosen hotel come first, or pass `near` with the refs of a day's places to search around them",
+    "search_places": "search_places: to find several kinds of places (hotels, cuisines, attraction types) for the same location with a single call; prefer it over separate place searches",
+}
+
+PLACE_TOOLS = ("search_hotels", "search_attractions", "search_restaurants", "search_places")
+
+TRIP_PLANNER_PROMPT_SUFFIX = """   - Once you have the information, assemble the information into a final travel plan (see 1. DOCUMENT ASSEMBLY RESPONSIBILITIES).
+   - For other requests, please make use of the tools to find the information and respond to the user. If no relevant information is found, please respond with: I'm sorry, but I am not designed to handle that request
+"""
+
+
+# Structured itinerary mode: the planner only researches and hands over with
+# this marker, and the plan itself is produced as structured output.
+RESEARCH_COMPLETE_MARKER = "RESEARCH_COMPLETE"
+
+RESEARCH_HANDOFF_INSTRUCTION = f"""When you have gathered the information for a travel plan, do not write the plan: reply with exactly {RESEARCH_COMPLETE_MARKER} and nothing else. The plan is assembled from your research in a separate step."""
+
+TRIP_RESEARCH_PROMPT_PREFIX = """You are a travel planning researcher. Your role is to:
+
+1. RESEARCH RESPONSIBILITIES:
+   - Gather what a day-by-day travel plan needs: accommodation, restaurants, points of interest, weather and any other relevant information
+   - The plan cites places by the `ref` handles the tools return, so search for every place the plan should mention
+
+2. Trip assistant and planner RESPONSIBILITIES:
+   - You primary focus is to support the trip planning, please identify the location(s) and number of days, then utilize the available tools for each location and additional information
+"""
+
+TRIP_RESEARCH_PROMPT_SUFFIX = f"""   - {RESEARCH_HANDOFF_INSTRUCTION}
+   - For other requests, please make use of the tools to find the information and respond to the user. If no relevant information is found, please respond with: I'm sorry, but I am not designed to handle that request
+"""
+
+TRIP_ASSEMBLY_PROMPT = """You are a travel plan assembler. Turn the research in the conversation into the user's travel plan.
+
+- Plan every day the user asked for, in order, with Morning, Afternoon and Evening items
+- Only suggest places found in the research; set `link` to `@` followed by the place's `ref` handle, e.g. `@P4KQ7Z`
+- Refer to a place in a description as `geo:@` followed by its `ref` handle; handles are replaced by Google Maps links and place ids afterwards
+- If information for part of a day is missing, say "Information pending" instead of inventing it
 """
 
+
+_compiled_tokens: Dict[Tuple[str, ...], int] = {}
+
+
+class CompiledPrompt(NamedTuple):
+    """A compiled system prompt variant and its size."""
+
+    text: str
+    tokens: int
+    prefix_tokens: int
+
+
+def _canonical_tools(selected_tools: Iterable[str]) -> Tuple[str, ...]:
+    selected = set(selected_tools)
+    return tuple(name for name in TOOL_INSTRUCTIONS if name in selected)
+
+
+@lru_cache(maxsize=None)
+def _prefix_tokens() -> int:
+    return count_tokens(TRIP_PLANNER_PROMPT_PREFIX)
+
+
+def _tool_section(tools: Tuple[str, ...]) -> str:
+    parts = []
+    if tools:
+        parts.append("   - Available tools:\n")
+        parts.extend(f"     * {TOOL_INSTRUCTIONS[name]}\n" for name in tools)
+    if any(name in PLACE_TOOLS for name in tools):
+        parts.append(PLACE_TABLE_INSTRUCTION)
+    return "".join(parts)
+
+
+@lru_cache(maxsize=None)
+def _compile(tools: Tuple[str, ...]) -> CompiledPrompt:
+    text = TRIP_PLANNER_PROMPT_PREFIX + _tool_section(tools) + TRIP_PLANNER_PROMPT_SUFFIX
+    compiled = CompiledPrompt(text, count_tokens(text), _prefix_tokens())
+    _compiled_tokens[tools] = compiled.tokens
+    logger.info(
+        f"Compiled trip planner prompt for tools {list(tools)}: "
+        f"{compiled.tokens} tokens ({compiled.prefix_tokens} shared prefix)"
+    )
+    return compiled
+
+
+def compile_trip_planner_prompt(selected_tools: Iterable[str]) -> CompiledPrompt:
+    """Return the trip planner prompt with instructions for ``selected_tools`` only.
+
+    Each distinct tool set is compiled once; tool order does not matter.
+    """
+    return _compile(_canonical_tools(selected_tools))
+
+
+def compiled_prompt_tokens() -> Dict[Tuple[str, ...], int]:
+    """Return the token count of every prompt variant compiled so far, by tool set."""
+    return dict(_compiled_tokens)
+
+
+# The default system prompt: the variant compiled for every tool. Configs keep
+# a copy of it, so earlier defaults are still recognised by their digest and get
+# compiled per tool set too.
+TRIP_PLANNER_WITH_TOOLS_PROMPT = TRIP_PLANNER_PROMPT_PREFIX + _tool_section(tuple(TOOL_INSTRUCTIONS)) + TRIP_PLANNER_PROMPT_SUFFIX
+
+_EARLIER_DEFAULT_PROMPT_DIGESTS = frozenset({
+    "b5f23e4bd5cb690b2ce47e12394e8475b3cfdad19e29ba52e457dbed5bf69a1a",
+    "15bf2cc26923e71685607e5cf54ba38e970beaaab1fbd3b6916cdea9ceaab880",
+    "d8b4b53d4616e806b1427d2ddf3de95c2930d19345a16a67f3da9fc3b7343ad7",
+    "e42983abd3652903884f7e2c56f130c9e1dd014f3befa49d3efa9739b4f6f760",
+    "4cae642275e050482083632813ea27f3d080f4c856bcf9ebd8e31fdeda1e3af5",
+})
+
+
+def is_default_prompt(system_prompt: str) -> bool:
+    """Whether ``system_prompt`` is the default trip planner prompt, current or earlier."""
+    return (
+        system_prompt == TRIP_PLANNER_WITH_TOOLS_PROMPT
+        or hashlib.sha256(system_prompt.encode("utf-8")).hexdigest() in _EARLIER_DEFAULT_PROMPT_DIGESTS
+    )
+
+
+@lru_cache(maxsize=None)
+def compile_trip_research_prompt(selected_tools: Tuple[str, ...]) -> str:
+    """Return the research-only prompt used when the plan is assembled as structured output."""
+    return TRIP_RESEARCH_PROMPT_PREFIX + _tool_section(_canonical_tools(selected_tools)) + TRIP_RESEARCH_PROMPT_SUFFIX
+
+
+@lru_cache(maxsize=256)
+def resolve_system_prompt(system_prompt: str, selected_tools: Tuple[str, ...], itinerary_mode: str = "markdown") -> str:
+    """Return the system prompt a graph should run with.
+
+    The default prompt, or one a config stored from an earlier release, is
+    replaced by its variant compiled for
+    ``selected_tools`` (the research-only variant in ``structured`` itinerary
+    mode); a custom prompt only has its ``***itinerary_markdown_format***``
+    placeholder expanded, along with the place citing instruction the format's
+    handles rely on, plus the research hand-off instruction in ``structured``
+    mode.
+    """
+    if is_default_prompt(system_prompt):
+        if itinerary_mode == "structured":
+            return compile_trip_research_prompt(selected_tools)
+        return compile_trip_planner_prompt(selected_tools).text
+    # if prompt contains ***itinerary_markdown_format***, replace it with ITINERARY_MARKDOWN_FORMAT,
+    # whose examples cite places by handle, so say how unless the prompt already does
+    if "***itinerary_markdown_format***" in system_prompt:
+        expansion = ITINERARY_MARKDOWN_FORMAT
+        if CITING_PLACES_INSTRUCTION not in system_prompt:
+            expansion += "\n   Citing places:\n" + CITING_PLACES_INSTRUCTION
+        system_prompt = system_prompt.replace("***itinerary_markdown_format***", expansion)
+    if itinerary_mode == "structured":
+        system_prompt += "\n\n" + RESEARCH_HANDOFF_INSTRUCTION
+    return system_prompt
+
+
+FAN_OUT_DISPATCH_PROMPT = """You are the coordinator of a team of travel planning agents.
+
+For a trip planning request, decide which agents are needed and hand each of them its task by calling its transfer tool.
+- Call ALL the transfer tools you need in a single message; the agents work at the same time and cannot see each other's results
+- Each task must be self-contained: include the destination(s), dates or number of days, travellers and any preferences from the conversation
+- Only call an agent whose work is actually needed
+- If the request is not related to trip planning, do not call any tool and respond with: I'm sorry, but I am not designed to handle that request."""
+
+
 RESEARCH_AGENT_PROMPT = """You are a research agent specialized in gathering and analyzing information.
 
 ROLE AND RESPONSIBILITIES:
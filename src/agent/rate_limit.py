@@ -0,0 +1,335 @@
+"""Client-side rate limiting for the upstream APIs the tools call.
+
+Every upstream (``places``, ``tavily``) gets one process-wide ``RateLimiter``:
+
+- a token bucket refilled at the current rate, so requests leave at a steady
+  pace up to a small burst instead of all at once
+- a priority queue of waiting callers: a request waits for its turn instead
+  of failing, and interactive requests go before background ones such as
+  cache refreshes (see ``request_priority``)
+- AIMD adaptation: every success raises the rate a little, up to the
+  configured ceiling, and a 429 / ``RESOURCE_EXHAUSTED`` halves it; the
+  throttled request waits for another turn and is sent again
+- a daily quota: once it is used up requests fail with ``QuotaExceededError``,
+  and background requests stop early to leave the rest to users
+
+Limits come from the environment, e.g. ``PLACES_RATE_LIMIT`` (requests per
+second), ``PLACES_RATE_BURST`` and ``PLACES_DAILY_QUOTA`` (0 is unlimited).
+Waits and queue depths are recorded as ``rate_limit.<name>.wait`` and
+``rate_limit.<name>.queue_depth`` timings, events as ``rate_limit.<name>``
+counters.
+"""
+
+import asyncio
+import contextvars
+import heapq
+import itertools
+import os
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import Any, Awaitable, Callable, Dict, Iterator, List, Optional, Tuple, TypeVar
+
+from src.agent.metrics import get_counters, get_timings
+
+T = TypeVar("T")
+
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BACKGROUND = 10
+
+DEFAULT_RATE = 10.0
+DEFAULT_BURST = 10
+DEFAULT_MIN_RATE = 0.5
+DEFAULT_ADDITIVE_INCREASE = 0.1
+DEFAULT_MULTIPLICATIVE_DECREASE = 0.5
+DEFAULT_QUOTA_RESERVE = 0.1
+DEFAULT_THROTTLE_RETRIES = 3
+
+# One decrease per wave of throttled responses, not one per request of the wave
+_DECREASE_COOLDOWN = 1.0
+# Longest a queued caller sleeps before checking its turn again
+_MAX_POLL = 0.25
+
+_priority: contextvars.ContextVar[int] = contextvars.ContextVar("rate_limit_priority", default=PRIORITY_INTERACTIVE)
+
+
+class QuotaExceededError(RuntimeError):
+    """Raised when an upstream's daily quota is used up."""
+
+    def __init__(self, name: str, quota: int) -> None:
+        super().__init__(f"Daily quota of {quota} {name} requests used up")
+        self.name = name
+        self.quota = quota
+
+
+@contextmanager
+def request_priority(priority: int) -> Iterator[None]:
+    """Send the upstream requests made inside the block at ``priority`` (lower goes first)."""
+    token = _priority.set(priority)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+def is_throttled(error: BaseException) -> bool:
+    """Whether ``error`` means the upstream rejected the request for its rate or quota."""
+    status = getattr(error, "status_code", None) or getattr(error, "code", None)
+    if callable(status):
+        # grpc.aio.AioRpcError exposes its status code as a method
+        status = status()
+    if status == 429 or getattr(status, "name", None) == "RESOURCE_EXHAUSTED":
+        return True
+    # google.api_core maps RESOURCE_EXHAUSTED and HTTP 429 to these exceptions
+    return type(error).__name__ in ("ResourceExhausted", "TooManyRequests")
+
+
+def _today() -> str:
+    return datetime.now(timezone.utc).strftime("%Y-%m-%d")
+
+
+class RateLimiter:
+    """An adaptive token bucket with a priority queue and a daily quota.
+
+    Safe to share between threads and event loops: state is guarded by a lock
+    and waiting callers sleep and check their turn again rather than waiting on
+    loop-bound primitives.
+
+    Args:
+        name: Upstream name used for the metrics.
+        rate: Ceiling of the request rate in requests per second.
+        burst: Bucket size, i.e. requests that may leave back to back.
+        daily_quota: Requests allowed per UTC day; 0 is unlimited.
+        min_rate: Floor the rate never drops below.
+        additive_increase: Requests per second added after each success.
+        multiplicative_decrease: Factor the rate is multiplied by when throttled.
+        quota_reserve: Share of the daily quota background requests may not use.
+        clock: Monotonic clock, for tests.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        rate: float = DEFAULT_RATE,
+        burst: int = DEFAULT_BURST,
+        daily_quota: int = 0,
+        min_rate: float = DEFAULT_MIN_RATE,
+        additive_increase: float = DEFAULT_ADDITIVE_INCREASE,
+        multiplicative_decrease: float = DEFAULT_MULTIPLICATIVE_DECREASE,
+        quota_reserve: float = DEFAULT_QUOTA_RESERVE,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.name = name
+        self.max_rate = rate
+        self.rate = rate
+        self.burst = max(1, burst)
+        self.daily_quota = daily_quota
+        self.min_rate = min(min_rate, rate)
+        self.additive_increase = additive_increase
+        self.multiplicative_decrease = multiplicative_decrease
+        self.quota_reserve = quota_reserve
+        self._clock = clock
+        self._tokens = float(self.burst)
+        self._updated = clock()
+        self._last_decrease = float("-inf")
+        self._day = _today()
+        self._used_today = 0
+        self._queue: List[Tuple[int, int]] = []
+        self._tickets = itertools.count()
+        self._lock = threading.Lock()
+        self.counters = get_counters(f"rate_limit.{name}")
+        self.wait_timings = get_timings(f"rate_limit.{name}.wait")
+        self.depth_timings = get_timings(f"rate_limit.{name}.queue_depth")
+
+    @property
+    def queue_depth(self) -> int:
+        """Callers currently waiting for their turn."""
+        with self._lock:
+            return len(self._queue)
+
+    def stats(self) -> Dict[str, Any]:
+        """Current rate, queue depth and quota use."""
+        with self._lock:
+            self._refill(self._clock())
+            return {
+                "rate": self.rate,
+                "tokens": self._tokens,
+                "queue_depth": len(self._queue),
+                "used_today": self._used_today,
+                "daily_quota": self.daily_quota,
+            }
+
+    def _refill(self, now: float) -> None:
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def _check_quota(self, priority: int) -> None:
+        if not self.daily_quota:
+            return
+        today = _today()
+        if today != self._day:
+            self._day, self._used_today = today, 0
+        limit = self.daily_quota
+        if priority > PRIORITY_INTERACTIVE:
+            limit = int(self.daily_quota * (1 - self.quota_reserve))
+        if self._used_today >= limit:
+            self.counters.incr("quota_rejected")
+            raise QuotaExceededError(self.name, self.daily_quota)
+
+    def _enqueue(self, priority: int) -> Tuple[int, int]:
+        ticket = (priority, next(self._tickets))
+        with self._lock:
+            self._check_quota(priority)
+            heapq.heappush(self._queue, ticket)
+            depth = len(self._queue)
+        self.depth_timings.observe(depth)
+        return ticket
+
+    def _dequeue(self, ticket: Tuple[int, int]) -> None:
+        with self._lock:
+            if ticket in self._queue:
+                self._queue.remove(ticket)
+                heapq.heapify(self._queue)
+
+    def _poll(self, ticket: Tuple[int, int]) -> float:
+        """Take a token if ``ticket`` is next in line; otherwise return how long to sleep."""
+        with self._lock:
+            now = self._clock()
+            self._refill(now)
+            if self._queue[0] == ticket:
+                try:
+                    # Checked again at the head of the line: the callers ahead may have used up the quota
+                    self._check_quota(ticket[0])
+                except QuotaExceededError:
+                    heapq.heappop(self._queue)
+                    raise
+                if self._tokens >= 1:
+                    heapq.heappop(self._queue)
+                    self._tokens -= 1
+                    self._used_today += 1
+                    return 0.0
+                return (1 - self._tokens) / self.rate
+            # Roughly one token per caller ahead of us
+            ahead = sum(1 for waiting in self._queue if waiting < ticket)
+            return min(_MAX_POLL, max(0.0, ahead - self._tokens) / self.rate or 0.001)
+
+    async def acquire(self, priority: Optional[int] = None) -> None:
+        """Wait for this caller's turn to send one request."""
+        ticket = self._enqueue(_priority.get() if priority is None else priority)
+        start = time.perf_counter()
+        try:
+            while True:
+                delay = self._poll(ticket)
+                if not delay:
+                    break
+                await asyncio.sleep(delay)
+        except BaseException:
+            self._dequeue(ticket)
+            raise
+        self._observe_wait(start)
+
+    def acquire_sync(self, priority: Optional[int] = None) -> None:
+        """Block until this caller's turn to send one request."""
+        ticket = self._enqueue(_priority.get() if priority is None else priority)
+        start = time.perf_counter()
+        try:
+            while True:
+                delay = self._poll(ticket)
+                if not delay:
+                    break
+                time.sleep(delay)
+        except BaseException:
+            self._dequeue(ticket)
+            raise
+        self._observe_wait(start)
+
+    def _observe_wait(self, start: float) -> None:
+        self.counters.incr("requests")
+        self.wait_timings.observe((time.perf_counter() - start) * 1000)
+
+    def on_success(self) -> None:
+        """Additive increase, up to the configured rate."""
+        with self._lock:
+            if self.rate < self.max_rate:
+                self._refill(self._clock())
+                self.rate = min(self.max_rate, self.rate + self.additive_increase)
+
+    def on_throttled(self) -> None:
+        """Multiplicative decrease, and stop the bucket from sending a burst straight after."""
+        with self._lock:
+            now = self._clock()
+            self.counters.incr("throttled")
+            if now - self._last_decrease < _DECREASE_COOLDOWN:
+                return
+            self._refill(now)
+            self.rate = max(self.min_rate, self.rate * self.multiplicative_decrease)
+            self._tokens = min(self._tokens, 0.0)
+            self._last_decrease = now
+            self.counters.incr("decreases")
+
+    async def run(
+        self,
+        call: Callable[[], Awaitable[T]],
+        priority: Optional[int] = None,
+        throttle_retries: int = DEFAULT_THROTTLE_RETRIES,
+    ) -> T:
+        """Send ``call`` when its turn comes, sending it again if the upstream throttles it."""
+        for attempt in itertools.count():
+            await self.acquire(priority)
+            try:
+                result = await call()
+            except Exception as e:
+                if not is_throttled(e):
+                    raise
+                self.on_throttled()
+                if attempt >= throttle_retries:
+                    raise
+            else:
+                self.on_success()
+                return result
+
+    def run_sync(
+        self,
+        call: Callable[[], T],
+        priority: Optional[int] = None,
+        throttle_retries: int = DEFAULT_THROTTLE_RETRIES,
+    ) -> T:
+        """Blocking counterpart of ``run``."""
+        for attempt in itertools.count():
+            self.acquire_sync(priority)
+            try:
+                result = call()
+            except Exception as e:
+                if not is_throttled(e):
+                    raise
+                self.on_throttled()
+                if attempt >= throttle_retries:
+                    raise
+            else:
+                self.on_success()
+                return result
+
+
+_limiters: Dict[str, RateLimiter] = {}
+_limiters_lock = threading.Lock()
+
+
+def _from_env(name: str) -> RateLimiter:
+    prefix = name.upper()
+    rate = float(os.getenv(f"{prefix}_RATE_LIMIT", DEFAULT_RATE))
+    return RateLimiter(
+        name,
+        rate=rate,
+        burst=int(os.getenv(f"{prefix}_RATE_BURST", max(1, round(rate)))),
+        daily_quota=int(os.getenv(f"{prefix}_DAILY_QUOTA", 0)),
+    )
+
+
+def get_rate_limiter(name: str) -> RateLimiter:
+    """Return the process-wide limiter for upstream ``name``, configured from the environment."""
+    with _limiters_lock:
+        limiter = _limiters.get(name)
+        if limiter is None:
+            limiter = _limiters[name] = _from_env(name)
+        return limiter
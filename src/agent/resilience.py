@@ -0,0 +1,287 @@
+"""Hedged requests, retries and deadlines for upstream calls.
+
+A Places search usually answers quickly, but a few are much slower than the
+rest, and one slow search holds up the whole agent step. ``Resilience.call``
+runs an upstream call as follows:
+
+- every attempt gets a deadline, capped by what is left of the call's overall
+  deadline; with a rate limiter, requests first wait for their turn and the
+  deadlines only count time spent sending
+- if an attempt hasn't answered once the usual latency has passed (a
+  percentile of recent samples), a duplicate request is sent and the first
+  answer wins; the loser is cancelled
+- hedges are paid from a budget that earns a fraction of a hedge per call, so
+  hedging can't add more than that fraction to the upstream's load
+- attempts that fail with a retryable status (``UNAVAILABLE``,
+  ``DEADLINE_EXCEEDED``, ``ABORTED``) or time out are retried after a capped
+  exponential backoff with full jitter, so clients that failed together don't
+  retry together
+
+Settings come from the environment, e.g. ``PLACES_HEDGE_PERCENTILE`` (0
+disables hedging), ``PLACES_HEDGE_BUDGET``, ``PLACES_MAX_ATTEMPTS``,
+``PLACES_ATTEMPT_TIMEOUT`` and ``PLACES_DEADLINE``. Events are counted under
+``resilience.<name>``.
+"""
+
+import asyncio
+import itertools
+import os
+import random
+import threading
+import time
+from typing import Awaitable, Callable, Dict, Optional, TypeVar
+
+from src.agent.metrics import Timings, get_counters
+from src.agent.rate_limit import RateLimiter
+
+T = TypeVar("T")
+
+DEFAULT_HEDGE_PERCENTILE = 95.0
+DEFAULT_HEDGE_BUDGET = 0.1
+DEFAULT_MIN_HEDGE_DELAY = 0.05
+DEFAULT_MAX_HEDGE_DELAY = 2.0
+DEFAULT_MAX_ATTEMPTS = 3
+DEFAULT_BASE_BACKOFF = 0.1
+DEFAULT_MAX_BACKOFF = 2.0
+DEFAULT_ATTEMPT_TIMEOUT = 5.0
+DEFAULT_DEADLINE = 10.0
+
+# Latency samples needed before the percentile is trusted to time hedges
+MIN_LATENCY_SAMPLES = 20
+# Hedges the budget can save up during quiet periods
+_MAX_HEDGE_TOKENS = 10.0
+
+RETRYABLE_STATUSES = frozenset({"UNAVAILABLE", "DEADLINE_EXCEEDED", "ABORTED"})
+# google.api_core exceptions for the statuses above
+_RETRYABLE_ERRORS = frozenset({"ServiceUnavailable", "DeadlineExceeded", "Aborted"})
+
+
+def is_retryable(error: BaseException) -> bool:
+    """Whether ``error`` is a transient failure worth another attempt."""
+    if isinstance(error, asyncio.TimeoutError) or type(error).__name__ in _RETRYABLE_ERRORS:
+        return True
+    code = getattr(error, "code", None)
+    if callable(code):
+        # grpc.aio.AioRpcError exposes its status code as a method
+        code = code()
+    return getattr(code, "name", None) in RETRYABLE_STATUSES
+
+
+class Resilience:
+    """Runs upstream calls with hedging, retries and deadlines.
+
+    Args:
+        name: Upstream name used for the metrics.
+        hedge_percentile: Latency percentile after which an attempt is hedged; 0 disables hedging.
+        hedge_budget: Hedges earned per call, i.e. the most extra load hedging may add.
+        min_hedge_delay: Shortest wait in seconds before hedging.
+        max_hedge_delay: Longest wait in seconds before hedging.
+        max_attempts: Attempts per call, the first one included.
+        base_backoff: Backoff ceiling in seconds before the first retry; doubles per retry.
+        max_backoff: Cap of the backoff ceiling in seconds.
+        attempt_timeout: Deadline in seconds of each attempt.
+        deadline: Deadline in seconds of the whole call, retries included.
+        rng: Source of the backoff jitter, for tests.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        hedge_percentile: float = DEFAULT_HEDGE_PERCENTILE,
+        hedge_budget: float = DEFAULT_HEDGE_BUDGET,
+        min_hedge_delay: float = DEFAULT_MIN_HEDGE_DELAY,
+        max_hedge_delay: float = DEFAULT_MAX_HEDGE_DELAY,
+        max_attempts: int = DEFAULT_MAX_ATTEMPTS,
+        base_backoff: float = DEFAULT_BASE_BACKOFF,
+        max_backoff: float = DEFAULT_MAX_BACKOFF,
+        attempt_timeout: float = DEFAULT_ATTEMPT_TIMEOUT,
+        deadline: float = DEFAULT_DEADLINE,
+        rng: Optional[random.Random] = None,
+    ) -> None:
+        self.name = name
+        self.hedge_percentile = hedge_percentile
+        self.hedge_budget = hedge_budget
+        self.min_hedge_delay = min_hedge_delay
+        self.max_hedge_delay = max_hedge_delay
+        self.max_attempts = max(1, max_attempts)
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self.attempt_timeout = attempt_timeout
+        self.deadline = deadline
+        self._rng = rng or random.Random()
+        self._hedge_tokens = 1.0
+        self._lock = threading.Lock()
+        self.counters = get_counters(f"resilience.{name}")
+
+    def hedge_delay(self, latency: Optional[Timings]) -> Optional[float]:
+        """Seconds to wait before hedging, or ``None`` to not hedge."""
+        if not self.hedge_percentile or latency is None or latency.count < MIN_LATENCY_SAMPLES:
+            return None
+        value_ms = latency.percentile(self.hedge_percentile)
+        if value_ms is None:
+            return None
+        return min(self.max_hedge_delay, max(self.min_hedge_delay, value_ms / 1000))
+
+    def backoff(self, retry: int) -> float:
+        """Full-jitter backoff before retry number ``retry`` (0-based)."""
+        return self._rng.uniform(0, min(self.max_backoff, self.base_backoff * 2 ** retry))
+
+    def _earn_hedge(self) -> None:
+        with self._lock:
+            self._hedge_tokens = min(_MAX_HEDGE_TOKENS, self._hedge_tokens + self.hedge_budget)
+
+    def _spend_hedge(self) -> bool:
+        with self._lock:
+            if self._hedge_tokens < 1:
+                return False
+            self._hedge_tokens -= 1
+            return True
+
+    async def _request(
+        self,
+        call: Callable[[float], Awaitable[T]],
+        budget: "_Budget",
+        limiter: Optional[RateLimiter],
+        sent: Optional[asyncio.Event] = None,
+    ) -> T:
+        """One request: wait for a turn under ``limiter``, then send it under its own deadline.
+
+        ``sent`` is set once the request leaves the queue. Only the request that
+        sets it, the attempt's first, stops its queueing from counting against
+        ``budget``.
+        """
+        queued_at = time.monotonic()
+
+        async def send() -> T:
+            nonlocal queued_at
+            if sent is not None:
+                budget.extend(time.monotonic() - queued_at)
+                sent.set()
+            timeout = min(self.attempt_timeout, budget.remaining())
+            try:
+                return await asyncio.wait_for(call(timeout), timeout)
+            finally:
+                # A throttled request queues again before it is resent
+                queued_at = time.monotonic()
+
+        if limiter is None:
+            return await send()
+        return await limiter.run(send)
+
+    async def _attempt(
+        self,
+        call: Callable[[float], Awaitable[T]],
+        budget: "_Budget",
+        hedge_delay: Optional[float],
+        limiter: Optional[RateLimiter],
+    ) -> T:
+        """One attempt: the request, plus a hedged duplicate if it is slow to answer."""
+        sent = asyncio.Event()
+        primary = asyncio.ensure_future(self._request(call, budget, limiter, sent))
+        if hedge_delay is None or hedge_delay >= self.attempt_timeout:
+            return await primary
+        started = [primary]
+        try:
+            # The hedge delay is a send latency, so its timer starts once the
+            # request is sent rather than while it waits for its turn
+            turn = asyncio.ensure_future(sent.wait())
+            await asyncio.wait([primary, turn], return_when=asyncio.FIRST_COMPLETED)
+            turn.cancel()
+            done, _ = await asyncio.wait(started, timeout=hedge_delay)
+            if not done:
+                if self._spend_hedge():
+                    self.counters.incr("hedges")
+                    # The hedge waits for a turn of its own before it is sent
+                    started.append(asyncio.ensure_future(self._request(call, budget, limiter)))
+                else:
+                    self.counters.incr("hedges_denied")
+            pending = set(started)
+            error: Optional[BaseException] = None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is not primary:
+                            self.counters.incr("hedge_wins")
+                        return task.result()
+                    error = task.exception()
+            # Every request of the attempt failed
+            raise error
+        finally:
+            for task in started:
+                if task.done():
+                    # Retrieved so a loser's failure isn't reported as never retrieved
+                    task.cancelled() or task.exception()
+                else:
+                    task.cancel()
+
+    async def call(
+        self,
+        call: Callable[[float], Awaitable[T]],
+        latency: Optional[Timings] = None,
+        limiter: Optional[RateLimiter] = None,
+    ) -> T:
+        """Run ``call`` (which takes its deadline in seconds) with hedging and retries.
+
+        Args:
+            call: Sends one request and takes the seconds it may take.
+            latency: Recent latencies of the call, deciding when to hedge.
+            limiter: Rate limiter every request, hedges included, waits for a
+                turn under. Deadlines and hedge timers start once a request is
+                sent, so time spent queued doesn't count against them.
+        """
+        self.counters.incr("calls")
+        self._earn_hedge()
+        budget = _Budget(self.deadline)
+        for attempt in itertools.count():
+            try:
+                return await self._attempt(call, budget, self.hedge_delay(latency), limiter)
+            except Exception as e:
+                if isinstance(e, asyncio.TimeoutError):
+                    self.counters.incr("timeouts")
+                if not is_retryable(e) or attempt + 1 >= self.max_attempts:
+                    raise
+                delay = self.backoff(attempt)
+                # Not worth retrying if the backoff alone would use up the deadline
+                if delay >= budget.remaining():
+                    raise
+                self.counters.incr("retries")
+                await asyncio.sleep(delay)
+
+
+class _Budget:
+    """What is left of a call's overall deadline, not counting time spent queued."""
+
+    def __init__(self, seconds: float) -> None:
+        self._give_up_at = time.monotonic() + seconds
+
+    def remaining(self) -> float:
+        return self._give_up_at - time.monotonic()
+
+    def extend(self, seconds: float) -> None:
+        self._give_up_at += seconds
+
+
+_resilience: Dict[str, Resilience] = {}
+_resilience_lock = threading.Lock()
+
+
+def _from_env(name: str) -> Resilience:
+    prefix = name.upper()
+    return Resilience(
+        name,
+        hedge_percentile=float(os.getenv(f"{prefix}_HEDGE_PERCENTILE", DEFAULT_HEDGE_PERCENTILE)),
+        hedge_budget=float(os.getenv(f"{prefix}_HEDGE_BUDGET", DEFAULT_HEDGE_BUDGET)),
+        max_attempts=int(os.getenv(f"{prefix}_MAX_ATTEMPTS", DEFAULT_MAX_ATTEMPTS)),
+        attempt_timeout=float(os.getenv(f"{prefix}_ATTEMPT_TIMEOUT", DEFAULT_ATTEMPT_TIMEOUT)),
+        deadline=float(os.getenv(f"{prefix}_DEADLINE", DEFAULT_DEADLINE)),
+    )
+
+
+def get_resilience(name: str) -> Resilience:
+    """Return the process-wide resilience settings for upstream ``name``, read from the environment."""
+    with _resilience_lock:
+        resilience = _resilience.get(name)
+        if resilience is None:
+            resilience = _resilience[name] = _from_env(name)
+        return resilience
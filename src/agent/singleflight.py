@@ -0,0 +1,110 @@
+"""Coalescing of identical concurrent upstream calls.
+
+When many runs ask for the same thing at the same moment (a trending
+destination), only the first caller for a key goes upstream; everyone else
+arriving while that call is in flight awaits the same result or exception.
+Nothing is remembered once the call finishes; that is the cache's job.
+"""
+
+import asyncio
+import threading
+from concurrent.futures import Future
+from typing import Awaitable, Callable, Dict, Hashable, Optional, Tuple, TypeVar
+
+from src.agent.metrics import Counters, get_counters
+
+T = TypeVar("T")
+
+
+class _Flight:
+    __slots__ = ("task", "waiters")
+
+    def __init__(self, task: asyncio.Task) -> None:
+        self.task = task
+        self.waiters = 0
+
+
+class SingleFlight:
+    """Share one in-flight coroutine between concurrent callers of the same key.
+
+    The shared call runs as its own task. A caller that is cancelled stops
+    waiting without disturbing the others; the shared call is only cancelled
+    once every caller waiting on it has gone.
+
+    Args:
+        counters: Where leader/coalesced counts are recorded.
+    """
+
+    def __init__(self, counters: Optional[Counters] = None) -> None:
+        self.counters = counters if counters is not None else get_counters("singleflight")
+        self._flights: Dict[Tuple[asyncio.AbstractEventLoop, Hashable], _Flight] = {}
+
+    def __len__(self) -> int:
+        return len(self._flights)
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[T]]) -> T:
+        """Return the result of ``fn()``, sharing it with concurrent callers of ``key``."""
+        flight_key = (asyncio.get_running_loop(), key)
+        flight = self._flights.get(flight_key)
+        if flight is None:
+            flight = _Flight(asyncio.ensure_future(fn()))
+            self._flights[flight_key] = flight
+            flight.task.add_done_callback(lambda _: self._forget(flight_key, flight))
+            self.counters.incr("leaders")
+        else:
+            self.counters.incr("coalesced")
+
+        flight.waiters += 1
+        try:
+            return await asyncio.shield(flight.task)
+        except asyncio.CancelledError:
+            if flight.waiters == 1 and not flight.task.done():
+                # Last interested caller left: stop the upstream call and make
+                # sure newcomers start a fresh one instead of joining it.
+                self._forget(flight_key, flight)
+                flight.task.cancel()
+                self.counters.incr("cancelled")
+            raise
+        finally:
+            flight.waiters -= 1
+
+    def _forget(self, flight_key: Tuple[asyncio.AbstractEventLoop, Hashable], flight: _Flight) -> None:
+        if self._flights.get(flight_key) is flight:
+            del self._flights[flight_key]
+
+
+class SyncSingleFlight:
+    """Thread-based counterpart of ``SingleFlight`` for blocking callables.
+
+    Args:
+        counters: Where leader/coalesced counts are recorded.
+    """
+
+    def __init__(self, counters: Optional[Counters] = None) -> None:
+        self.counters = counters if counters is not None else get_counters("singleflight")
+        self._flights: Dict[Hashable, Future] = {}
+        self._lock = threading.Lock()
+
+    def do(self, key: Hashable, fn: Callable[[], T]) -> T:
+        """Return the result of ``fn()``, sharing it with concurrent callers of ``key``."""
+        with self._lock:
+            future = self._flights.get(key)
+            leader = future is None
+            if leader:
+                future = self._flights[key] = Future()
+        if not leader:
+            self.counters.incr("coalesced")
+            return future.result()
+
+        self.counters.incr("leaders")
+        try:
+            result = fn()
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                del self._flights[key]
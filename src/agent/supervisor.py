@@ -0,0 +1,264 @@
+"""Supervisor graph that hands trip planning work to specialised sub-agents.
+
+Sub-agents are not built with the supervisor. Each one is represented by a
+``LazySubAgent`` that only constructs the real agent (model, tools, compiled
+graph) the first time the supervisor hands it work, and the built agents are
+cached by (agent, model) for every later run. Building the supervisor itself
+is cached per (model, mode) as well, so serving a run is a dictionary lookup
+once the process is warm.
+
+In ``sequential`` mode the supervisor hands off to one agent at a time. In
+``fan_out`` mode it dispatches independent tasks to several agents in one step
+via ``Send``; the agents run in parallel, each returns its answer as the result
+of its transfer call, and the supervisor assembles the plan once, so a full plan
+takes as long as the slowest agent instead of the sum of all of them. An agent
+that fails answers its call with an error result instead of failing the run.
+"""
+
+import logging
+import threading
+from typing import Any, Callable, Dict, List, Literal, Optional, Tuple, TypedDict, Union
+
+from langchain_core.messages import HumanMessage, SystemMessage, ToolMessage
+from langchain_core.runnables import RunnableConfig, RunnableLambda
+from langgraph.errors import GraphBubbleUp
+from langgraph.graph import END, START, MessagesState, StateGraph
+from langgraph.graph.state import CompiledStateGraph
+from langgraph.types import Send
+from langgraph_supervisor import create_supervisor
+
+from src.agent.agents import (
+    create_logistics_agent,
+    create_poi_agent,
+    create_research_agent,
+    create_restaurant_finder,
+)
+from src.agent.configuration import Configuration
+from src.agent.metrics import get_counters
+from src.agent.prompts import FAN_OUT_DISPATCH_PROMPT, TRIP_ASSISTANT_PROMPT
+from src.agent.utils import get_message_text, load_chat_model
+
+SUPERVISOR_NAME = "trip_planner_supervisor"
+
+SupervisorMode = Literal["sequential", "fan_out"]
+
+# Sub-agent name -> factory; names must match the ``name`` each factory gives its agent
+SUB_AGENTS: Dict[str, Callable[[str], Any]] = {
+    "logistics_agent": create_logistics_agent,
+    "restaurant_finder": create_restaurant_finder,
+    "poi_agent": create_poi_agent,
+    "research_agent": create_research_agent,
+}
+
+SUB_AGENT_DESCRIPTIONS: Dict[str, str] = {
+    "logistics_agent": "Finds flights and hotels.",
+    "restaurant_finder": "Finds restaurants matching cuisine, price range and location.",
+    "poi_agent": "Finds points of interest such as museums, parks and landmarks.",
+    "research_agent": "Researches anything else on the web: events, visas, transport, local tips.",
+}
+
+_sub_agents: Dict[Tuple[str, str], Any] = {}
+_supervisors: Dict[Tuple[str, str], CompiledStateGraph] = {}
+_lock = threading.Lock()
+_counters = get_counters("supervisor")
+
+logger = logging.getLogger(__name__)
+
+
+def get_sub_agent(name: str, model: str) -> Any:
+    """Return the sub-agent ``name`` for ``model``, building it on first use."""
+    key = (name, model)
+    agent = _sub_agents.get(key)
+    if agent is None:
+        with _lock:
+            agent = _sub_agents.get(key)
+            if agent is None:
+                _counters.incr("sub_agents_built")
+                agent = _sub_agents[key] = SUB_AGENTS[name](model)
+    return agent
+
+
+class LazySubAgent:
+    """Stands in for a sub-agent graph until the supervisor first calls it.
+
+    The supervisor only needs an agent's name to create its handoff tool and
+    calls ``invoke``/``ainvoke`` when it hands work over.
+    """
+
+    def __init__(self, name: str, model: str) -> None:
+        self.name = name
+        self.model = model
+
+    @property
+    def agent(self) -> Any:
+        """The real sub-agent, built on first access."""
+        return get_sub_agent(self.name, self.model)
+
+    def invoke(self, input: Any, config: Optional[RunnableConfig] = None, **kwargs: Any) -> Any:
+        return self.agent.invoke(input, config, **kwargs)
+
+    async def ainvoke(self, input: Any, config: Optional[RunnableConfig] = None, **kwargs: Any) -> Any:
+        return await self.agent.ainvoke(input, config, **kwargs)
+
+
+def build_supervisor_graph(model: str) -> CompiledStateGraph:
+    """Build the supervisor graph for ``model`` without building any sub-agent."""
+    return create_supervisor(
+        agents=[LazySubAgent(name, model) for name in SUB_AGENTS],
+        model=load_chat_model(model),
+        config_schema=Configuration,
+        # parallel_tool_calls=True,
+        # output_mode="last_message",
+        include_agent_name=None,
+        supervisor_name=SUPERVISOR_NAME,
+        prompt=TRIP_ASSISTANT_PROMPT,
+    ).compile(name=SUPERVISOR_NAME)
+
+
+def _transfer_tool_name(agent_name: str) -> str:
+    return f"transfer_to_{agent_name}"
+
+
+def _transfer_tool(agent_name: str) -> Dict[str, Any]:
+    return {
+        "type": "function",
+        "function": {
+            "name": _transfer_tool_name(agent_name),
+            "description": f"Hand a task to {agent_name}. {SUB_AGENT_DESCRIPTIONS.get(agent_name, '')}".strip(),
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "task": {"type": "string", "description": "Self-contained description of the work to do."},
+                },
+                "required": ["task"],
+            },
+        },
+    }
+
+
+class AgentTask(TypedDict):
+    """Work sent to one sub-agent in fan-out mode."""
+
+    task: str
+    tool_call_id: str
+    tool_name: str
+
+
+def _make_fan_out_agent_node(agent: LazySubAgent) -> RunnableLambda:
+    def _result(task: AgentTask, output: Dict[str, Any]) -> Dict[str, List[ToolMessage]]:
+        # The answer is the transfer call's result, so the supervisor sees which task it belongs to
+        return {"messages": [ToolMessage(
+            content=get_message_text(output["messages"][-1]),
+            name=task["tool_name"],
+            tool_call_id=task["tool_call_id"],
+        )]}
+
+    def _error(task: AgentTask, error: Exception) -> Dict[str, List[ToolMessage]]:
+        if isinstance(error, GraphBubbleUp):
+            # Interrupts and other graph control flow must reach the runtime
+            raise error
+        # One failed agent must not lose the others' answers; the supervisor plans around it
+        _counters.incr("sub_agent_errors")
+        logger.warning(f"Sub-agent {agent.name} failed: {error!r}")
+        return {"messages": [ToolMessage(
+            content=f"Error: {error!r}\n Please fix your mistakes.",
+            name=task["tool_name"],
+            tool_call_id=task["tool_call_id"],
+            status="error",
+        )]}
+
+    def call_agent(task: AgentTask, config: RunnableConfig) -> Dict[str, List[ToolMessage]]:
+        try:
+            output = agent.invoke({"messages": [HumanMessage(task["task"])]}, config)
+        except Exception as e:
+            return _error(task, e)
+        return _result(task, output)
+
+    async def acall_agent(task: AgentTask, config: RunnableConfig) -> Dict[str, List[ToolMessage]]:
+        try:
+            output = await agent.ainvoke({"messages": [HumanMessage(task["task"])]}, config)
+        except Exception as e:
+            return _error(task, e)
+        return _result(task, output)
+
+    return RunnableLambda(call_agent, afunc=acall_agent, name=agent.name)
+
+
+def build_fan_out_supervisor_graph(model: str) -> CompiledStateGraph:
+    """Build a supervisor that sends independent tasks to several sub-agents at once.
+
+    ``dispatch`` lets the model call several transfer tools in one message,
+    each call is sent to its agent with ``Send`` so they run in the same step,
+    their answers are merged into the shared messages and ``assemble`` writes
+    the final plan once all of them are back.
+    """
+    agents = {_transfer_tool_name(name): LazySubAgent(name, model) for name in SUB_AGENTS}
+    dispatcher = load_chat_model(model).bind_tools(
+        [_transfer_tool(name) for name in SUB_AGENTS], parallel_tool_calls=True
+    )
+    assembler = load_chat_model(model)
+
+    async def dispatch(state: MessagesState, config: RunnableConfig) -> Dict[str, Any]:
+        response = await dispatcher.ainvoke([SystemMessage(FAN_OUT_DISPATCH_PROMPT), *state["messages"]], config)
+        # Calls to unknown tools would never get a result the model API requires
+        response.tool_calls = [call for call in response.tool_calls if call["name"] in agents]
+        response.additional_kwargs.pop("tool_calls", None)
+        response.name = SUPERVISOR_NAME
+        return {"messages": [response]}
+
+    def route(state: MessagesState) -> Union[str, List[Send]]:
+        tool_calls = state["messages"][-1].tool_calls
+        if not tool_calls:
+            return END
+        return [
+            Send(agents[call["name"]].name, AgentTask(
+                task=call["args"].get("task", ""), tool_call_id=call["id"], tool_name=call["name"],
+            ))
+            for call in tool_calls
+        ]
+
+    async def assemble(state: MessagesState, config: RunnableConfig) -> Dict[str, Any]:
+        response = await assembler.ainvoke([SystemMessage(TRIP_ASSISTANT_PROMPT), *state["messages"]], config)
+        response.name = SUPERVISOR_NAME
+        return {"messages": [response]}
+
+    builder = StateGraph(MessagesState, config_schema=Configuration)
+    builder.add_node("dispatch", dispatch)
+    builder.add_node("assemble", assemble)
+    builder.add_edge(START, "dispatch")
+    builder.add_conditional_edges("dispatch", route, [agent.name for agent in agents.values()] + [END])
+    for agent in agents.values():
+        builder.add_node(agent.name, _make_fan_out_agent_node(agent))
+        builder.add_edge(agent.name, "assemble")
+    builder.add_edge("assemble", END)
+    return builder.compile(name=SUPERVISOR_NAME)
+
+
+_BUILDERS: Dict[str, Callable[[str], CompiledStateGraph]] = {
+    "sequential": build_supervisor_graph,
+    "fan_out": build_fan_out_supervisor_graph,
+}
+
+
+def get_supervisor_graph(model: str, mode: SupervisorMode = "sequential") -> CompiledStateGraph:
+    """Return the cached supervisor graph for ``model`` in ``mode``."""
+    key = (model, mode)
+    graph = _supervisors.get(key)
+    if graph is not None:
+        _counters.incr("hits")
+        return graph
+    with _lock:
+        graph = _supervisors.get(key)
+        if graph is None:
+            _counters.incr("misses")
+            graph = _supervisors[key] = _BUILDERS[mode](model)
+    return graph
+
+
+async def create_trip_planner_supervisor(config: RunnableConfig) -> CompiledStateGraph:
+    """Graph factory for the supervisor assistant."""
+    configurable = config.get("configurable", {})
+    return get_supervisor_graph(
+        configurable.get("model", "openai/gpt-4o-mini"),
+        configurable.get("supervisor_mode", "sequential"),
+    )
@@ -0,0 +1,171 @@
+"""Shared, connection-pooled client for the Tavily search API.
+
+``TavilySearch`` opens a new HTTP session for every call and only offers a
+blocking ``invoke`` to sync tools. This client keeps one pooled
+``httpx.Client`` for sync callers and one ``httpx.AsyncClient`` per event
+loop for async callers, so weather and flight lookups reuse warm keep-alive
+connections and never block a server worker thread. Every search goes through
+the shared ``tavily`` rate limiter.
+"""
+
+import asyncio
+import os
+import threading
+import weakref
+from typing import Any, Dict, Optional
+
+import httpx
+
+from src.agent.rate_limit import RateLimiter, get_rate_limiter
+
+TAVILY_API_URL = "https://api.tavily.com"
+DEFAULT_TIMEOUT = 10.0
+DEFAULT_MAX_CONNECTIONS = 20
+
+
+class TavilyError(ValueError):
+    """Raised when the Tavily API answers with an error status."""
+
+    def __init__(self, status_code: int, message: str) -> None:
+        super().__init__(f"Error {status_code}: {message}")
+        self.status_code = status_code
+
+
+class TavilyClient:
+    """Tavily search over pooled HTTP connections.
+
+    Args:
+        api_key: Tavily API key. Defaults to ``TAVILY_API_KEY``.
+        timeout: Per-request timeout in seconds. Defaults to ``TAVILY_TIMEOUT`` or 10.
+        max_connections: Connection pool size per client. Defaults to
+            ``TAVILY_MAX_CONNECTIONS`` or 20.
+        base_url: API root.
+        transport: Optional httpx transport shared by both clients, for tests.
+        rate_limiter: Limiter searches wait on. Defaults to the process-wide ``tavily`` limiter.
+    """
+
+    def __init__(
+        self,
+        api_key: Optional[str] = None,
+        timeout: Optional[float] = None,
+        max_connections: Optional[int] = None,
+        base_url: str = TAVILY_API_URL,
+        transport: Optional[Any] = None,
+        rate_limiter: Optional[RateLimiter] = None,
+    ) -> None:
+        if timeout is None:
+            timeout = float(os.getenv("TAVILY_TIMEOUT", DEFAULT_TIMEOUT))
+        if max_connections is None:
+            max_connections = int(os.getenv("TAVILY_MAX_CONNECTIONS", DEFAULT_MAX_CONNECTIONS))
+        self._api_key = api_key
+        self.timeout = timeout
+        self.max_connections = max_connections
+        self.base_url = base_url
+        self._transport = transport
+        self.rate_limiter = rate_limiter or get_rate_limiter("tavily")
+        self._sync_client: Optional[httpx.Client] = None
+        self._async_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, httpx.AsyncClient]" = (
+            weakref.WeakKeyDictionary()
+        )
+        self._lock = threading.Lock()
+
+    def _client_options(self) -> Dict[str, Any]:
+        options: Dict[str, Any] = dict(
+            base_url=self.base_url,
+            timeout=self.timeout,
+            limits=httpx.Limits(
+                max_connections=self.max_connections,
+                max_keepalive_connections=self.max_connections,
+            ),
+        )
+        if self._transport is not None:
+            options["transport"] = self._transport
+        return options
+
+    def _headers(self) -> Dict[str, str]:
+        # Read lazily so a key loaded from .env after import is still picked up
+        api_key = self._api_key or os.getenv("TAVILY_API_KEY", "")
+        return {"Authorization": f"Bearer {api_key}"}
+
+    @property
+    def sync_client(self) -> httpx.Client:
+        """The pooled client shared by blocking callers."""
+        if self._sync_client is None:
+            with self._lock:
+                if self._sync_client is None:
+                    self._sync_client = httpx.Client(**self._client_options())
+        return self._sync_client
+
+    @property
+    def async_client(self) -> httpx.AsyncClient:
+        """The pooled client of the running event loop."""
+        loop = asyncio.get_running_loop()
+        client = self._async_clients.get(loop)
+        if client is None:
+            with self._lock:
+                client = self._async_clients.get(loop)
+                if client is None:
+                    client = self._async_clients[loop] = httpx.AsyncClient(**self._client_options())
+        return client
+
+    @staticmethod
+    def _payload(query: str, max_results: int, params: Dict[str, Any]) -> Dict[str, Any]:
+        return {"query": query, "max_results": max_results, "topic": "general", **params}
+
+    @staticmethod
+    def _result(response: httpx.Response) -> Dict[str, Any]:
+        if response.status_code != 200:
+            try:
+                detail = response.json().get("detail", {})
+            except ValueError:
+                detail = {}
+            message = detail.get("error") if isinstance(detail, dict) else None
+            raise TavilyError(response.status_code, message or response.reason_phrase)
+        return response.json()
+
+    def search(self, query: str, max_results: int = 3, **params: Any) -> Dict[str, Any]:
+        """Run a Tavily search and return the raw JSON response."""
+
+        def send() -> Dict[str, Any]:
+            response = self.sync_client.post(
+                "/search", json=self._payload(query, max_results, params), headers=self._headers()
+            )
+            return self._result(response)
+
+        return self.rate_limiter.run_sync(send)
+
+    async def asearch(self, query: str, max_results: int = 3, **params: Any) -> Dict[str, Any]:
+        """Run a Tavily search without blocking and return the raw JSON response."""
+
+        async def send() -> Dict[str, Any]:
+            response = await self.async_client.post(
+                "/search", json=self._payload(query, max_results, params), headers=self._headers()
+            )
+            return self._result(response)
+
+        return await self.rate_limiter.run(send)
+
+    async def aclose(self) -> None:
+        """Close the running loop's async client and the sync client."""
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            async_client = self._async_clients.pop(loop, None)
+            sync_client, self._sync_client = self._sync_client, None
+        if async_client is not None:
+            await async_client.aclose()
+        if sync_client is not None:
+            sync_client.close()
+
+
+_default_client: Optional[TavilyClient] = None
+_default_client_lock = threading.Lock()
+
+
+def get_tavily_client() -> TavilyClient:
+    """Return the process-wide Tavily client."""
+    global _default_client
+    if _default_client is None:
+        with _default_client_lock:
+            if _default_client is None:
+                _default_client = TavilyClient()
+    return _default_client
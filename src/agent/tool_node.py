@@ -0,0 +1,238 @@
+"""Graph node that runs all tool calls of an AI message concurrently.
+
+When the model asks for hotels, restaurants and attractions in one message,
+the calls are independent, so they are started together instead of one after
+another. Each tool can be capped to a number of simultaneous calls and given a
+timeout; a call that fails or times out becomes an error ``ToolMessage`` while
+the other results are still returned, in the order the model requested them.
+Tools that take ``InjectedState`` get the node's input state, as with
+langgraph's ``ToolNode``.
+
+Async runs gather the calls on the running loop. Blocking runs give each call
+a thread of its own rather than starting an event loop per run: tools with a
+sync implementation are called with ``invoke``, async-only tools on one
+long-lived background loop, so the loop-bound clients they open (gRPC
+channels, httpx pools) are opened once.
+"""
+
+import asyncio
+import logging
+import threading
+import time
+import weakref
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import nullcontext
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from langchain_core.messages import AIMessage, ToolCall, ToolMessage
+from langchain_core.runnables import RunnableConfig, RunnableLambda
+from langchain_core.tools import BaseTool
+from langgraph.errors import GraphBubbleUp
+from langgraph.prebuilt import InjectedState
+
+from src.agent.metrics import get_counters, get_timings
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TOOL_TIMEOUT = 30.0
+
+
+_loop: Optional[asyncio.AbstractEventLoop] = None
+_loop_lock = threading.Lock()
+
+
+def _background_loop() -> asyncio.AbstractEventLoop:
+    """The process-wide event loop async-only tools run on when called from blocking code."""
+    global _loop
+    with _loop_lock:
+        if _loop is None:
+            _loop = asyncio.new_event_loop()
+            threading.Thread(target=_loop.run_forever, name="tool-node-loop", daemon=True).start()
+        return _loop
+
+
+def _async_only(tool: BaseTool) -> bool:
+    return getattr(tool, "func", True) is None and getattr(tool, "coroutine", None) is not None
+
+
+def _state_args(tool: BaseTool) -> Dict[str, Optional[str]]:
+    """Arguments of ``tool`` annotated ``InjectedState``, mapped to the state key they take
+    (``None`` for the whole state)."""
+    args: Dict[str, Optional[str]] = {}
+    for arg, field in getattr(tool.args_schema, "model_fields", {}).items():
+        for marker in field.metadata:
+            if marker is InjectedState:
+                args[arg] = None
+            elif isinstance(marker, InjectedState):
+                args[arg] = marker.field
+    return args
+
+
+class ConcurrentToolNode(RunnableLambda):
+    """Run the tool calls of the last ``AIMessage`` concurrently.
+
+    Args:
+        tools: Tools the model may call.
+        max_concurrency: Maximum simultaneous calls per tool name; tools not
+            listed are unbounded.
+        timeouts: Timeout in seconds per tool name.
+        default_timeout: Timeout for tools missing from ``timeouts``; ``None``
+            waits forever.
+        name: Node name.
+    """
+
+    def __init__(
+        self,
+        tools: Sequence[BaseTool],
+        max_concurrency: Optional[Dict[str, int]] = None,
+        timeouts: Optional[Dict[str, float]] = None,
+        default_timeout: Optional[float] = DEFAULT_TOOL_TIMEOUT,
+        name: str = "tools",
+    ) -> None:
+        super().__init__(self._run, afunc=self._arun, name=name)
+        self.tools_by_name = {tool.name: tool for tool in tools}
+        self.state_args = {tool.name: args for tool in tools if (args := _state_args(tool))}
+        self.max_concurrency = dict(max_concurrency or {})
+        self.timeouts = dict(timeouts or {})
+        self.default_timeout = default_timeout
+        self.counters = get_counters("tool_node")
+        # asyncio semaphores belong to one event loop
+        self._semaphores: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[str, asyncio.Semaphore]]" = (
+            weakref.WeakKeyDictionary()
+        )
+        self._thread_semaphores = {
+            tool_name: threading.BoundedSemaphore(limit) for tool_name, limit in self.max_concurrency.items()
+        }
+
+    def _semaphore(self, tool_name: str) -> Optional[asyncio.Semaphore]:
+        limit = self.max_concurrency.get(tool_name)
+        if limit is None:
+            return None
+        semaphores = self._semaphores.setdefault(asyncio.get_running_loop(), {})
+        semaphore = semaphores.get(tool_name)
+        if semaphore is None:
+            semaphore = semaphores[tool_name] = asyncio.Semaphore(limit)
+        return semaphore
+
+    @staticmethod
+    def _tool_calls(inputs: Any) -> List[ToolCall]:
+        messages = inputs if isinstance(inputs, list) else inputs.get("messages", [])
+        if not messages:
+            raise ValueError("No message found in input")
+        message = messages[-1]
+        if not isinstance(message, AIMessage):
+            raise ValueError("Last message is not an AIMessage")
+        return message.tool_calls
+
+    def _with_state(self, tool_call: ToolCall, inputs: Any) -> Dict[str, Any]:
+        request = {**tool_call, "type": "tool_call"}
+        state_args = self.state_args.get(tool_call["name"])
+        if not state_args:
+            return request
+        state = inputs if isinstance(inputs, dict) else {"messages": inputs}
+        injected = {arg: state if key is None else state.get(key) for arg, key in state_args.items()}
+        return {**request, "args": {**tool_call["args"], **injected}}
+
+    def _run(self, inputs: Any, config: RunnableConfig) -> Dict[str, List[ToolMessage]]:
+        tool_calls = self._tool_calls(inputs)
+        executor = ThreadPoolExecutor(max_workers=max(1, len(tool_calls)), thread_name_prefix=self.name)
+        try:
+            started = [self._submit(executor, tool_call, inputs, config) for tool_call in tool_calls]
+            return {"messages": [self._result(tool_call, *call) for tool_call, call in zip(tool_calls, started)]}
+        finally:
+            # A call that timed out can't be stopped; leave its thread to finish on its own
+            executor.shutdown(wait=False)
+
+    def _submit(
+        self, executor: ThreadPoolExecutor, tool_call: ToolCall, inputs: Any, config: RunnableConfig
+    ) -> Tuple[Optional[Future], threading.Event, List[float]]:
+        """Start one blocking call; the event is set, and its start time recorded, once it has a slot."""
+        name = tool_call["name"]
+        tool = self.tools_by_name.get(name)
+        started = threading.Event()
+        started_at: List[float] = []
+        if tool is None:
+            return None, started, started_at
+
+        def call() -> Any:
+            with self._thread_semaphores.get(name) or nullcontext():
+                started_at.append(time.monotonic())
+                started.set()
+                request = self._with_state(tool_call, inputs)
+                with get_timings(f"tools.{name}").time():
+                    if _async_only(tool):
+                        return asyncio.run_coroutine_threadsafe(tool.ainvoke(request, config), _background_loop()).result()
+                    return tool.invoke(request, config)
+
+        return executor.submit(call), started, started_at
+
+    def _result(
+        self, tool_call: ToolCall, future: Optional[Future], started: threading.Event, started_at: List[float]
+    ) -> ToolMessage:
+        """Wait for a call started by ``_submit``; its timeout runs from when it got a slot."""
+        if future is None:
+            return self._unknown_tool(tool_call)
+        timeout = self.timeouts.get(tool_call["name"], self.default_timeout)
+        try:
+            started.wait()
+            remaining = None if timeout is None else max(0.0, started_at[0] + timeout - time.monotonic())
+            output = future.result(remaining)
+        except Exception as e:
+            return self._outcome(tool_call, timeout, error=e)
+        return self._outcome(tool_call, timeout, output)
+
+    async def _arun(self, inputs: Any, config: RunnableConfig) -> Dict[str, List[ToolMessage]]:
+        tool_calls = self._tool_calls(inputs)
+        outputs = await asyncio.gather(*(self._call(tool_call, inputs, config) for tool_call in tool_calls))
+        return {"messages": list(outputs)}
+
+    async def _call(self, tool_call: ToolCall, inputs: Any, config: RunnableConfig) -> ToolMessage:
+        name = tool_call["name"]
+        tool = self.tools_by_name.get(name)
+        if tool is None:
+            return self._unknown_tool(tool_call)
+
+        timeout = self.timeouts.get(name, self.default_timeout)
+        semaphore = self._semaphore(name)
+        try:
+            async with semaphore or nullcontext():
+                with get_timings(f"tools.{name}").time():
+                    output = await asyncio.wait_for(tool.ainvoke(self._with_state(tool_call, inputs), config), timeout)
+        except Exception as e:
+            return self._outcome(tool_call, timeout, error=e)
+        return self._outcome(tool_call, timeout, output)
+
+    def _outcome(
+        self, tool_call: ToolCall, timeout: Optional[float], output: Any = None, error: Optional[Exception] = None
+    ) -> ToolMessage:
+        """The ``ToolMessage`` for a call's output, or for the error it failed with."""
+        name = tool_call["name"]
+        if isinstance(error, GraphBubbleUp):
+            # Interrupts and other graph control flow must reach the runtime
+            raise error
+        if isinstance(error, (asyncio.TimeoutError, TimeoutError)):
+            self.counters.incr("timeouts")
+            logger.warning(f"Tool {name} timed out after {timeout}s")
+            return self._error(tool_call, f"Error: {name} timed out after {timeout}s, please try again.")
+        if error is not None:
+            self.counters.incr("errors")
+            logger.warning(f"Tool {name} failed: {error!r}")
+            return self._error(tool_call, f"Error: {error!r}\n Please fix your mistakes.")
+
+        self.counters.incr("calls")
+        if isinstance(output, ToolMessage):
+            return output
+        # Invoked with a tool call, tools answer with a ToolMessage; wrap anything else
+        return ToolMessage(content=str(output), name=name, tool_call_id=tool_call["id"])
+
+    def _unknown_tool(self, tool_call: ToolCall) -> ToolMessage:
+        self.counters.incr("errors")
+        return self._error(
+            tool_call,
+            f"Error: {tool_call['name']} is not a valid tool, try one of [{', '.join(self.tools_by_name)}].",
+        )
+
+    @staticmethod
+    def _error(tool_call: ToolCall, content: str) -> ToolMessage:
+        return ToolMessage(content=content, name=tool_call["name"], tool_call_id=tool_call["id"], status="error")
+
@@ -1,47 +1,265 @@
-from langchain_core.tools import tool
-from langchain_tavily import TavilySearch
-from typing import Literal, Callable, Any
+from langchain_core.runnables import RunnableConfig
+from langchain_core.tools import StructuredTool, tool
+from langgraph.prebuilt import InjectedState
+from typing import Annotated, Awaitable, Literal, Callable, Any, List, Optional, Sequence, Tuple
+from pydantic import BaseModel, Field
 
-from src.agent.google_places_client import text_search_attractions, text_search_hotels, text_search_restaurants 
+from src.agent.google_places_client import DEFAULT_FIELD_MASK_TIER, DEFAULT_NEARBY_RADIUS_METERS, FieldMaskTier, SearchArea, haversine_meters, text_search_attractions, text_search_hotels, text_search_places_batch, text_search_restaurants 
+from src.agent.place_handles import place_handle
+from src.agent.metrics import get_counters
+from src.agent.place_records import to_records
+from src.agent.place_registry import (
+    PlaceRegistry,
+    chosen_hotel,
+    known_search,
+    place_delta,
+    place_location,
+    registry_from_state,
+    render_known,
+    render_new_and_known,
+    search_key,
+)
+from src.agent.singleflight import SingleFlight, SyncSingleFlight
+from src.agent.tavily_client import get_tavily_client
 
-@tool
-def search_weather(location: str, date: str = None) -> str:
-    """Search for current weather information in a specific location on a specific date."""
-    tavily = TavilySearch(max_results=3)
+# Identical Tavily searches in flight at the same time share one upstream request
+_tavily_flights = SyncSingleFlight(get_counters("tavily_singleflight"))
+_tavily_async_flights = SingleFlight(get_counters("tavily_singleflight"))
+
+def _tavily_key(query: str, max_results: int) -> tuple:
+    return (" ".join(query.lower().split()), max_results)
+
+def _tavily_search(query: str, max_results: int = 3) -> dict:
+    """Run a Tavily search, coalescing identical concurrent queries."""
+    try:
+        return _tavily_flights.do(
+            _tavily_key(query, max_results),
+            lambda: get_tavily_client().search(query, max_results=max_results),
+        )
+    except Exception as e:
+        # Same contract as TavilySearch: report the failure to the model instead of raising
+        return {"error": str(e)}
+
+async def _atavily_search(query: str, max_results: int = 3) -> dict:
+    """Run a Tavily search without blocking, coalescing identical concurrent queries."""
+    try:
+        return await _tavily_async_flights.do(
+            _tavily_key(query, max_results),
+            lambda: get_tavily_client().asearch(query, max_results=max_results),
+        )
+    except Exception as e:
+        return {"error": str(e)}
+
+def _weather_query(location: str, date: Optional[str]) -> str:
     if date:
-        return tavily.invoke(f"Weather in {location} on {date}")
-    else:
-        return tavily.invoke(f"Weather in {location}")
+        return f"Weather in {location} on {date}"
+    return f"Weather in {location}"
 
-@tool
-def search_flights(origin: str, destination: str, dates: str) -> str:
-    """Search for flight options between two locations on specific dates."""
-    tavily = TavilySearch(max_results=3)
+def _flights_query(origin: str, destination: str, dates: Optional[str]) -> str:
     if dates:
-        return tavily.invoke(f"Flight options from {origin} to {destination} on {dates}")
+        return f"Flight options from {origin} to {destination} on {dates}"
+    return f"Flight options from {origin} to {destination}"
+
+def _search_weather(location: str, date: str = None) -> dict:
+    """Search for current weather information in a specific location on a specific date."""
+    return _tavily_search(_weather_query(location, date))
+
+async def _asearch_weather(location: str, date: str = None) -> dict:
+    """Search for current weather information in a specific location on a specific date."""
+    return await _atavily_search(_weather_query(location, date))
+
+def _search_flights(origin: str, destination: str, dates: str) -> dict:
+    """Search for flight options between two locations on specific dates."""
+    return _tavily_search(_flights_query(origin, destination, dates))
+
+async def _asearch_flights(origin: str, destination: str, dates: str) -> dict:
+    """Search for flight options between two locations on specific dates."""
+    return await _atavily_search(_flights_query(origin, destination, dates))
+
+# Native async tools that keep a sync implementation for callers using .invoke
+search_weather = StructuredTool.from_function(
+    func=_search_weather, coroutine=_asearch_weather, name="search_weather"
+)
+search_flights = StructuredTool.from_function(
+    func=_search_flights, coroutine=_asearch_flights, name="search_flights"
+)
+
+def _field_mask_tier(config: RunnableConfig, tool_name: str) -> FieldMaskTier:
+    """Resolve the Places field-mask tier for a tool from the assistant configuration."""
+    configurable = (config or {}).get("configurable", {})
+    tool_tiers = configurable.get("tool_field_mask_tiers") or {}
+    return tool_tiers.get(tool_name) or configurable.get("places_field_mask_tier", DEFAULT_FIELD_MASK_TIER)
+
+NearArg = Annotated[
+    Optional[str],
+    "Ref of a place to search around, e.g. the chosen hotel, or the comma-separated refs of one day's places "
+    "to search around their centre. Defaults to the hotel already chosen for this location, if any.",
+]
+RadiusArg = Annotated[Optional[int], "Radius of the search area in meters (default 1500)"]
+RestrictArg = Annotated[bool, "Only return places inside the search area instead of ranking them first"]
+
+def _nearby_area(
+    state: Optional[dict],
+    location: str,
+    near: Optional[str],
+    radius_meters: Optional[int],
+    restrict: bool,
+) -> Tuple[Optional[SearchArea], List[str]]:
+    """Resolve the area of a nearby search and the refs it is centred on.
+
+    Without ``near`` the search is centred on the hotel chosen for ``location``;
+    places without known coordinates are ignored, and with none left the
+    search covers the whole location.
+    """
+    registry = registry_from_state(state)
+    if near:
+        refs = [ref.strip().lstrip("@") for ref in near.split(",") if ref.strip()]
     else:
-        return tavily.invoke(f"Flight options from {origin} to {destination}")
+        hotel = chosen_hotel(state, location)
+        refs = [place_handle(hotel)] if hotel else []
+    located = [(ref, point) for ref, point in ((ref, place_location(registry, ref)) for ref in refs) if point]
+    if not located:
+        return None, []
+    lat = sum(point[0] for _, point in located) / len(located)
+    lng = sum(point[1] for _, point in located) / len(located)
+    # Wide enough to take in every place it is centred on
+    spread = max(haversine_meters(lat, lng, *point) for _, point in located)
+    radius = max(radius_meters or DEFAULT_NEARBY_RADIUS_METERS, spread)
+    area = SearchArea(lat, lng, radius, "restrict" if restrict else "bias").normalized()
+    return area, [ref for ref, _ in located]
 
-@tool
+def _area_note(area: SearchArea, refs: List[str]) -> str:
+    around = ", ".join(refs)
+    if area.mode == "restrict":
+        return f"Results limited to {area.radius_meters:.0f} m around {around}"
+    return f"Results within {area.radius_meters:.0f} m of {around} ranked first"
+
+async def _search(
+    tool_name: str,
+    location: str,
+    detail: Optional[str],
+    tier: FieldMaskTier,
+    state: Optional[dict],
+    search: Callable[[], Awaitable[list]],
+    area: Optional[SearchArea] = None,
+    area_refs: Sequence[str] = (),
+) -> Tuple[str, Optional[PlaceRegistry]]:
+    """Run a place search unless the thread's place registry already has its results."""
+    registry = registry_from_state(state)
+    if area is not None:
+        # Searches around different centres return different places
+        detail = f"{detail or ''} near {area.latitude},{area.longitude} {area.radius_meters:.0f}m {area.mode}"
+    key = search_key(tool_name, location, detail, tier)
+    known = known_search(registry, key)
+    if known is not None:
+        content, delta = render_known(registry, known), None
+    else:
+        records = to_records(await search())
+        content, delta = render_new_and_known(records, registry, tier), place_delta({key: records})
+    if area is not None:
+        content = f"{_area_note(area, list(area_refs))}\n{content}"
+    return content, delta
+
+@tool(response_format="content_and_artifact")
 async def search_hotels(
     location: str, 
-    accommodation_type: Literal['lodging', 'hotel', 'guest_house', 'bed_and_breakfast', 'resort'] = None
-) -> str:
+    accommodation_type: Literal['lodging', 'hotel', 'guest_house', 'bed_and_breakfast', 'resort'] = None,
+    config: RunnableConfig = None,
+    state: Annotated[dict, InjectedState] = None,
+) -> Tuple[str, Optional[PlaceRegistry]]:
     """Search for hotels and accommodation options in a specific location."""
-    return await text_search_hotels(location, accommodation_type)
+    tier = _field_mask_tier(config, "search_hotels")
+    return await _search(
+        "search_hotels", location, accommodation_type, tier, state,
+        lambda: text_search_hotels(location, accommodation_type, tier=tier),
+    )
+
+@tool(response_format="content_and_artifact")
+async def search_attractions(
+    location: str,
+    attraction_type: str = "tourist_attraction",
+    near: NearArg = None,
+    radius_meters: RadiusArg = None,
+    restrict_to_area: RestrictArg = False,
+    config: RunnableConfig = None,
+    state: Annotated[dict, InjectedState] = None,
+) -> Tuple[str, Optional[PlaceRegistry]]:
+    """Search for tourist attractions and points of interest in a specific location.
 
-@tool
-async def search_attractions(location: str, attraction_type: str = "tourist_attraction") -> str:
-    """Search for tourist attractions and points of interest in a specific location."""
-    return await text_search_attractions(location, attraction_type)
+    Results close to the chosen hotel, or to the places given in `near`, are ranked first.
+    """
+    tier = _field_mask_tier(config, "search_attractions")
+    area, refs = _nearby_area(state, location, near, radius_meters, restrict_to_area)
+    return await _search(
+        "search_attractions", location, attraction_type, tier, state,
+        lambda: text_search_attractions(location, attraction_type, tier=tier, area=area),
+        area, refs,
+    )
 
-@tool
+@tool(response_format="content_and_artifact")
 async def search_restaurants(
     location: str, 
-    cuisine: str = None
-) -> str:
-    """Search for restaurants and dining options in a specific location."""
-    return await text_search_restaurants(location, cuisine)
+    cuisine: str = None,
+    near: NearArg = None,
+    radius_meters: RadiusArg = None,
+    restrict_to_area: RestrictArg = False,
+    config: RunnableConfig = None,
+    state: Annotated[dict, InjectedState] = None,
+) -> Tuple[str, Optional[PlaceRegistry]]:
+    """Search for restaurants and dining options in a specific location.
+
+    Results close to the chosen hotel, or to the places given in `near`, are ranked first.
+    """
+    tier = _field_mask_tier(config, "search_restaurants")
+    area, refs = _nearby_area(state, location, near, radius_meters, restrict_to_area)
+    return await _search(
+        "search_restaurants", location, cuisine, tier, state,
+        lambda: text_search_restaurants(location, cuisine, tier=tier, area=area),
+        area, refs,
+    )
+
+class PlaceSearch(BaseModel):
+    """One category search within a batched place search."""
+
+    category: Literal['hotels', 'restaurants', 'attractions']
+    subcategory: Optional[str] = Field(
+        default=None,
+        description="Optional refinement, e.g. 'boutique' hotels, 'italian' restaurants or 'museum' attractions",
+    )
+
+@tool(response_format="content_and_artifact")
+async def search_places(
+    location: str,
+    searches: list[PlaceSearch],
+    config: RunnableConfig = None,
+    state: Annotated[dict, InjectedState] = None,
+) -> Tuple[str, Optional[PlaceRegistry]]:
+    """Search hotels, restaurants and attractions in one location with a single call.
+
+    Use this instead of several search_hotels / search_restaurants / search_attractions
+    calls when you need more than one kind of place for the same location.
+    """
+    tier = _field_mask_tier(config, "search_places")
+    registry = registry_from_state(state)
+    pairs = list(dict.fromkeys((search.category, search.subcategory) for search in searches))
+    keys = {pair: search_key("search_places", location, " ".join(filter(None, pair)), tier) for pair in pairs}
+
+    # Only the categories this thread hasn't searched yet go to the Places API
+    known = {pair: known_search(registry, keys[pair]) for pair in pairs}
+    missing = [pair for pair in pairs if known[pair] is None]
+    grouped = await text_search_places_batch(location, missing, tier=tier) if missing else {}
+    records = {pair: to_records(places) for pair, places in grouped.items()}
+
+    sections = []
+    for category, subcategory in pairs:
+        label = f"{subcategory} {category}" if subcategory else category
+        if known[(category, subcategory)] is not None:
+            body = render_known(registry, known[(category, subcategory)])
+        else:
+            body = render_new_and_known(records.get((category, subcategory), []), registry, tier)
+        sections.append(f"## {label}\n{body}")
+    delta = place_delta({keys[pair]: group for pair, group in records.items()}) if records else None
+    return "\n\n".join(sections), delta
 
 def get_tools(selected_tools: list[str]) -> list[Callable[..., Any]]:
     """Convert a list of tool names to actual tool functions."""
@@ -57,6 +275,8 @@ def get_tools(selected_tools: list[str]) -> list[Callable[..., Any]]:
             tools.append(search_attractions)
         elif tool == "search_restaurants":
             tools.append(search_restaurants)
+        elif tool == "search_places":
+            tools.append(search_places)
         else:
             # Log unknown tool for debugging
             print(f"Warning: Unknown tool '{tool}' requested, skipping...")
@@ -1,9 +1,14 @@
 """Utility & helper functions."""
 
-from langchain.chat_models import init_chat_model
+import logging
+from functools import lru_cache
+from typing import Any, Optional
+
 from langchain_core.language_models import BaseChatModel
 from langchain_core.messages import BaseMessage
 
+from src.agent.model_registry import get_model_registry
+
 
 def get_message_text(msg: BaseMessage) -> str:
     """Get the text content of a message."""
@@ -17,11 +22,39 @@ def get_message_text(msg: BaseMessage) -> str:
         return "".join(txts).strip()
 
 
-def load_chat_model(fully_specified_name: str) -> BaseChatModel:
+def load_chat_model(fully_specified_name: str, **params: Any) -> BaseChatModel:
     """Load a chat model from a fully specified name.
 
+    Models are shared process-wide: the same name and parameters always return
+    the same instance from the model registry.
+
     Args:
         fully_specified_name (str): String in the format 'provider/model'.
+        **params: Extra model parameters such as ``temperature``.
+    """
+    return get_model_registry().get(fully_specified_name, **params)
+
+
+@lru_cache(maxsize=None)
+def _get_encoding(encoding_name: str) -> Optional[Any]:
+    try:
+        import tiktoken
+
+        return tiktoken.get_encoding(encoding_name)
+    except Exception as e:
+        logging.getLogger(__name__).warning(
+            f"tiktoken encoding {encoding_name!r} unavailable, estimating tokens: {e!r}"
+        )
+        return None
+
+
+def count_tokens(text: str, encoding_name: str = "o200k_base") -> int:
+    """Count the tokens in ``text``.
+
+    Uses the tiktoken encoding of the gpt-4o / gpt-4.1 family when it can be
+    loaded and falls back to the usual four-characters-per-token estimate.
     """
-    provider, model = fully_specified_name.split("/", maxsplit=1)
-    return init_chat_model(model, model_provider=provider)
+    encoding = _get_encoding(encoding_name)
+    if encoding is None:
+        return -(-len(text) // 4)
+    return len(encoding.encode(text))
@@ -0,0 +1,36 @@
+"""Custom HTTP app mounted by the LangGraph server.
+
+It carries no routes of its own; it exists so the server's lifespan can warm
+shared upstream clients and chat models before the first run and close them
+on shutdown.
+"""
+
+import asyncio
+import os
+from contextlib import asynccontextmanager
+
+from starlette.applications import Starlette
+
+from src.agent.model_registry import get_model_registry
+from src.agent.places_client_pool import get_places_client_pool
+from src.agent.tavily_client import get_tavily_client
+
+# Chat models built and connected at startup, e.g. "openai/gpt-4o-mini,openai/gpt-4.1"
+WARM_MODELS = [name for name in os.getenv("LLM_WARM_MODELS", "openai/gpt-4o-mini").split(",") if name]
+
+
+@asynccontextmanager
+async def lifespan(app: Starlette):
+    """Warm pooled clients on startup and close them on shutdown."""
+    pool = get_places_client_pool()
+    models = get_model_registry()
+    await asyncio.gather(pool.warm(), models.warm(WARM_MODELS))
+    try:
+        yield
+    finally:
+        await pool.aclose()
+        await get_tavily_client().aclose()
+        await models.aclose()
+
+
+app = Starlette(lifespan=lifespan)
@@ -1,12 +1,32 @@
+import asyncio
 import pytest
 from unittest.mock import AsyncMock, patch, MagicMock
 from dotenv import load_dotenv
-from src.agent.google_places_client import text_search_restaurants
+from google.maps import places_v1
+from types import SimpleNamespace
+from src.agent.google_places_client import (
+    FIELD_MASK_TIERS,
+    SearchArea,
+    text_search_attractions,
+    iter_text_search_places,
+    text_search_places_batch,
+    text_search_restaurants,
+    within_distance,
+)
+from src.agent.metrics import get_counters, get_timings
+from src.agent.places_cache import get_places_cache
 
 # Load environment variables for tests
 load_dotenv()
 
 
+@pytest.fixture(autouse=True)
+def clear_places_cache():
+    get_places_cache().clear()
+    yield
+    get_places_cache().clear()
+
+
 class TestGooglePlaces:
     
     @pytest.mark.asyncio
@@ -14,31 +34,30 @@ class TestGooglePlaces:
         """Test successful restaurant search"""
         # Mock the Google Places client
         mock_client = AsyncMock()
-        mock_response = MagicMock()
+        mock_response = places_v1.SearchTextResponse()
         mock_client.search_text.return_value = mock_response
         
-        with patch('src.test_google_places.places_v1.PlacesAsyncClient', return_value=mock_client):
+        with patch('src.agent.google_places_client.places_v1.PlacesAsyncClient', return_value=mock_client):
             result = await text_search_restaurants("Barcelona", "spanish")
             
             # Verify the client was called correctly
             mock_client.search_text.assert_called_once()
             call_args = mock_client.search_text.call_args
-            assert "spanish in Barcelona" in str(call_args[1]['request'].text_query)
+            assert "spanish restaurants in Barcelona" in str(call_args[1]['request'].text_query)
             assert call_args[1]['request'].min_rating == 4.0
     
     @pytest.mark.asyncio
     async def test_text_search_restaurants_no_food_type(self):
         """Test restaurant search without specifying food type"""
         mock_client = AsyncMock()
-        mock_response = MagicMock()
-        mock_response = MagicMock()
+        mock_response = places_v1.SearchTextResponse()
         mock_client.search_text.return_value = mock_response
         
-        with patch('src.test_google_places.places_v1.PlacesAsyncClient', return_value=mock_client):
+        with patch('src.agent.google_places_client.places_v1.PlacesAsyncClient', return_value=mock_client):
             result = await text_search_restaurants("Barcelona")
             
             call_args = mock_client.search_text.call_args
-            assert "restaurant in Barcelona" in str(call_args[1]['request'].text_query)
+            assert "restaurants in Barcelona" in str(call_args[1]['request'].text_query)
     
     @pytest.mark.asyncio
     async def test_text_search_restaurants_api_error(self):
@@ -46,10 +65,190 @@ class TestGooglePlaces:
         mock_client = AsyncMock()
         mock_client.search_text.side_effect = Exception("API Error")
         
-        with patch('src.test_google_places.places_v1.PlacesAsyncClient', return_value=mock_client):
+        with patch('src.agent.google_places_client.places_v1.PlacesAsyncClient', return_value=mock_client):
             with pytest.raises(Exception, match="API Error"):
                 await text_search_restaurants("Barcelona", "spanish")
 
+    @pytest.mark.asyncio
+    async def test_text_search_restaurants_cached(self):
+        """Test repeated searches are served from the cache"""
+        mock_client = AsyncMock()
+        mock_client.search_text.return_value = places_v1.SearchTextResponse(
+            places=[places_v1.Place(id="place-1")]
+        )
+
+        with patch('src.agent.google_places_client.places_v1.PlacesAsyncClient', return_value=mock_client):
+            first = await text_search_restaurants("Barcelona", "spanish")
+            second = await text_search_restaurants("  barcelona", "Spanish ")
+
+            mock_client.search_text.assert_called_once()
+            assert [p.id for p in first] == [p.id for p in second] == ["place-1"]
+
+    @pytest.mark.asyncio
+    async def test_text_search_places_batch(self):
+        """Test batched searches run concurrently and dedupe places across groups"""
+        in_flight = 0
+        max_in_flight = 0
+        results = {
+            "hotels in Lisbon": ["hotel-1", "shared"],
+            "italian restaurants in Lisbon": ["shared", "restaurant-1"],
+            "museum attractions in Lisbon": ["museum-1"],
+        }
+
+        async def search_text(request, metadata, timeout=None):
+            nonlocal in_flight, max_in_flight
+            in_flight += 1
+            max_in_flight = max(max_in_flight, in_flight)
+            await asyncio.sleep(0.01)
+            in_flight -= 1
+            return places_v1.SearchTextResponse(
+                places=[places_v1.Place(id=i) for i in results[request.text_query]]
+            )
+
+        mock_client = AsyncMock()
+        mock_client.search_text.side_effect = search_text
+
+        with patch('src.agent.google_places_client.places_v1.PlacesAsyncClient', return_value=mock_client):
+            grouped = await text_search_places_batch(
+                "Lisbon",
+                [("hotels", None), ("restaurants", "italian"), ("attractions", "museum"), ("hotels", None)],
+                max_concurrency=2,
+            )
+
+        assert list(grouped) == [("hotels", None), ("restaurants", "italian"), ("attractions", "museum")]
+        assert [p.id for p in grouped[("hotels", None)]] == ["hotel-1", "shared"]
+        assert [p.id for p in grouped[("restaurants", "italian")]] == ["restaurant-1"]
+        assert [p.id for p in grouped[("attractions", "museum")]] == ["museum-1"]
+        assert mock_client.search_text.call_count == 3
+        assert max_in_flight == 2
+
+    @pytest.mark.asyncio
+    async def test_field_mask_tier_instrumentation(self):
+        """Test the tier's field mask is sent and its size and latency are recorded"""
+        mock_client = AsyncMock()
+        mock_client.search_text.return_value = places_v1.SearchTextResponse(
+            places=[places_v1.Place(id="place-1", rating=4.5)]
+        )
+        counters = get_counters("places_tiers")
+        requests_before = counters.get("rich.requests")
+        bytes_before = counters.get("rich.response_bytes")
+        timings_before = get_timings("places.search_text.rich").count
+
+        with patch('src.agent.google_places_client.places_v1.PlacesAsyncClient', return_value=mock_client):
+            await text_search_restaurants("Barcelona", tier="rich")
+            await text_search_restaurants("Barcelona", tier="standard")
+
+        masks = [dict(call.kwargs["metadata"])["x-goog-fieldmask"] for call in mock_client.search_text.call_args_list]
+        assert masks[0] == FIELD_MASK_TIERS["rich"] and "places.rating" in masks[0]
+        assert masks[1] == FIELD_MASK_TIERS["standard"] and "places.rating" not in masks[1]
+        assert counters.get("rich.requests") == requests_before + 1
+        assert counters.get("rich.response_bytes") > bytes_before
+        assert get_timings("places.search_text.rich").count == timings_before + 1
+
+
+class TestTextSearchPagination:
+
+    @staticmethod
+    def fake_pages(*pages):
+        """Patch the page fetcher to serve the given lists of place ids page by page."""
+        tokens = [f"token-{i}" for i in range(1, len(pages))] + [""]
+        requested = []
+
+        async def search_text_page(search_query, category, min_rating, open_now=False, page_token="", tier="standard", area=None):
+            index = 0 if not page_token else int(page_token.split("-")[1])
+            requested.append(page_token)
+            places = [places_v1.Place(id=i, location={"latitude": 0, "longitude": n}) for n, i in enumerate(pages[index])]
+            return SimpleNamespace(places=places, next_page_token=tokens[index])
+
+        patches = (
+            patch('src.agent.google_places_client._search_text_page', side_effect=search_text_page),
+            patch('src.agent.google_places_client.SUPPORTS_PAGINATION', True),
+        )
+        return patches, requested
+
+    @pytest.mark.asyncio
+    async def test_follows_pages_lazily(self):
+        """Test pages are only fetched once the previous one is exhausted"""
+        (page_patch, support_patch), requested = self.fake_pages(["a", "b"], ["c"], ["d"])
+        with page_patch, support_patch:
+            places = iter_text_search_places("Rome", "attractions")
+            assert (await places.__anext__()).id == "a"
+            assert requested == [""]
+            ids = ["a"] + [place.id async for place in places]
+
+        assert ids == ["a", "b", "c", "d"]
+        assert requested == ["", "token-1", "token-2"]
+
+    @pytest.mark.asyncio
+    async def test_stops_after_max_results(self):
+        """Test no further page is requested once enough places passed the filter"""
+        (page_patch, support_patch), requested = self.fake_pages(["a", "b", "c"], ["d", "e"], ["f"])
+        with page_patch, support_patch:
+            ids = [
+                place.id
+                async for place in iter_text_search_places(
+                    "Rome", "attractions", predicate=lambda p: p.id != "b", max_results=3
+                )
+            ]
+
+        assert ids == ["a", "c", "d"]
+        assert requested == ["", "token-1"]
+
+    @pytest.mark.asyncio
+    async def test_respects_max_pages(self):
+        """Test pagination stops at max_pages"""
+        (page_patch, support_patch), requested = self.fake_pages(["a"], ["b"], ["c"])
+        with page_patch, support_patch:
+            ids = [place.id async for place in iter_text_search_places("Rome", "attractions", max_pages=2)]
+
+        assert ids == ["a", "b"]
+        assert requested == ["", "token-1"]
+
+    def test_within_distance(self):
+        """Test the distance predicate uses great-circle distance"""
+        near = within_distance(0, 0, 120_000)
+        assert near(places_v1.Place(location={"latitude": 0, "longitude": 1}))
+        assert not near(places_v1.Place(location={"latitude": 0, "longitude": 2}))
+
+
+class TestSearchArea:
+
+    @pytest.mark.asyncio
+    async def test_bias_sends_a_circle_and_is_part_of_the_cache_key(self):
+        """Test a biased search sends its circle, and only the same area shares a cached response"""
+        mock_client = AsyncMock()
+        mock_client.search_text.return_value = places_v1.SearchTextResponse()
+
+        with patch('src.agent.google_places_client.places_v1.PlacesAsyncClient', return_value=mock_client):
+            await text_search_restaurants("Paris", area=SearchArea(48.85661, 2.35222, 800))
+            await text_search_restaurants("Paris", area=SearchArea(48.856612, 2.352219, 800.2))
+            await text_search_restaurants("Paris", area=SearchArea(48.8738, 2.2950, 800))
+            await text_search_restaurants("Paris")
+
+        requests = [call.kwargs["request"] for call in mock_client.search_text.call_args_list]
+        assert len(requests) == 3
+        circle = requests[0].location_bias.circle
+        assert (circle.center.latitude, circle.center.longitude, circle.radius) == (48.8566, 2.3522, 800)
+        assert "location_bias" not in requests[2]
+
+    @pytest.mark.asyncio
+    async def test_restrict_drops_places_outside_the_circle(self):
+        """Test a restricted search sends the circle's bounding box and drops places in its corners"""
+        mock_client = AsyncMock()
+        mock_client.search_text.return_value = places_v1.SearchTextResponse(places=[
+            places_v1.Place(id="inside", location={"latitude": 0.005, "longitude": 0}),
+            places_v1.Place(id="corner", location={"latitude": 0.0085, "longitude": 0.0085}),
+            places_v1.Place(id="unlocated"),
+        ])
+
+        with patch('src.agent.google_places_client.places_v1.PlacesAsyncClient', return_value=mock_client):
+            places = await text_search_attractions("Somewhere", area=SearchArea(0, 0, 1000, "restrict"))
+
+        rectangle = mock_client.search_text.call_args.kwargs["request"].location_restriction.rectangle
+        assert rectangle.low.latitude == pytest.approx(-0.009, abs=1e-4)
+        assert rectangle.high.longitude == pytest.approx(0.009, abs=1e-4)
+        assert [place.id for place in places] == ["inside", "unlocated"]
+
 
 # Integration test (requires real API key)
 @pytest.mark.integration
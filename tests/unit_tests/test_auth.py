@@ -0,0 +1,100 @@
+import time
+
+import jwt
+import pytest
+
+from src.agent import auth
+from src.agent.auth import reload_jwt_secret, verify_token_cached
+
+SECRET = "test-secret-of-at-least-32-bytes!"
+
+
+@pytest.fixture(autouse=True)
+def jwt_secret(monkeypatch):
+    monkeypatch.setenv("SUPABASE_JWT_SECRET", SECRET)
+    reload_jwt_secret()
+    auth._auth_counters.reset()
+    yield
+    reload_jwt_secret()
+
+
+def make_token(secret=SECRET, exp_in=3600, **claims):
+    payload = {"sub": "user-1", "aud": "authenticated", "exp": int(time.time()) + exp_in, **claims}
+    return jwt.encode(payload, secret, algorithm="HS256")
+
+
+class TestTokenCache:
+
+    def test_valid_token_is_verified_once(self):
+        token = make_token()
+
+        assert [verify_token_cached(token) for _ in range(5)] == ["user-1"] * 5
+        assert auth._auth_counters.snapshot() == {"verifications": 1, "hits": 4}
+
+    def test_entry_expires_with_the_token(self, monkeypatch):
+        token = make_token(exp_in=60)
+        verify_token_cached(token)
+
+        later = time.time() + 120
+        monkeypatch.setattr(auth.time, "time", lambda: later)
+
+        assert verify_token_cached(token) is None
+        assert auth._auth_counters.get("verifications") == 2
+
+    def test_rejected_tokens_are_cached_briefly(self, monkeypatch):
+        anonymous = make_token(is_anonymous=True)
+        forged = make_token(secret="wrong-secret-of-at-least-32-bytes")
+
+        for _ in range(3):
+            assert verify_token_cached(anonymous) is None
+            assert verify_token_cached(forged) is None
+        assert auth._auth_counters.snapshot() == {"verifications": 2, "negative_hits": 4}
+
+        later = time.time() + auth._negative_ttl + 1
+        monkeypatch.setattr(auth.time, "time", lambda: later)
+        verify_token_cached(forged)
+        assert auth._auth_counters.get("verifications") == 3
+
+    def test_reload_picks_up_rotated_secret(self, monkeypatch):
+        token = make_token(secret="rotated-secret-of-at-least-32-bytes")
+        assert verify_token_cached(token) is None
+
+        monkeypatch.setenv("SUPABASE_JWT_SECRET", "rotated-secret-of-at-least-32-bytes")
+        assert verify_token_cached(token) is None
+
+        reload_jwt_secret()
+        assert verify_token_cached(token) == "user-1"
+
+    def test_cache_is_bounded(self, monkeypatch):
+        monkeypatch.setattr(auth, "_token_cache_size", 2)
+        for i in range(3):
+            verify_token_cached(make_token(sub=f"user-{i}"))
+
+        assert len(auth._token_cache) == 2
+        assert auth._auth_counters.get("evictions") == 1
+
+    def test_missing_secret_is_not_cached(self, monkeypatch):
+        monkeypatch.delenv("SUPABASE_JWT_SECRET")
+        reload_jwt_secret()
+        token = make_token()
+
+        assert verify_token_cached(token) is None
+        assert len(auth._token_cache) == 0
+
+    def test_secret_set_after_first_use_is_picked_up(self, monkeypatch):
+        monkeypatch.delenv("SUPABASE_JWT_SECRET")
+        reload_jwt_secret()
+        token = make_token()
+        assert verify_token_cached(token) is None
+
+        monkeypatch.setenv("SUPABASE_JWT_SECRET", SECRET)
+
+        # No reload needed: an unset secret is read again on the next call
+        assert verify_token_cached(token) == "user-1"
+
+
+@pytest.mark.asyncio
+async def test_authenticate_rejects_invalid_tokens():
+    assert await auth.authenticate(f"Bearer {make_token()}") == "user-1"
+    with pytest.raises(auth.Auth.exceptions.HTTPException):
+        await auth.authenticate(f"Bearer {make_token(secret='wrong-secret-of-at-least-32-bytes')}")
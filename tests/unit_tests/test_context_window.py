@@ -0,0 +1,63 @@
+from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
+
+from src.agent.context_window import fit_messages, message_tokens
+from src.agent.metrics import Counters
+
+
+def tool_turn(question, table, answer, call_id):
+    return [
+        HumanMessage(question),
+        AIMessage("", tool_calls=[{"name": "search_hotels", "args": {"location": "Lisbon"}, "id": call_id}]),
+        ToolMessage(table, tool_call_id=call_id, name="search_hotels"),
+        AIMessage(answer),
+    ]
+
+
+BIG_TABLE = "name|id|address|maps|lat,lng\n" + "\n".join(f"Hotel {i}|id{i}|Rua {i}, Lisboa|https://maps.google.com/?cid={i}|38.7,-9.1" for i in range(60))
+ITINERARY = "Here is your plan\n```itinerary\n{\"title\": \"Lisbon Day 1\"}\n```"
+
+
+def total(messages):
+    return sum(message_tokens(m) for m in messages)
+
+
+def test_short_threads_are_untouched():
+    messages = tool_turn("Hotels in Lisbon?", "name|id\nA|1", "Try A.", "c1")
+    counters = Counters()
+
+    assert fit_messages(messages, 10_000, counters=counters) == messages
+    assert counters.get("tokens_before") == counters.get("tokens_after") == total(messages)
+
+
+def test_old_tool_outputs_are_digested_first():
+    old = tool_turn("Hotels in Lisbon?", BIG_TABLE, ITINERARY, "c1")
+    recent = tool_turn("Cheaper ones?", BIG_TABLE, "Try Hotel 3.", "c2")
+    messages = old + recent
+    counters = Counters()
+
+    window = fit_messages(messages, total(messages) - 500, recent_turns=1, counters=counters)
+
+    assert len(window) == len(messages)
+    assert window[2].tool_call_id == "c1"
+    assert window[2].content.startswith("name|id|address")
+    assert "shortened to save context" in window[2].content
+    assert window[4:] == recent
+    assert counters.get("digested") == 1
+    assert counters.get("tokens_after") == total(window) < counters.get("tokens_before")
+
+
+def test_oldest_turns_are_dropped_but_latest_itinerary_kept():
+    first = tool_turn("Hotels in Lisbon?", BIG_TABLE, ITINERARY, "c1")
+    second = tool_turn("Restaurants?", BIG_TABLE, "Try these.", "c2")
+    recent = tool_turn("Cheaper hotels?", BIG_TABLE, "Try Hotel 3.", "c3")
+    counters = Counters()
+
+    window = fit_messages(first + second + recent, total(recent) + 50, recent_turns=1, counters=counters)
+
+    assert window[0].content == ITINERARY
+    assert window[-4:] == recent
+    # Every remaining tool result still follows the call that produced it
+    call_ids = [c["id"] for m in window if isinstance(m, AIMessage) for c in m.tool_calls]
+    assert [m.tool_call_id for m in window if isinstance(m, ToolMessage)] == call_ids
+    assert counters.get("dropped") > 0
+
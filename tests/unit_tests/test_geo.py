@@ -0,0 +1,114 @@
+import time
+
+import numpy as np
+import pytest
+from langchain_core.messages import HumanMessage, ToolMessage
+
+from src.agent.geo import DAY_GROUPS_HEADER, group_places, haversine_matrix, order_route, render_day_groups
+from src.agent.graph import _make_pre_model_hook
+from src.agent.place_handles import place_handle
+from src.agent.place_records import PlaceRecord
+from src.agent.place_registry import place_delta, search_key
+
+LISBON = (38.7223, -9.1393)
+PORTO = (41.1579, -8.6291)
+
+
+def test_haversine_matrix():
+    dist = haversine_matrix(np.array([LISBON[0], PORTO[0]]), np.array([LISBON[1], PORTO[1]]))
+
+    assert dist[0, 1] == pytest.approx(274.3, abs=0.5)
+    assert dist[1, 0] == dist[0, 1]
+    assert np.all(np.diag(dist) == 0)
+
+
+def test_route_follows_a_street():
+    lng = np.array([0.0, 0.03, 0.01, 0.05, 0.02, 0.04])
+    route = order_route(haversine_matrix(np.zeros(6), lng))
+
+    assert list(lng[route]) in (sorted(lng), sorted(lng, reverse=True))
+
+
+def test_groups_never_mix_cities_and_fit_a_day():
+    rng = np.random.default_rng(7)
+    lat = np.concatenate([LISBON[0] + rng.normal(0, 0.02, 40), PORTO[0] + rng.normal(0, 0.02, 20)])
+    lng = np.concatenate([LISBON[1] + rng.normal(0, 0.02, 40), PORTO[1] + rng.normal(0, 0.02, 20)])
+
+    groups = group_places(lat, lng, places_per_day=6)
+
+    assert sorted(i for group in groups for i in group.route) == list(range(60))
+    assert all(all(i < 40 for i in g.route) or all(i >= 40 for i in g.route) for g in groups)
+    assert all(len(group.route) <= 9 for group in groups)
+    # Consecutive days stay in one city until it's done
+    cities = [group.route[0] < 40 for group in groups]
+    assert sum(a != b for a, b in zip(cities, cities[1:])) == 1
+
+
+def test_grouping_hundreds_of_places_is_fast():
+    rng = np.random.default_rng(0)
+    lat, lng = LISBON[0] + rng.normal(0, 0.05, 500), LISBON[1] + rng.normal(0, 0.05, 500)
+
+    start = time.perf_counter()
+    groups = group_places(lat, lng)
+
+    assert time.perf_counter() - start < 1.0
+    assert sum(len(group.route) for group in groups) == 500
+
+
+def record(n, lat, lng):
+    return PlaceRecord(f"id{n}", f"Place {n}", maps_uri=f"https://maps.google.com/?cid={n}", lat=lat, lng=lng)
+
+
+def restaurants(location):
+    return search_key("search_restaurants", location, None, "standard")
+
+
+def test_render_day_groups():
+    registry = place_delta({restaurants("Lisbon"): [
+        record(1, LISBON[0], LISBON[1]),
+        record(2, LISBON[0] + 0.02, LISBON[1]),
+        record(3, LISBON[0] + 0.01, LISBON[1]),
+        record(4, None, None),
+    ]})
+
+    text = render_day_groups(registry, places_per_day=3)
+
+    assert text.splitlines()[:2] == [DAY_GROUPS_HEADER, "lisbon:"]
+    # Place 3 lies between the other two, so the route passes it in the middle
+    assert f" > {place_handle('id3')} Place 3 > " in text.splitlines()[2]
+    assert "Place 4" not in text
+    assert render_day_groups(registry, places_per_day=0) is None
+    assert render_day_groups(place_delta({restaurants("Lisbon"): [record(1, *LISBON)]})) is None
+
+
+def test_day_groups_are_per_location_without_hotels():
+    registry = place_delta({
+        restaurants("Lisbon"): [record(1, *LISBON), record(2, LISBON[0] + 0.01, LISBON[1])],
+        search_key("search_attractions", "Porto", None, "standard"): [record(3, *PORTO), record(4, PORTO[0] + 0.01, PORTO[1])],
+        search_key("search_hotels", "Lisbon", None, "standard"): [record(5, LISBON[0] + 0.005, LISBON[1])],
+        search_key("search_places", "Porto", "hotels", "standard"): [record(6, *PORTO)],
+    })
+
+    lines = render_day_groups(registry, places_per_day=2).splitlines()
+
+    assert lines[1] == "lisbon:" and lines[3] == "porto:"
+    assert "Place 1" in lines[2] and "Place 2" in lines[2]
+    assert "Place 3" in lines[4] and "Place 4" in lines[4]
+    assert not any("Place 5" in line or "Place 6" in line for line in lines)
+
+
+def test_pre_model_hook_shows_day_groups_to_the_model():
+    places = [record(1, *LISBON), record(2, LISBON[0] + 0.01, LISBON[1])]
+    state = {"messages": [
+        HumanMessage("Two days in Lisbon"),
+        ToolMessage("ref|name", tool_call_id="call_1", artifact=place_delta({restaurants("Lisbon"): places})),
+    ]}
+
+    update = _make_pre_model_hook(None, 0, 2).invoke(state)
+
+    # After the latest turn, so the history before it stays a stable cache prefix
+    assert update["llm_input_messages"][:-1] == state["messages"]
+    assert isinstance(update["llm_input_messages"][-1], HumanMessage)
+    assert update["llm_input_messages"][-1].content.startswith(DAY_GROUPS_HEADER)
+    assert "messages" not in update
+    assert len(_make_pre_model_hook(None, 0, 2, places_per_day=0).invoke(state)["llm_input_messages"]) == 2
@@ -0,0 +1,70 @@
+import asyncio
+import threading
+from unittest.mock import patch
+
+import pytest
+
+from src.agent import graph as graph_module
+from src.agent.graph import clear_graph_cache, create_trip_planner_graph
+
+
+@pytest.fixture(autouse=True)
+def empty_graph_cache():
+    clear_graph_cache()
+    graph_module._graph_counters.reset()
+    yield
+    clear_graph_cache()
+
+
+def make_config(**configurable):
+    return {"configurable": {"model": "openai/gpt-4o-mini", "selected_tools": ["search_weather", "search_hotels"], **configurable}}
+
+
+class TestGraphCache:
+
+    @pytest.mark.asyncio
+    async def test_same_configuration_reuses_graph(self):
+        with patch("src.agent.graph._build_graph", side_effect=lambda *args: object()) as build:
+            first = await create_trip_planner_graph(make_config())
+            second = await create_trip_planner_graph(make_config(selected_tools=["search_hotels", "search_weather"]))
+
+        assert first is second
+        assert build.call_count == 1
+        assert graph_module._graph_counters.snapshot() == {"misses": 1, "hits": 1}
+
+    @pytest.mark.asyncio
+    async def test_configuration_changes_build_new_graphs(self):
+        with patch("src.agent.graph._build_graph", side_effect=lambda *args: object()) as build:
+            base = await create_trip_planner_graph(make_config())
+            other_prompt = await create_trip_planner_graph(make_config(system_prompt="Plan a trip."))
+            other_model = await create_trip_planner_graph(make_config(model="openai/gpt-4.1"))
+            other_name = await create_trip_planner_graph(make_config(name="lisbon_planner"))
+
+        assert len({id(base), id(other_prompt), id(other_model), id(other_name)}) == 4
+        assert build.call_count == 4
+
+    @pytest.mark.asyncio
+    async def test_concurrent_misses_build_once(self):
+        def slow_build(*args):
+            threading.Event().wait(0.05)
+            return object()
+
+        with patch("src.agent.graph._build_graph", side_effect=slow_build) as build:
+            graphs = await asyncio.gather(*(create_trip_planner_graph(make_config()) for _ in range(5)))
+
+        assert all(g is graphs[0] for g in graphs)
+        assert build.call_count == 1
+
+    @pytest.mark.asyncio
+    async def test_least_recently_used_graph_is_evicted(self):
+        with patch("src.agent.graph._graph_cache_size", 2), \
+                patch("src.agent.graph._build_graph", side_effect=lambda *args: object()) as build:
+            await create_trip_planner_graph(make_config(name="a"))
+            await create_trip_planner_graph(make_config(name="b"))
+            await create_trip_planner_graph(make_config(name="a"))
+            await create_trip_planner_graph(make_config(name="c"))
+            await create_trip_planner_graph(make_config(name="a"))
+            await create_trip_planner_graph(make_config(name="b"))
+
+        assert build.call_count == 4
+        assert graph_module._graph_counters.get("evictions") == 2
@@ -0,0 +1,114 @@
+from unittest.mock import patch
+
+import pytest
+from langchain_core.language_models.fake_chat_models import GenericFakeChatModel
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage
+from langchain_core.runnables import RunnableLambda
+from langchain_core.tools import tool
+from langchain_core.utils.function_calling import convert_to_openai_tool
+
+from src.agent.graph import _build_graph
+from src.agent.itinerary import Activity, ItineraryDay, ItineraryItem, Suggestion, TripPlan, render_markdown
+from src.agent.itinerary_stream import ITINERARY_DAY_EVENT, ItineraryStreamParser
+from src.agent.prompts import RESEARCH_COMPLETE_MARKER, TRIP_ASSEMBLY_PROMPT, TRIP_PLANNER_WITH_TOOLS_PROMPT, resolve_system_prompt
+
+PLAN = TripPlan(
+    overview="Two days in **Tokyo** 🌸",
+    days=[
+        ItineraryDay(
+            title="Tokyo Day 1",
+            date="2024-04-01",
+            location="Tokyo, Japan",
+            itineraryItems=[ItineraryItem(
+                timeOfDay="Morning", iconName="coffee", activities=[Activity(title="Meiji Shrine", description="Walk")],
+            )],
+            accommodationSuggestions=[Suggestion(title="Hotel", description="Nice", link="https://maps.google.com/?cid=1")],
+        ),
+        ItineraryDay(title="Tokyo Day 2"),
+    ],
+)
+
+
+def test_render_markdown_produces_parsable_itinerary_blocks():
+    markdown = render_markdown(PLAN)
+
+    assert markdown.startswith("# Trip Overview\nTwo days in **Tokyo** 🌸\n\n## Daily Itinerary\n")
+    parser = ItineraryStreamParser()
+    days = parser.feed(markdown) + parser.close()
+    assert [ItineraryDay.model_validate(day) for day in days] == PLAN.days
+    # Unset optional fields are left out rather than written as null
+    assert "date" not in days[1]
+
+
+def test_resolve_system_prompt_in_structured_mode():
+    research = resolve_system_prompt(TRIP_PLANNER_WITH_TOOLS_PROMPT, ("search_hotels",), "structured")
+    custom = resolve_system_prompt("Plan a trip.", ("search_hotels",), "structured")
+
+    assert "```itinerary" not in research
+    assert RESEARCH_COMPLETE_MARKER in research
+    assert custom.startswith("Plan a trip.") and RESEARCH_COMPLETE_MARKER in custom
+
+
+@tool
+def search_hotels(location: str) -> str:
+    """Search hotels."""
+    return f"hotels in {location}"
+
+
+class ResearchModel(GenericFakeChatModel):
+    assembler_inputs: list = []
+
+    def bind_tools(self, tools, **kwargs):
+        return self.bind(tools=[convert_to_openai_tool(t) for t in tools], **kwargs)
+
+    def with_structured_output(self, schema, **kwargs):
+        assert schema is TripPlan
+
+        def assemble(messages):
+            self.assembler_inputs.append(messages)
+            return PLAN
+
+        return RunnableLambda(assemble)
+
+
+def build(answer):
+    model = ResearchModel(messages=iter([
+        AIMessage("", tool_calls=[{"name": "search_hotels", "args": {"location": "Tokyo"}, "id": "call_1"}]),
+        AIMessage(answer),
+    ]), assembler_inputs=[])
+    with patch("src.agent.graph.get_tools", return_value=[search_hotels]), \
+            patch("src.agent.graph.load_chat_model", return_value=model):
+        graph = _build_graph("fake", ["search_hotels"], "Research.", "trip_planner", itinerary_mode="structured")
+    return graph, model
+
+
+@pytest.mark.asyncio
+async def test_structured_mode_assembles_the_plan_from_the_research():
+    graph, model = build(RESEARCH_COMPLETE_MARKER)
+
+    custom, result = [], None
+    async for mode, chunk in graph.astream({"messages": [HumanMessage("2 days in Tokyo")]}, stream_mode=["custom", "values"]):
+        if mode == "custom":
+            custom.append(chunk)
+        else:
+            result = chunk
+
+    [inputs] = model.assembler_inputs
+    assert inputs[0] == SystemMessage(TRIP_ASSEMBLY_PROMPT)
+    assert inputs[-1].content == "hotels in Tokyo"
+    # The hand-off is replaced by the rendered plan
+    assert RESEARCH_COMPLETE_MARKER not in [m.content for m in result["messages"]]
+    assert result["messages"][-1].content == render_markdown(PLAN)
+    assert result["messages"][-1].name == "trip_planner"
+    assert result["itinerary"] == PLAN.model_dump(exclude_none=True)
+    assert [(event["event"], event["index"]) for event in custom] == [(ITINERARY_DAY_EVENT, 0), (ITINERARY_DAY_EVENT, 1)]
+
+
+@pytest.mark.asyncio
+async def test_structured_mode_answers_other_requests_directly():
+    graph, model = build("Tokyo has many hotels.")
+
+    result = await graph.ainvoke({"messages": [HumanMessage("Are there hotels in Tokyo?")]})
+
+    assert result["messages"][-1].content == "Tokyo has many hotels."
+    assert model.assembler_inputs == []
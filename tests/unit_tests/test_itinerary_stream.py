@@ -0,0 +1,154 @@
+import json
+from unittest.mock import patch
+
+import pytest
+from langchain_core.language_models.fake_chat_models import GenericFakeChatModel
+from langchain_core.messages import AIMessage, HumanMessage
+from langchain_core.tools import tool
+from langchain_core.utils.function_calling import convert_to_openai_tool
+
+from src.agent.graph import _build_graph
+from src.agent.itinerary_stream import ITINERARY_DAY_EVENT, ItineraryStreamParser, validate_day
+from src.agent.metrics import Counters
+from src.agent.place_handles import place_handle
+from src.agent.place_records import PlaceRecord
+from src.agent.place_registry import place_delta
+
+
+def day(n):
+    return {"title": f"Day {n}", "itineraryItems": [{"timeOfDay": "Morning", "activities": []}]}
+
+
+def block(n, indent="    "):
+    body = "\n".join(indent + line for line in json.dumps(day(n), indent=4).splitlines())
+    return f"{indent}```itinerary\n{body}\n{indent}```\n"
+
+
+ANSWER = "# Trip Overview\nTwo days in Tokyo.\n## Daily Itinerary\n" + block(1) + "Some notes\n" + block(2) + "Enjoy!"
+
+
+def feed_in_chunks(parser, text, size):
+    days = []
+    for i in range(0, len(text), size):
+        days.extend(parser.feed(text[i:i + size]))
+    return days + parser.close()
+
+
+@pytest.mark.parametrize("size", [1, 3, 17, len(ANSWER)])
+def test_days_are_parsed_whatever_the_chunking(size):
+    assert feed_in_chunks(ItineraryStreamParser(), ANSWER, size) == [day(1), day(2)]
+
+
+def test_day_is_returned_as_soon_as_its_block_closes():
+    parser = ItineraryStreamParser()
+    first, rest = ANSWER.split("Some notes")
+
+    assert parser.feed(first) == [day(1)]
+    assert not parser.in_block
+    assert parser.feed("Some notes" + rest) == [day(2)]
+
+
+def test_closing_fence_at_end_of_stream():
+    parser = ItineraryStreamParser()
+
+    assert parser.feed(block(1).rstrip("\n")) == []
+    assert parser.close() == [day(1)]
+
+
+def test_invalid_blocks_are_skipped():
+    counters = Counters()
+    parser = ItineraryStreamParser(counters=counters)
+    text = "```itinerary\n{not json\n```\n```itinerary\n[1, 2]\n```\n" + block(3, indent="")
+
+    assert feed_in_chunks(parser, text, 5) == [day(3)]
+    assert counters.snapshot()["invalid"] == 2
+
+
+def test_oversized_block_is_dropped_without_buffering_it():
+    counters = Counters()
+    parser = ItineraryStreamParser(max_block_chars=200, counters=counters)
+    huge = '```itinerary\n{"title": "' + "x" * 10_000 + '"}\n```\n'
+
+    assert feed_in_chunks(parser, huge + block(2), 64) == [day(2)]
+    assert counters.snapshot()["oversized"] == 1
+
+
+def test_memory_outside_blocks_is_bounded():
+    parser = ItineraryStreamParser()
+    parser.feed("word " * 10_000)
+
+    assert parser._line_len <= 80
+
+
+def test_validate_day():
+    assert validate_day(day(1)) == day(1)
+    with pytest.raises(ValueError):
+        validate_day({"itineraryItems": []})
+    with pytest.raises(ValueError):
+        validate_day({"title": "Day 1", "itineraryItems": "Morning"})
+
+
+@tool
+def search_hotels(location: str) -> str:
+    """Search hotels."""
+    return f"hotels in {location}"
+
+
+class StreamingModel(GenericFakeChatModel):
+    def bind_tools(self, tools, **kwargs):
+        return self.bind(tools=[convert_to_openai_tool(t) for t in tools], **kwargs)
+
+
+@pytest.mark.asyncio
+async def test_graph_emits_days_before_the_answer_is_complete():
+    model = StreamingModel(messages=iter([AIMessage(ANSWER)]))
+    with patch("src.agent.graph.get_tools", return_value=[search_hotels]), \
+            patch("src.agent.graph.load_chat_model", return_value=model):
+        graph = _build_graph("fake", ["search_hotels"], "Plan trips.", "trip_planner")
+
+    events = []
+    async for mode, chunk in graph.astream({"messages": [HumanMessage("2 days in Tokyo")]}, stream_mode=["custom", "updates"]):
+        events.append((mode, chunk))
+
+    custom = [chunk for mode, chunk in events if mode == "custom"]
+    assert custom == [
+        {"event": ITINERARY_DAY_EVENT, "index": 0, "day": day(1)},
+        {"event": ITINERARY_DAY_EVENT, "index": 1, "day": day(2)},
+    ]
+    # Both days arrive before the agent node publishes the finished message
+    labels = [mode if mode == "custom" else next(iter(chunk)) for mode, chunk in events]
+    assert labels[labels.index("agent") - 2:labels.index("agent") + 1] == ["custom", "custom", "agent"]
+
+
+@pytest.mark.asyncio
+async def test_streamed_days_expand_places_known_from_the_registry():
+    cited = {**day(1), "title": f"Dinner at @{place_handle('id1')}"}
+    body = json.dumps(cited, indent=4)
+    model = StreamingModel(messages=iter([AIMessage(f"## Daily Itinerary\n```itinerary\n{body}\n```\n")]))
+    with patch("src.agent.graph.get_tools", return_value=[search_hotels]), \
+            patch("src.agent.graph.load_chat_model", return_value=model):
+        graph = _build_graph("fake", ["search_hotels"], "Plan trips.", "trip_planner")
+    # Only the registry knows this place: no tool result in the thread lists it
+    registry = place_delta({"earlier search": [PlaceRecord("id1", "Place 1", maps_uri="https://maps.google.com/?cid=1")]})
+
+    custom = [
+        chunk
+        async for mode, chunk in graph.astream(
+            {"messages": [HumanMessage("Plan dinner")], "places": registry}, stream_mode=["custom", "updates"]
+        )
+        if mode == "custom"
+    ]
+
+    assert [chunk["day"]["title"] for chunk in custom] == ["Dinner at https://maps.google.com/?cid=1"]
+
+
+@pytest.mark.asyncio
+async def test_streaming_can_be_disabled():
+    model = StreamingModel(messages=iter([AIMessage(ANSWER)]))
+    with patch("src.agent.graph.get_tools", return_value=[search_hotels]), \
+            patch("src.agent.graph.load_chat_model", return_value=model):
+        graph = _build_graph("fake", ["search_hotels"], "Plan trips.", "trip_planner", stream_itinerary=False)
+
+    modes = [mode async for mode, _ in graph.astream({"messages": [HumanMessage("hi")]}, stream_mode=["custom", "updates"])]
+
+    assert "custom" not in modes
@@ -0,0 +1,80 @@
+import asyncio
+
+import httpx
+import pytest
+
+from src.agent.metrics import Counters
+from src.agent.model_registry import ModelRegistry, get_model_registry
+from src.agent.utils import load_chat_model
+
+
+@pytest.fixture(autouse=True)
+def openai_key(monkeypatch):
+    monkeypatch.setenv("OPENAI_API_KEY", "test-key")
+
+
+class TestModelRegistry:
+
+    def test_same_name_and_params_share_an_instance(self):
+        registry = ModelRegistry(counters=Counters())
+
+        first = registry.get("openai/gpt-4o-mini", temperature=0)
+        second = registry.get("openai/gpt-4o-mini", temperature=0)
+
+        assert first is second
+        assert registry.counters.snapshot() == {"misses": 1, "hits": 1}
+
+    def test_params_select_distinct_instances(self):
+        registry = ModelRegistry(counters=Counters())
+
+        default = registry.get("openai/gpt-4o-mini")
+        tuned = registry.get("openai/gpt-4o-mini", temperature=0)
+        other = registry.get("openai/gpt-4.1")
+
+        assert len({id(default), id(tuned), id(other)}) == 3
+        assert tuned.temperature == 0
+        assert other.model_name == "gpt-4.1"
+
+    def test_models_share_the_connection_pool(self):
+        registry = ModelRegistry(max_connections=7, counters=Counters())
+
+        first = registry.get("openai/gpt-4o-mini")
+        second = registry.get("openai/gpt-4.1")
+
+        assert first.http_async_client is second.http_async_client is registry.http_async_client
+        assert first.http_client is registry.http_client
+
+    def test_each_event_loop_gets_its_own_async_pool(self):
+        transport = ModelRegistry(counters=Counters()).http_async_client._transport
+
+        async def pools():
+            return transport._transport(), transport._transport()
+
+        first_a, first_b = asyncio.run(pools())
+        second, _ = asyncio.run(pools())
+
+        assert first_a is first_b
+        assert second is not first_a
+
+    def test_load_chat_model_uses_the_shared_registry(self):
+        model = load_chat_model("openai/gpt-4o-mini")
+
+        assert model is get_model_registry().get("openai/gpt-4o-mini")
+
+    @pytest.mark.asyncio
+    async def test_warm_opens_connections_and_tolerates_failures(self):
+        requests = []
+
+        def handler(request):
+            requests.append(request)
+            return httpx.Response(404)
+
+        registry = ModelRegistry(counters=Counters())
+        registry._http_async_client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+
+        await registry.warm(["openai/gpt-4o-mini", "openai/gpt-4.1", "nonexistent/model"])
+
+        assert [(r.method, str(r.url)) for r in requests] == [("HEAD", "https://api.openai.com/v1")]
+        assert len(registry) == 2
+        await registry.aclose()
+        assert len(registry) == 0
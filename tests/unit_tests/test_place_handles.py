@@ -0,0 +1,113 @@
+import json
+from unittest.mock import patch
+
+import pytest
+from langchain_core.language_models.fake_chat_models import GenericFakeChatModel
+from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
+from langchain_core.tools import tool
+from langchain_core.utils.function_calling import convert_to_openai_tool
+
+from src.agent.graph import _build_graph
+from src.agent.metrics import get_counters
+from src.agent.place_handles import (
+    PlaceRef,
+    collect_places,
+    expand_handles,
+    expand_message,
+    place_handle,
+)
+from src.agent.place_records import PlaceRecord, render_places
+
+LOLA = PlaceRecord("ChIJlola", 'Casa "Lola"', "Carrer 1", "https://maps.google.com/?cid=1", 41.38, 2.17)
+SAGRADA = PlaceRecord("ChIJsagrada", "Sagrada Família", "Carrer 2", "https://maps.google.com/?cid=2")
+LOLA_REF, SAGRADA_REF = place_handle(LOLA.id), place_handle(SAGRADA.id)
+
+
+def test_place_handle_is_short_and_stable():
+    assert LOLA_REF == place_handle("ChIJlola")
+    assert len(LOLA_REF) == 6 and LOLA_REF.startswith("P")
+    assert LOLA_REF != SAGRADA_REF
+
+
+@pytest.mark.parametrize("tier", ["minimal", "standard", "rich"])
+def test_handles_are_read_back_from_place_tables(tier):
+    places = collect_places([
+        ToolMessage(render_places([LOLA], tier), tool_call_id="1"),
+        ToolMessage(render_places([SAGRADA], tier), tool_call_id="2"),
+        ToolMessage("Sunny, 24°C", tool_call_id="3"),
+    ])
+
+    assert places == {
+        LOLA_REF: PlaceRef(LOLA.id, LOLA.name, LOLA.maps_uri),
+        SAGRADA_REF: PlaceRef(SAGRADA.id, SAGRADA.name, SAGRADA.maps_uri),
+    }
+
+
+def test_expand_handles():
+    places = collect_places([ToolMessage(render_places([LOLA, SAGRADA]), tool_call_id="1")])
+    text = f'{{"description": "Lunch at `geo:@{LOLA_REF}`", "link": "@{SAGRADA_REF}"}} and @PZZZZZ'
+
+    expanded, unresolved = expand_handles(text, places)
+
+    assert json.loads(expanded.split(" and ")[0]) == {
+        "description": "Lunch at `geo:Casa 'Lola'|ChIJlola`",
+        "link": "https://maps.google.com/?cid=2",
+    }
+    assert unresolved == ["PZZZZZ"]
+
+
+def test_expand_message_flags_unresolved_handles():
+    counters = get_counters("place_handles")
+    before = counters.get("unresolved")
+    message = AIMessage(f"See @{LOLA_REF} and @PZZZZZ", id="m1")
+
+    expanded = expand_message(message, {LOLA_REF: PlaceRef(LOLA.id, LOLA.name, LOLA.maps_uri)})
+
+    assert expanded.id == "m1"
+    assert expanded.content == f"See {LOLA.maps_uri} and @PZZZZZ"
+    assert expanded.additional_kwargs["unresolved_place_handles"] == ["PZZZZZ"]
+    assert counters.get("unresolved") == before + 1
+    assert expand_message(AIMessage("No places here"), {}) is None
+
+
+@tool
+def search_restaurants(location: str) -> str:
+    """Search restaurants."""
+    return render_places([LOLA])
+
+
+class CitingModel(GenericFakeChatModel):
+    def bind_tools(self, tools, **kwargs):
+        return self.bind(tools=[convert_to_openai_tool(t) for t in tools], **kwargs)
+
+
+@pytest.mark.asyncio
+async def test_planner_answer_has_handles_expanded():
+    day = {"title": "Day 1", "description": f"Dinner at `geo:@{LOLA_REF}`",
+           "accommodationSuggestions": [{"title": "Lola", "description": "Tapas", "link": f"@{LOLA_REF}"}]}
+    answer = f"# Trip Overview\n```itinerary\n{json.dumps(day)}\n```\n"
+    model = CitingModel(messages=iter([AIMessage(answer)]))
+    with patch("src.agent.graph.get_tools", return_value=[search_restaurants]), \
+            patch("src.agent.graph.load_chat_model", return_value=model):
+        graph = _build_graph("fake", ["search_restaurants"], "Plan trips.", "trip_planner")
+    thread = [
+        HumanMessage("A day in Barcelona"),
+        AIMessage("", tool_calls=[{"name": "search_restaurants", "args": {"location": "Barcelona"}, "id": "call_1"}]),
+        ToolMessage(render_places([LOLA]), tool_call_id="call_1"),
+    ]
+
+    custom, result = [], None
+    async for mode, chunk in graph.astream({"messages": thread}, stream_mode=["custom", "values"]):
+        if mode == "custom":
+            custom.append(chunk)
+        else:
+            result = chunk
+
+    expected = {**day, "description": "Dinner at `geo:Casa 'Lola'|ChIJlola`",
+                "accommodationSuggestions": [{"title": "Lola", "description": "Tapas", "link": LOLA.maps_uri}]}
+    final = result["messages"][-1]
+    assert LOLA_REF not in final.content
+    assert json.loads(final.content.split("```itinerary\n")[1].split("\n```")[0]) == expected
+    # The answer replaces the model's message rather than adding another one
+    assert [m.type for m in result["messages"]] == ["human", "ai", "tool", "ai"]
+    assert custom[0]["day"] == expected
@@ -0,0 +1,80 @@
+from google.maps import places_v1
+
+from src.agent.place_handles import place_handle
+from src.agent.place_records import (
+    NO_PLACES_FOUND,
+    PLACE_TABLE_HEADER,
+    PlaceRecord,
+    render_places,
+    to_records,
+)
+
+
+def make_place(**overrides):
+    fields = dict(
+        id="ChIJ123",
+        display_name={"text": "Casa Lola"},
+        formatted_address="Carrer de Example, 1, Barcelona",
+        google_maps_uri="https://maps.google.com/?cid=1",
+        location={"latitude": 41.382512345, "longitude": 2.176901234},
+    )
+    fields.update(overrides)
+    return places_v1.Place(**fields)
+
+
+def test_record_from_place():
+    record = PlaceRecord.from_place(make_place())
+
+    assert record == PlaceRecord(
+        "ChIJ123", "Casa Lola", "Carrer de Example, 1, Barcelona", "https://maps.google.com/?cid=1",
+        41.382512345, 2.176901234,
+    )
+
+
+def test_record_without_location():
+    record = PlaceRecord.from_place(places_v1.Place(id="x"))
+
+    assert record.lat is None and record.lng is None
+
+
+def test_render_places_table():
+    rendered = render_places(to_records([make_place()]))
+
+    assert rendered == "\n".join([
+        PLACE_TABLE_HEADER,
+        f"{place_handle('ChIJ123')}|Casa Lola|ChIJ123|Carrer de Example, 1, Barcelona|https://maps.google.com/?cid=1|41.38251,2.17690",
+    ])
+
+
+def test_render_places_caps_and_escapes_text_fields():
+    long_uri = "https://maps.google.com/?cid=" + "9" * 100
+    record = PlaceRecord("id", "A | B\nC", "x" * 50, long_uri)
+
+    row = render_places([record], max_field_chars=10).splitlines()[1]
+
+    assert row == f"{place_handle('id')}|A / B C|id|xxxxxxxxx…|{long_uri}|"
+
+
+def test_render_empty():
+    assert render_places([]) == NO_PLACES_FOUND
+
+
+def test_render_minimal_tier():
+    rendered = render_places(to_records([make_place()]), "minimal")
+
+    assert rendered == f"ref|name|id|maps\n{place_handle('ChIJ123')}|Casa Lola|ChIJ123|https://maps.google.com/?cid=1"
+
+
+def test_render_rich_tier():
+    place = make_place(
+        rating=4.56,
+        user_rating_count=1234,
+        price_level=places_v1.PriceLevel.PRICE_LEVEL_MODERATE,
+        current_opening_hours={"open_now": False},
+    )
+
+    header, row = render_places(to_records([place, make_place(id="other")]), "rich").splitlines()[:2]
+
+    assert header == "ref|name|id|address|maps|lat,lng|rating|price|open"
+    assert row.endswith("|4.6(1234)|$$|n")
+    assert render_places(to_records([make_place()]), "rich").endswith("|||")
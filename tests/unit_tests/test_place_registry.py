@@ -0,0 +1,133 @@
+import json
+from unittest.mock import AsyncMock, patch
+
+import pytest
+from google.maps import places_v1
+from langchain_core.language_models.fake_chat_models import GenericFakeChatModel
+from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
+from langgraph.checkpoint.memory import InMemorySaver
+
+from src.agent.graph import _build_graph
+from src.agent.place_handles import place_handle
+from src.agent.place_records import PlaceRecord
+from src.agent.place_registry import (
+    KNOWN_PLACES_HEADER,
+    merge_place_registry,
+    place_delta,
+    search_key,
+)
+from src.agent.tools import search_places, search_restaurants
+
+
+def record(n):
+    return PlaceRecord(f"id{n}", f"Place {n}", maps_uri=f"https://maps.google.com/?cid={n}", lat=38.7, lng=-9.1)
+
+
+def place(n):
+    return places_v1.Place(id=f"id{n}", display_name={"text": f"Place {n}"}, google_maps_uri=f"https://maps.google.com/?cid={n}")
+
+
+def tool_call(tool, args, state=None):
+    return {"type": "tool_call", "name": tool.name, "id": "call_1", "args": {**args, "state": state or {}}}
+
+
+class TestReducer:
+
+    def test_merge_keeps_newest_entries(self):
+        left = place_delta({"a": [record(1), record(2)]})
+        right = place_delta({"b": [record(2)]})
+        right["places"]["id2"][0] = "Renamed"
+
+        merged = merge_place_registry(left, right)
+
+        assert list(merged["places"]) == ["id1", "id2"]
+        assert merged["places"]["id2"][0] == "Renamed"
+        assert merged["searches"] == {"a": ["id1", "id2"], "b": ["id2"]}
+
+    def test_oldest_places_and_their_searches_are_evicted(self):
+        with patch("src.agent.place_registry._max_places", 2):
+            merged = merge_place_registry(place_delta({"a": [record(1)]}), place_delta({"b": [record(2), record(3)]}))
+
+        assert list(merged["places"]) == ["id2", "id3"]
+        assert merged["searches"] == {"b": ["id2", "id3"]}
+
+    def test_checkpoint_form_is_plain_json(self):
+        registry = merge_place_registry(None, place_delta({"a": [record(1)]}))
+
+        assert json.loads(json.dumps(registry)) == registry
+        assert registry["places"]["id1"] == ["Place 1", "https://maps.google.com/?cid=1", 38.7, -9.1]
+
+
+class TestTools:
+
+    @pytest.mark.asyncio
+    async def test_repeated_search_is_answered_from_the_registry(self):
+        args = {"location": "Lisbon", "cuisine": "seafood"}
+        with patch("src.agent.tools.text_search_restaurants", AsyncMock(return_value=[place(1)])) as search:
+            first = await search_restaurants.ainvoke(tool_call(search_restaurants, args))
+            second = await search_restaurants.ainvoke(
+                tool_call(search_restaurants, {**args, "location": " lisbon"}, {"places": first.artifact})
+            )
+
+        assert search.call_count == 1
+        assert first.artifact["searches"] == {search_key("search_restaurants", "Lisbon", "seafood", "standard"): ["id1"]}
+        assert second.content == f"{KNOWN_PLACES_HEADER}\n{place_handle('id1')}|Place 1"
+        assert second.artifact is None
+
+    @pytest.mark.asyncio
+    async def test_known_places_are_sent_by_reference(self):
+        registry = place_delta({"other": [record(1)]})
+        with patch("src.agent.tools.text_search_restaurants", AsyncMock(return_value=[place(1), place(2)])):
+            result = await search_restaurants.ainvoke(tool_call(search_restaurants, {"location": "Lisbon"}, {"places": registry}))
+
+        table, known = result.content.split("\n\n")
+        assert table.splitlines()[1].startswith(f"{place_handle('id2')}|Place 2|id2|")
+        assert known == f"{KNOWN_PLACES_HEADER}\n{place_handle('id1')}|Place 1"
+        assert list(result.artifact["places"]) == ["id1", "id2"]
+
+    @pytest.mark.asyncio
+    async def test_batched_search_only_fetches_new_categories(self):
+        registry = place_delta({search_key("search_places", "Lisbon", "hotels", "standard"): [record(1)]})
+        searches = [{"category": "hotels"}, {"category": "restaurants", "subcategory": "italian"}]
+        batch = AsyncMock(return_value={("restaurants", "italian"): [place(2)]})
+        with patch("src.agent.tools.text_search_places_batch", batch):
+            result = await search_places.ainvoke(
+                tool_call(search_places, {"location": "Lisbon", "searches": searches}, {"places": registry})
+            )
+
+        assert batch.call_args.args[1] == [("restaurants", "italian")]
+        assert result.content.startswith(f"## hotels\n{KNOWN_PLACES_HEADER}\n")
+        assert "## italian restaurants\nref|name|id" in result.content
+        assert list(result.artifact["searches"]) == [search_key("search_places", "Lisbon", "restaurants italian", "standard")]
+
+
+class ToolCallingModel(GenericFakeChatModel):
+    def bind_tools(self, tools, **kwargs):
+        return self
+
+
+@pytest.mark.asyncio
+async def test_follow_up_turn_reuses_places_from_earlier_turns():
+    lookup = {"name": "search_restaurants", "args": {"location": "Lisbon", "cuisine": "seafood"}}
+    model = ToolCallingModel(messages=iter([
+        AIMessage("", tool_calls=[{**lookup, "id": "call_1"}]),
+        AIMessage(f"Dinner at @{place_handle('id1')}"),
+        AIMessage("", tool_calls=[{**lookup, "id": "call_2"}]),
+        AIMessage(f"Swapped: dinner at @{place_handle('id1')} instead"),
+    ]))
+    with patch("src.agent.graph.get_tools", return_value=[search_restaurants]), \
+            patch("src.agent.graph.load_chat_model", return_value=model):
+        graph = _build_graph("fake", ["search_restaurants"], "Plan trips.", "trip_planner", stream_itinerary=False)
+    graph.checkpointer = InMemorySaver()
+    config = {"configurable": {"thread_id": "t1"}}
+
+    with patch("src.agent.tools.text_search_restaurants", AsyncMock(return_value=[place(1)])) as search:
+        await graph.ainvoke({"messages": [HumanMessage("Seafood dinner in Lisbon")]}, config)
+        result = await graph.ainvoke({"messages": [HumanMessage("Swap the dinner")]}, config)
+
+    assert search.call_count == 1
+    assert list(result["places"]["places"]) == ["id1"]
+    second_lookup = [m for m in result["messages"] if isinstance(m, ToolMessage)][-1]
+    assert second_lookup.content.startswith(KNOWN_PLACES_HEADER)
+    # Handles of places known only from the registry still expand
+    assert result["messages"][-1].content == "Swapped: dinner at https://maps.google.com/?cid=1 instead"
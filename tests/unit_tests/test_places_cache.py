@@ -0,0 +1,149 @@
+import asyncio
+
+import pytest
+
+from src.agent.metrics import Counters
+from src.agent.places_cache import PlacesSearchCache, make_cache_key
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def make_cache(**kwargs):
+    clock = FakeClock()
+    options = dict(
+        max_entries=10,
+        max_bytes=1000,
+        category_ttls={"hotels": 100},
+        default_ttl=10,
+        stale_ttl=50,
+        sizeof=len,
+        counters=Counters(),
+        clock=clock,
+    )
+    options.update(kwargs)
+    return PlacesSearchCache(**options), clock
+
+
+def fetcher(*values):
+    calls = []
+    remaining = list(values)
+
+    async def fetch():
+        calls.append(1)
+        return remaining.pop(0)
+
+    return fetch, calls
+
+
+def test_make_cache_key_normalizes_query():
+    assert make_cache_key("  Restaurants  in Barcelona ", 4, "mask") == make_cache_key(
+        "restaurants in barcelona", 4.0, "mask"
+    )
+    assert make_cache_key("hotels in Paris", 4.0, "a") != make_cache_key("hotels in Paris", 4.5, "a")
+    assert make_cache_key("hotels in Paris", 4.0, "a") != make_cache_key("hotels in Paris", 4.0, "b")
+
+
+class TestPlacesSearchCache:
+
+    @pytest.mark.asyncio
+    async def test_hit_and_miss(self):
+        cache, _ = make_cache()
+        fetch, calls = fetcher("abc")
+
+        assert await cache.get_or_fetch("k", "hotels", fetch) == "abc"
+        assert await cache.get_or_fetch("k", "hotels", fetch) == "abc"
+
+        assert len(calls) == 1
+        assert cache.stats() == {"misses": 1, "hits": 1, "entries": 1, "bytes": 3}
+
+    @pytest.mark.asyncio
+    async def test_per_category_ttl(self):
+        cache, clock = make_cache(stale_ttl=0)
+        hotel_fetch, hotel_calls = fetcher("h1", "h2")
+        other_fetch, other_calls = fetcher("r1", "r2")
+        await cache.get_or_fetch("hotel", "hotels", hotel_fetch)
+        await cache.get_or_fetch("restaurant", "restaurants", other_fetch)
+
+        clock.now = 50
+        assert await cache.get_or_fetch("hotel", "hotels", hotel_fetch) == "h1"
+        assert await cache.get_or_fetch("restaurant", "restaurants", other_fetch) == "r2"
+        assert cache.counters.get("expired") == 1
+
+    @pytest.mark.asyncio
+    async def test_stale_while_revalidate(self):
+        cache, clock = make_cache()
+        fetch, calls = fetcher("old", "new")
+        await cache.get_or_fetch("k", "restaurants", fetch)
+
+        clock.now = 20
+        assert await cache.get_or_fetch("k", "restaurants", fetch) == "old"
+        assert await cache.get_or_fetch("k", "restaurants", fetch) == "old"
+        await asyncio.sleep(0)
+
+        assert len(calls) == 2
+        assert await cache.get_or_fetch("k", "restaurants", fetch) == "new"
+        assert cache.counters.snapshot() == {"misses": 1, "stale_hits": 2, "refreshes": 1, "hits": 1}
+
+    @pytest.mark.asyncio
+    async def test_failed_refresh_keeps_stale_value(self):
+        cache, clock = make_cache()
+        await cache.get_or_fetch("k", "restaurants", fetcher("old")[0])
+
+        async def failing():
+            raise RuntimeError("boom")
+
+        clock.now = 20
+        assert await cache.get_or_fetch("k", "restaurants", failing) == "old"
+        await asyncio.sleep(0)
+        assert cache.counters.get("refresh_errors") == 1
+        assert await cache.get_or_fetch("k", "restaurants", fetcher("new")[0]) == "old"
+
+    @pytest.mark.asyncio
+    async def test_cancelled_refresh_can_be_retried(self):
+        cache, clock = make_cache()
+        await cache.get_or_fetch("k", "restaurants", fetcher("old")[0])
+        started = asyncio.Event()
+
+        async def hanging():
+            started.set()
+            await asyncio.Event().wait()
+
+        clock.now = 20
+        assert await cache.get_or_fetch("k", "restaurants", hanging) == "old"
+        await started.wait()
+        (task,) = cache._refresh_tasks
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+
+        fetch, calls = fetcher("new")
+        assert await cache.get_or_fetch("k", "restaurants", fetch) == "old"
+        await asyncio.sleep(0)
+        assert calls == [1]
+        assert await cache.get_or_fetch("k", "restaurants", fetch) == "new"
+
+    def test_lru_eviction_by_count(self):
+        cache, _ = make_cache(max_entries=2)
+        cache.put("a", "hotels", "1")
+        cache.put("b", "hotels", "2")
+        asyncio.run(cache.get_or_fetch("a", "hotels", fetcher()[0]))
+        cache.put("c", "hotels", "3")
+
+        assert len(cache) == 2
+        assert cache.counters.get("evictions") == 1
+        assert asyncio.run(cache.get_or_fetch("b", "hotels", fetcher("again")[0])) == "again"
+
+    def test_lru_eviction_by_bytes(self):
+        cache, _ = make_cache(max_bytes=10)
+        cache.put("a", "hotels", "x" * 6)
+        cache.put("b", "hotels", "y" * 6)
+        cache.put("huge", "hotels", "z" * 11)
+
+        assert len(cache) == 1
+        assert cache.total_bytes == 6
+        assert cache.counters.get("evictions") == 1
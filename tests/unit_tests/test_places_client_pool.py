@@ -0,0 +1,82 @@
+import asyncio
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+
+from src.agent.places_client_pool import PlacesClientPool
+
+
+def make_mock_client():
+    client = MagicMock()
+    client.transport.close = AsyncMock()
+    client.transport.grpc_channel.channel_ready = AsyncMock()
+    return client
+
+
+class TestPlacesClientPool:
+
+    @pytest.mark.asyncio
+    async def test_clients_are_reused_round_robin(self):
+        """Clients are built once per loop and handed out in turn"""
+        factory = MagicMock(side_effect=make_mock_client)
+        pool = PlacesClientPool(size=2, client_factory=factory)
+
+        clients = [pool.get_client() for _ in range(4)]
+
+        assert factory.call_count == 2
+        assert clients[0] is clients[2]
+        assert clients[1] is clients[3]
+        assert clients[0] is not clients[1]
+
+    def test_each_event_loop_gets_its_own_clients(self):
+        """gRPC aio channels are loop-bound, so loops must not share clients"""
+        pool = PlacesClientPool(size=1, client_factory=make_mock_client)
+
+        async def get():
+            return pool.get_client()
+
+        assert asyncio.run(get()) is not asyncio.run(get())
+
+    @pytest.mark.asyncio
+    async def test_warm_and_close(self):
+        """Warm-up waits for every channel and close shuts them down"""
+        pool = PlacesClientPool(size=3, client_factory=make_mock_client)
+        await pool.warm()
+        clients = [pool.get_client() for _ in range(3)]
+        for client in clients:
+            client.transport.grpc_channel.channel_ready.assert_awaited_once()
+
+        await pool.aclose()
+        for client in clients:
+            client.transport.close.assert_awaited_once()
+        assert pool.get_client() not in clients
+
+    def test_close_leaves_other_loops_clients_open(self):
+        """A loop's channels are closed on that loop, not dropped by another one"""
+        pool = PlacesClientPool(size=1, client_factory=make_mock_client)
+        other_loop = asyncio.new_event_loop()
+        try:
+            other = other_loop.run_until_complete(_get_client(pool))
+
+            asyncio.run(pool.aclose())
+
+            assert other_loop.run_until_complete(_get_client(pool)) is other
+            other_loop.run_until_complete(pool.aclose())
+            other.transport.close.assert_awaited_once()
+        finally:
+            other_loop.close()
+
+    @pytest.mark.asyncio
+    async def test_warm_tolerates_unreachable_channels(self):
+        """A channel that fails to connect is left to connect lazily"""
+        client = make_mock_client()
+        client.transport.grpc_channel.channel_ready.side_effect = ConnectionError("down")
+        pool = PlacesClientPool(size=1, client_factory=lambda: client)
+
+        await pool.warm()
+
+        assert pool.get_client() is client
+
+
+async def _get_client(pool):
+    return pool.get_client()
@@ -0,0 +1,91 @@
+import asyncio
+from unittest.mock import patch
+
+import pytest
+from langchain_core.language_models.fake_chat_models import GenericFakeChatModel
+from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
+from langchain_core.tools import tool
+
+from src.agent.graph import _build_graph
+from src.agent.prefetch import Prefetcher, TripRequest, parse_trip_request
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("5 days in Tokyo in April", TripRequest("Tokyo", "April", 5)),
+    ("Plan a trip to New York City for 3 nights, 2 adults, starting 2025-06-01", TripRequest("New York City", "2025-06-01", 4, 2)),
+    ("A week in Rio de Janeiro with my wife from March 14th", TripRequest("Rio de Janeiro", "March 14", 7, 2)),
+    ("in April I go to Lisbon with 4 friends", TripRequest("Lisbon", "April", None, 4)),
+    ("What should I pack?", None),
+])
+def test_parse_trip_request(text, expected):
+    assert parse_trip_request(text) == expected
+
+
+@tool
+async def search_hotels(location: str) -> str:
+    """Find hotels."""
+    await asyncio.sleep(0.05)
+    return f"hotels in {location}"
+
+
+@tool
+async def search_weather(location: str, date: str = None) -> str:
+    """Find the weather."""
+    await asyncio.sleep(0.05)
+    return f"weather in {location} on {date}"
+
+
+@tool
+def search_flights(origin: str, destination: str) -> str:
+    """Find flights."""
+    return "flights"
+
+
+class RecordingModel(GenericFakeChatModel):
+    inputs: list = []
+
+    def bind_tools(self, tools, **kwargs):
+        return self
+
+    def _generate(self, messages, *args, **kwargs):
+        self.inputs.append(messages)
+        return super()._generate(messages, *args, **kwargs)
+
+
+class TestPrefetcher:
+
+    @pytest.mark.asyncio
+    async def test_prefetches_selected_tools_concurrently(self):
+        prefetcher = Prefetcher([search_hotels, search_weather, search_flights])
+
+        request, *results = await prefetcher.aprefetch([HumanMessage("5 days in Tokyo in April")], {})
+
+        assert [call["name"] for call in request.tool_calls] == ["search_hotels", "search_weather"]
+        assert [m.content for m in results] == ["hotels in Tokyo", "weather in Tokyo on April"]
+        assert [m.tool_call_id for m in results] == [call["id"] for call in request.tool_calls]
+
+    @pytest.mark.asyncio
+    async def test_only_first_turn_is_prefetched(self):
+        prefetcher = Prefetcher([search_hotels])
+        later_turn = [HumanMessage("5 days in Tokyo"), AIMessage("Sure"), HumanMessage("And 2 days in Kyoto?")]
+
+        assert await prefetcher.aprefetch(later_turn, {}) == []
+        assert await prefetcher.aprefetch([HumanMessage("Hello!")], {}) == []
+
+
+class TestPrefetchGraph:
+
+    @pytest.mark.asyncio
+    async def test_model_receives_prefetched_results_as_tool_outputs(self):
+        model = RecordingModel(messages=iter([AIMessage("```itinerary\n{}\n```")]))
+        model.inputs = []
+        with patch("src.agent.graph.get_tools", return_value=[search_hotels, search_weather]), \
+                patch("src.agent.graph.load_chat_model", return_value=model):
+            graph = _build_graph("openai/gpt-4o-mini", ["search_hotels", "search_weather"], "Plan trips.", "planner", prefetch=True)
+
+        result = await graph.ainvoke({"messages": [HumanMessage("5 days in Tokyo in April")]})
+
+        first_model_input = model.inputs[0]
+        assert [type(m).__name__ for m in first_model_input] == ["SystemMessage", "HumanMessage", "AIMessage", "ToolMessage", "ToolMessage"]
+        assert [type(m).__name__ for m in result["messages"]] == ["HumanMessage", "AIMessage", "ToolMessage", "ToolMessage", "AIMessage"]
+        assert isinstance(result["messages"][2], ToolMessage) and result["messages"][2].content == "hotels in Tokyo"
@@ -0,0 +1,79 @@
+from pathlib import Path
+
+from src.agent.prompts import (
+    CITING_PLACES_INSTRUCTION,
+    ITINERARY_MARKDOWN_FORMAT,
+    TRIP_PLANNER_PROMPT_PREFIX,
+    TRIP_PLANNER_WITH_TOOLS_PROMPT,
+    compile_trip_planner_prompt,
+    compiled_prompt_tokens,
+    resolve_system_prompt,
+)
+
+ALL_TOOLS = ["search_weather", "search_flights", "search_hotels", "search_attractions", "search_restaurants", "search_places"]
+
+
+def test_variants_share_the_stable_prefix():
+    weather = compile_trip_planner_prompt(["search_weather"]).text
+    places = compile_trip_planner_prompt(["search_places", "search_hotels"]).text
+
+    assert weather.startswith(TRIP_PLANNER_PROMPT_PREFIX)
+    assert places.startswith(TRIP_PLANNER_PROMPT_PREFIX)
+    assert ITINERARY_MARKDOWN_FORMAT in TRIP_PLANNER_PROMPT_PREFIX
+
+
+def test_only_selected_tools_are_described():
+    text = compile_trip_planner_prompt(["search_weather", "search_flights"]).text
+
+    assert "search_weather:" in text and "search_flights:" in text
+    assert "search_hotels" not in text
+    assert "search_places" not in text
+    assert "name|id|address" not in text
+
+    places = compile_trip_planner_prompt(["search_restaurants"]).text
+    assert "name|id|address" in places
+
+
+def test_tool_order_does_not_create_new_variants():
+    first = compile_trip_planner_prompt(["search_hotels", "search_weather"])
+    second = compile_trip_planner_prompt(["search_weather", "search_hotels", "search_hotels"])
+
+    assert first is second
+
+
+def test_token_counts_are_reported():
+    compiled = compile_trip_planner_prompt(ALL_TOOLS)
+
+    assert 0 < compiled.prefix_tokens < compiled.tokens
+    assert compiled_prompt_tokens()[tuple(ALL_TOOLS)] == compiled.tokens
+
+
+def test_resolve_default_prompt_compiles_variant():
+    assert resolve_system_prompt(TRIP_PLANNER_WITH_TOOLS_PROMPT, ("search_weather",)) == (
+        compile_trip_planner_prompt(["search_weather"]).text
+    )
+
+
+def test_resolve_custom_prompt_expands_placeholder():
+    resolved = resolve_system_prompt("Plan a trip.\n***itinerary_markdown_format***", ("search_weather",))
+
+    # The format's examples cite places by handle, so the citing instruction comes with it
+    assert resolved == "Plan a trip.\n" + ITINERARY_MARKDOWN_FORMAT + "\n   Citing places:\n" + CITING_PLACES_INSTRUCTION
+
+
+def test_legacy_prompt_cites_places_by_handle():
+    resolved = resolve_system_prompt(TRIP_PLANNER_WITH_TOOLS_PROMPT + " ", ("search_hotels",))
+
+    assert "ref|name|id|address|maps|lat,lng" in resolved
+    assert "places.id" not in resolved
+    assert resolved.count(CITING_PLACES_INSTRUCTION) == 1
+
+
+def test_default_prompt_is_the_all_tools_variant():
+    assert TRIP_PLANNER_WITH_TOOLS_PROMPT == compile_trip_planner_prompt(ALL_TOOLS).text
+
+
+def test_earlier_default_prompt_is_still_compiled():
+    earlier = Path(__file__).with_name("earlier_default_prompt.txt").read_text()
+
+    assert resolve_system_prompt(earlier, ("search_weather",)) == compile_trip_planner_prompt(["search_weather"]).text
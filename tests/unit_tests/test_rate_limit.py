@@ -0,0 +1,158 @@
+import asyncio
+import time
+
+import httpx
+import pytest
+from google.api_core.exceptions import ResourceExhausted
+
+from src.agent.rate_limit import (
+    PRIORITY_BACKGROUND,
+    QuotaExceededError,
+    RateLimiter,
+    is_throttled,
+    request_priority,
+)
+from src.agent.tavily_client import TavilyClient, TavilyError
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.mark.asyncio
+async def test_bursts_then_paces_requests():
+    limiter = RateLimiter("test_pacing", rate=50, burst=2)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(limiter.acquire() for _ in range(7)))
+
+    # Two leave at once, the other five one token (20 ms) apart
+    assert 0.09 <= time.perf_counter() - start < 0.4
+    assert limiter.counters.get("requests") == 7
+    assert limiter.wait_timings.percentile(100) >= 90
+    assert limiter.depth_timings.percentile(100) >= 5
+    assert limiter.queue_depth == 0
+
+
+@pytest.mark.asyncio
+async def test_interactive_requests_go_first():
+    limiter = RateLimiter("test_priority", rate=50, burst=1)
+    await limiter.acquire()
+    order = []
+
+    async def request(label):
+        await limiter.acquire()
+        order.append(label)
+
+    with request_priority(PRIORITY_BACKGROUND):
+        background = [asyncio.create_task(request(f"refresh-{i}")) for i in range(2)]
+    interactive = asyncio.create_task(request("user"))
+    await asyncio.gather(*background, interactive)
+
+    assert order == ["user", "refresh-0", "refresh-1"]
+
+
+@pytest.mark.asyncio
+async def test_cancelled_caller_leaves_the_queue():
+    limiter = RateLimiter("test_cancel", rate=1, burst=1)
+    await limiter.acquire()
+
+    waiting = asyncio.create_task(limiter.acquire())
+    await asyncio.sleep(0.01)
+    assert limiter.queue_depth == 1
+    waiting.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await waiting
+
+    assert limiter.queue_depth == 0
+
+
+def test_aimd():
+    clock = FakeClock()
+    limiter = RateLimiter("test_aimd", rate=8, burst=8, min_rate=1, additive_increase=0.5, clock=clock)
+
+    limiter.on_throttled()
+    limiter.on_throttled()
+    assert limiter.rate == 4
+    assert limiter.stats()["tokens"] == 0
+
+    clock.now += 1.5
+    for _ in range(3):
+        limiter.on_throttled()
+        clock.now += 1.5
+    assert limiter.rate == 1
+
+    for _ in range(20):
+        limiter.on_success()
+    assert limiter.rate == 8
+    assert limiter.counters.get("throttled") == 5
+    assert limiter.counters.get("decreases") == 4
+
+
+@pytest.mark.asyncio
+async def test_throttled_requests_are_sent_again():
+    limiter = RateLimiter("test_retry", rate=100, burst=1)
+    responses = [ResourceExhausted("quota"), ResourceExhausted("quota"), "ok"]
+
+    async def call():
+        response = responses.pop(0)
+        if isinstance(response, Exception):
+            raise response
+        return response
+
+    assert await limiter.run(call) == "ok"
+    # Both rejections came from the same wave, so the rate was only halved once
+    assert limiter.rate == pytest.approx(50.1)
+
+    with pytest.raises(ResourceExhausted):
+        await limiter.run(lambda: call_raising(ResourceExhausted("quota")), throttle_retries=1)
+    with pytest.raises(ValueError):
+        await limiter.run(lambda: call_raising(ValueError("bad request")))
+    assert limiter.counters.get("throttled") == 4
+
+
+async def call_raising(error):
+    raise error
+
+
+@pytest.mark.asyncio
+async def test_daily_quota():
+    limiter = RateLimiter("test_quota", rate=100, burst=10, daily_quota=4, quota_reserve=0.5)
+
+    await limiter.acquire()
+    await limiter.acquire(priority=PRIORITY_BACKGROUND)
+    # Background requests leave the last half of the quota to users
+    with pytest.raises(QuotaExceededError):
+        await limiter.acquire(priority=PRIORITY_BACKGROUND)
+    await limiter.acquire()
+    await limiter.acquire()
+    with pytest.raises(QuotaExceededError, match="Daily quota of 4 test_quota requests used up"):
+        limiter.acquire_sync()
+
+    assert limiter.stats()["used_today"] == 4
+    assert limiter.counters.get("quota_rejected") == 2
+
+
+def test_is_throttled():
+    assert is_throttled(ResourceExhausted("quota"))
+    assert is_throttled(TavilyError(429, "Too Many Requests"))
+    assert not is_throttled(TavilyError(500, "Internal Server Error"))
+    assert not is_throttled(ValueError("bad"))
+
+
+def test_tavily_searches_are_rate_limited():
+    statuses = [429, 200]
+
+    def handler(request):
+        return httpx.Response(statuses.pop(0), json={"results": []})
+
+    limiter = RateLimiter("test_tavily", rate=100, burst=1)
+    client = TavilyClient(api_key="test-key", transport=httpx.MockTransport(handler), rate_limiter=limiter)
+
+    assert client.search("Weather in Lisbon") == {"results": []}
+    assert limiter.counters.get("throttled") == 1
+    assert limiter.counters.get("requests") == 2
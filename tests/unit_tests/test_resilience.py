@@ -0,0 +1,181 @@
+import asyncio
+import random
+import time
+from unittest.mock import AsyncMock, patch
+
+import pytest
+from google.api_core.exceptions import InvalidArgument, ServiceUnavailable
+from google.maps import places_v1
+
+from src.agent.google_places_client import text_search_restaurants
+from src.agent.metrics import Timings
+from src.agent.places_cache import get_places_cache
+from src.agent.rate_limit import RateLimiter
+from src.agent.resilience import Resilience, is_retryable
+
+
+def fast_latency(ms=10.0, samples=20):
+    timings = Timings()
+    for _ in range(samples):
+        timings.observe(ms)
+    return timings
+
+
+class SlowFirstCall:
+    """The first request hangs, later ones answer at once."""
+
+    def __init__(self):
+        self.started = 0
+        self.cancelled = 0
+
+    async def __call__(self, timeout):
+        self.started += 1
+        if self.started == 1:
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                self.cancelled += 1
+                raise
+        return f"answer {self.started}"
+
+
+@pytest.mark.asyncio
+async def test_slow_request_is_hedged():
+    resilience = Resilience("test_hedge", min_hedge_delay=0.05)
+    call = SlowFirstCall()
+
+    start = time.perf_counter()
+    result = await resilience.call(call, latency=fast_latency())
+
+    assert result == "answer 2"
+    assert time.perf_counter() - start < 0.5
+    await asyncio.sleep(0.01)
+    # The slow request is cancelled rather than left running
+    assert call.cancelled == 1
+    assert resilience.counters.get("hedge_wins") == 1
+
+
+@pytest.mark.asyncio
+async def test_no_hedging_without_enough_latency_samples():
+    resilience = Resilience("test_no_samples", attempt_timeout=0.2, max_attempts=1)
+
+    with pytest.raises(asyncio.TimeoutError):
+        await resilience.call(SlowFirstCall(), latency=fast_latency(samples=5))
+
+    assert resilience.counters.get("hedges") == 0
+    assert resilience.counters.get("timeouts") == 1
+
+
+@pytest.mark.asyncio
+async def test_hedge_budget_caps_extra_load():
+    resilience = Resilience("test_budget", hedge_budget=0.1, min_hedge_delay=0.01, attempt_timeout=0.1, max_attempts=1)
+
+    for _ in range(5):
+        with pytest.raises(asyncio.TimeoutError):
+            await resilience.call(lambda timeout: asyncio.sleep(10), latency=fast_latency())
+
+    # One hedge saved up at the start, and 0.5 earned since
+    assert resilience.counters.get("hedges") == 1
+    assert resilience.counters.get("hedges_denied") == 4
+
+
+@pytest.mark.asyncio
+async def test_transient_errors_are_retried_with_jittered_backoff():
+    resilience = Resilience("test_retry", base_backoff=0.01, rng=random.Random(1))
+    outcomes = [ServiceUnavailable("down"), ServiceUnavailable("down"), "ok"]
+    timeouts = []
+
+    async def call(timeout):
+        timeouts.append(timeout)
+        outcome = outcomes.pop(0)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+    assert await resilience.call(call) == "ok"
+    assert resilience.counters.get("retries") == 2
+    assert all(0 < timeout <= 5.0 for timeout in timeouts)
+
+    with pytest.raises(InvalidArgument):
+        await resilience.call(AsyncMock(side_effect=InvalidArgument("bad query")))
+    assert resilience.counters.get("retries") == 2
+
+
+def test_backoff_is_capped_full_jitter():
+    resilience = Resilience("test_backoff", base_backoff=0.1, max_backoff=1.0, rng=random.Random(0))
+
+    for retry in range(8):
+        ceiling = min(1.0, 0.1 * 2 ** retry)
+        samples = [resilience.backoff(retry) for _ in range(50)]
+        assert all(0 <= sample <= ceiling for sample in samples)
+        assert max(samples) > ceiling / 2
+
+
+@pytest.mark.asyncio
+async def test_deadline_bounds_the_whole_call():
+    resilience = Resilience("test_deadline", attempt_timeout=0.1, deadline=0.25, max_attempts=10, base_backoff=0.01)
+
+    start = time.perf_counter()
+    with pytest.raises(asyncio.TimeoutError):
+        await resilience.call(lambda timeout: asyncio.sleep(10))
+
+    assert time.perf_counter() - start < 0.4
+    assert 1 <= resilience.counters.get("retries") <= 2
+
+
+@pytest.mark.asyncio
+async def test_time_queued_under_the_rate_limit_is_not_a_timeout():
+    limiter = RateLimiter("test_queued", rate=20, burst=1)
+    resilience = Resilience("test_queued", attempt_timeout=0.1, deadline=0.2, min_hedge_delay=0.01)
+    latency = fast_latency()
+    sent_with = []
+
+    async def call(timeout):
+        sent_with.append(timeout)
+        return "ok"
+
+    # The last of ten callers queues for about 0.45 s, well past both deadlines
+    results = await asyncio.gather(*(resilience.call(call, latency=latency, limiter=limiter) for _ in range(10)))
+
+    assert results == ["ok"] * 10
+    assert all(timeout == pytest.approx(0.1) for timeout in sent_with)
+    assert resilience.counters.get("timeouts") == 0
+    assert resilience.counters.get("hedges") == 0
+
+
+@pytest.mark.asyncio
+async def test_hedge_waits_for_a_turn_of_its_own():
+    limiter = RateLimiter("test_hedge_turn", rate=10, burst=1)
+    resilience = Resilience("test_hedge_turn", min_hedge_delay=0.01)
+
+    result = await resilience.call(SlowFirstCall(), latency=fast_latency(), limiter=limiter)
+
+    assert result == "answer 2"
+    assert limiter.counters.get("requests") == 2
+    # The hedge left only once the bucket had refilled
+    assert limiter.wait_timings.percentile(100) >= 80
+
+
+def test_is_retryable():
+    assert is_retryable(ServiceUnavailable("down"))
+    assert is_retryable(asyncio.TimeoutError())
+    assert not is_retryable(InvalidArgument("bad"))
+    assert not is_retryable(ValueError("bad"))
+
+
+@pytest.mark.asyncio
+async def test_places_search_survives_a_transient_failure():
+    get_places_cache().clear()
+    mock_client = AsyncMock()
+    mock_client.search_text.side_effect = [
+        ServiceUnavailable("connection reset"),
+        places_v1.SearchTextResponse(places=[places_v1.Place(id="p1")]),
+    ]
+
+    with patch('src.agent.google_places_client.places_v1.PlacesAsyncClient', return_value=mock_client):
+        places = await text_search_restaurants("Resilient City")
+
+    assert [place.id for place in places] == ["p1"]
+    assert mock_client.search_text.call_count == 2
+    assert 0 < mock_client.search_text.call_args.kwargs["timeout"] <= 5.0
+    get_places_cache().clear()
@@ -0,0 +1,129 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from src.agent.metrics import Counters
+from src.agent.singleflight import SingleFlight, SyncSingleFlight
+
+
+class TestSingleFlight:
+
+    @pytest.mark.asyncio
+    async def test_concurrent_calls_share_one_upstream_call(self):
+        flights = SingleFlight(Counters())
+        calls = []
+
+        async def fetch():
+            calls.append(1)
+            await asyncio.sleep(0.01)
+            return "Lisbon hotels"
+
+        results = await asyncio.gather(*(flights.do("lisbon", fetch) for _ in range(10)))
+
+        assert results == ["Lisbon hotels"] * 10
+        assert len(calls) == 1
+        assert flights.counters.snapshot() == {"leaders": 1, "coalesced": 9}
+        assert len(flights) == 0
+
+    @pytest.mark.asyncio
+    async def test_different_keys_are_not_coalesced(self):
+        flights = SingleFlight(Counters())
+
+        async def fetch(value):
+            await asyncio.sleep(0)
+            return value
+
+        results = await asyncio.gather(flights.do("a", lambda: fetch("a")), flights.do("b", lambda: fetch("b")))
+
+        assert results == ["a", "b"]
+        assert flights.counters.get("leaders") == 2
+
+    @pytest.mark.asyncio
+    async def test_errors_propagate_to_every_caller(self):
+        flights = SingleFlight(Counters())
+
+        async def fetch():
+            await asyncio.sleep(0.01)
+            raise ValueError("upstream failed")
+
+        results = await asyncio.gather(*(flights.do("k", fetch) for _ in range(3)), return_exceptions=True)
+
+        assert all(isinstance(r, ValueError) for r in results)
+        assert len(flights) == 0
+
+    @pytest.mark.asyncio
+    async def test_cancelled_caller_does_not_cancel_others(self):
+        flights = SingleFlight(Counters())
+        release = asyncio.Event()
+
+        async def fetch():
+            await release.wait()
+            return "done"
+
+        first = asyncio.create_task(flights.do("k", fetch))
+        second = asyncio.create_task(flights.do("k", fetch))
+        await asyncio.sleep(0)
+        first.cancel()
+        await asyncio.sleep(0)
+        release.set()
+
+        assert await second == "done"
+        assert first.cancelled()
+
+    @pytest.mark.asyncio
+    async def test_last_cancelled_caller_cancels_upstream(self):
+        flights = SingleFlight(Counters())
+        started = asyncio.Event()
+        upstream_cancelled = asyncio.Event()
+
+        async def fetch():
+            started.set()
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                upstream_cancelled.set()
+                raise
+
+        caller = asyncio.create_task(flights.do("k", fetch))
+        await started.wait()
+        caller.cancel()
+        await asyncio.wait_for(upstream_cancelled.wait(), 1)
+
+        assert len(flights) == 0
+        assert flights.counters.get("cancelled") == 1
+
+
+class TestSyncSingleFlight:
+
+    def test_concurrent_threads_share_one_call(self):
+        flights = SyncSingleFlight(Counters())
+        calls = []
+        entered = threading.Event()
+
+        def fetch():
+            calls.append(1)
+            entered.set()
+            time.sleep(0.05)
+            return "weather"
+
+        with ThreadPoolExecutor(max_workers=5) as pool:
+            leader = pool.submit(flights.do, "k", fetch)
+            entered.wait()
+            followers = [pool.submit(flights.do, "k", fetch) for _ in range(4)]
+            results = [leader.result()] + [f.result() for f in followers]
+
+        assert results == ["weather"] * 5
+        assert len(calls) == 1
+
+    def test_errors_propagate_and_key_is_released(self):
+        flights = SyncSingleFlight(Counters())
+
+        def failing():
+            raise RuntimeError("boom")
+
+        with pytest.raises(RuntimeError):
+            flights.do("k", failing)
+        assert flights.do("k", lambda: "ok") == "ok"
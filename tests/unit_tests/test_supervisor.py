@@ -0,0 +1,148 @@
+from unittest.mock import patch
+
+import asyncio
+import time
+
+import pytest
+from langchain_core.language_models.fake_chat_models import GenericFakeChatModel
+from langchain_core.messages import AIMessage, HumanMessage
+from langgraph.graph import START, MessagesState, StateGraph
+
+from src.agent import supervisor
+
+
+class FakeToolModel(GenericFakeChatModel):
+    def bind_tools(self, tools, **kwargs):
+        return self
+
+
+def make_sub_agent(name, built):
+    async def answer(state):
+        await asyncio.sleep(0.1)
+        return {"messages": [AIMessage(f"{name} answer to: {state['messages'][-1].content}", name=name)]}
+
+    def factory(model):
+        built.append((name, model))
+        return (
+            StateGraph(MessagesState)
+            .add_node("answer", answer)
+            .add_edge(START, "answer")
+            .compile(name=name)
+        )
+    return factory
+
+
+@pytest.fixture
+def fake_supervisor(monkeypatch):
+    built = []
+    monkeypatch.setattr(supervisor, "SUB_AGENTS", {name: make_sub_agent(name, built) for name in supervisor.SUB_AGENTS})
+    monkeypatch.setattr(supervisor, "_sub_agents", {})
+    monkeypatch.setattr(supervisor, "_supervisors", {})
+    responses = iter([
+        AIMessage("", tool_calls=[{"name": "transfer_to_poi_agent", "args": {}, "id": "call_1"}]),
+        AIMessage("Here are the sights."),
+    ] * 2)
+    with patch("src.agent.supervisor.load_chat_model", return_value=FakeToolModel(messages=responses)):
+        yield built
+
+
+class TestSupervisor:
+
+    @pytest.mark.asyncio
+    async def test_building_the_supervisor_builds_no_sub_agents(self, fake_supervisor):
+        graph = await supervisor.create_trip_planner_supervisor({"configurable": {"model": "openai/gpt-4.1"}})
+
+        assert {"logistics_agent", "restaurant_finder", "poi_agent", "research_agent"} <= set(graph.nodes)
+        assert fake_supervisor == []
+
+    @pytest.mark.asyncio
+    async def test_only_sub_agents_handed_work_are_built_once(self, fake_supervisor):
+        config = {"configurable": {"model": "openai/gpt-4.1"}}
+        graph = await supervisor.create_trip_planner_supervisor(config)
+
+        for _ in range(2):
+            result = await graph.ainvoke({"messages": [HumanMessage("What should I see in Lisbon?")]}, config)
+            assert any(m.content.startswith("poi_agent answer") for m in result["messages"])
+
+        assert fake_supervisor == [("poi_agent", "openai/gpt-4.1")]
+
+    @pytest.mark.asyncio
+    async def test_supervisor_is_cached_per_model(self, fake_supervisor):
+        first = await supervisor.create_trip_planner_supervisor({"configurable": {"model": "openai/gpt-4.1"}})
+        second = await supervisor.create_trip_planner_supervisor({"configurable": {"model": "openai/gpt-4.1"}})
+        other = await supervisor.create_trip_planner_supervisor({"configurable": {"model": "openai/gpt-4o"}})
+
+        assert first is second
+        assert other is not first
+
+
+@pytest.fixture
+def fake_fan_out(monkeypatch):
+    built = []
+    monkeypatch.setattr(supervisor, "SUB_AGENTS", {name: make_sub_agent(name, built) for name in supervisor.SUB_AGENTS})
+    monkeypatch.setattr(supervisor, "_sub_agents", {})
+    monkeypatch.setattr(supervisor, "_supervisors", {})
+    responses = iter([
+        AIMessage("", tool_calls=[
+            {"name": "transfer_to_logistics_agent", "args": {"task": "Hotels in Lisbon"}, "id": "call_1"},
+            {"name": "transfer_to_restaurant_finder", "args": {"task": "Restaurants in Lisbon"}, "id": "call_2"},
+            {"name": "transfer_to_poi_agent", "args": {"task": "Sights in Lisbon"}, "id": "call_3"},
+            {"name": "transfer_to_nobody", "args": {"task": "?"}, "id": "call_4"},
+        ]),
+        AIMessage("# Trip Overview"),
+    ])
+    with patch("src.agent.supervisor.load_chat_model", return_value=FakeToolModel(messages=responses)):
+        yield built
+
+
+class TestFanOutSupervisor:
+
+    @pytest.mark.asyncio
+    async def test_sub_agents_run_in_parallel_and_results_are_assembled_once(self, fake_fan_out):
+        config = {"configurable": {"model": "openai/gpt-4.1", "supervisor_mode": "fan_out"}}
+        graph = await supervisor.create_trip_planner_supervisor(config)
+
+        start = time.perf_counter()
+        result = await graph.ainvoke({"messages": [HumanMessage("Plan 2 days in Lisbon")]}, config)
+        elapsed = time.perf_counter() - start
+
+        dispatch, *tool_results, final = result["messages"][1:]
+        assert [call["id"] for call in dispatch.tool_calls] == ["call_1", "call_2", "call_3"]
+        assert sorted((m.tool_call_id, m.content) for m in tool_results) == [
+            ("call_1", "logistics_agent answer to: Hotels in Lisbon"),
+            ("call_2", "restaurant_finder answer to: Restaurants in Lisbon"),
+            ("call_3", "poi_agent answer to: Sights in Lisbon"),
+        ]
+        assert final.content == "# Trip Overview"
+        assert sorted(name for name, _ in fake_fan_out) == ["logistics_agent", "poi_agent", "restaurant_finder"]
+        # Three 100ms agents side by side, not one after another
+        assert elapsed < 0.25
+
+    @pytest.mark.asyncio
+    async def test_failing_sub_agent_returns_an_error_result(self, fake_fan_out, monkeypatch):
+        def broken(model):
+            fake_fan_out.append(("restaurant_finder", model))
+            raise RuntimeError("places quota exceeded")
+
+        monkeypatch.setitem(supervisor.SUB_AGENTS, "restaurant_finder", broken)
+        config = {"configurable": {"supervisor_mode": "fan_out"}}
+        graph = await supervisor.create_trip_planner_supervisor(config)
+        errors = supervisor._counters.get("sub_agent_errors")
+
+        result = await graph.ainvoke({"messages": [HumanMessage("Plan 2 days in Lisbon")]}, config)
+
+        _, *tool_results, final = result["messages"][1:]
+        by_id = {message.tool_call_id: message for message in tool_results}
+        assert by_id["call_2"].status == "error"
+        assert by_id["call_2"].content == "Error: RuntimeError('places quota exceeded')\n Please fix your mistakes."
+        assert by_id["call_1"].status == by_id["call_3"].status == "success"
+        assert final.content == "# Trip Overview"
+        assert supervisor._counters.get("sub_agent_errors") == errors + 1
+
+    @pytest.mark.asyncio
+    async def test_modes_are_cached_separately(self, fake_fan_out):
+        sequential = await supervisor.create_trip_planner_supervisor({"configurable": {}})
+        fan_out = await supervisor.create_trip_planner_supervisor({"configurable": {"supervisor_mode": "fan_out"}})
+
+        assert sequential is not fan_out
+        assert "dispatch" in fan_out.nodes and "dispatch" not in sequential.nodes
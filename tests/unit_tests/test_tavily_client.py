@@ -0,0 +1,83 @@
+import json
+from unittest.mock import patch
+
+import httpx
+import pytest
+
+from src.agent.tavily_client import TavilyClient, TavilyError
+from src.agent.tools import search_flights, search_weather
+
+
+def make_client(requests, status_code=200, body=None):
+    def handler(request):
+        requests.append(request)
+        payload = body if body is not None else {"query": json.loads(request.content)["query"], "results": [{"title": "Sunny"}]}
+        return httpx.Response(status_code, json=payload)
+
+    return TavilyClient(api_key="test-key", transport=httpx.MockTransport(handler))
+
+
+class TestTavilyClient:
+
+    def test_search(self):
+        requests = []
+        client = make_client(requests)
+
+        result = client.search("Weather in Lisbon", max_results=2)
+
+        assert result["results"] == [{"title": "Sunny"}]
+        assert requests[0].url == "https://api.tavily.com/search"
+        assert requests[0].headers["Authorization"] == "Bearer test-key"
+        assert json.loads(requests[0].content) == {"query": "Weather in Lisbon", "max_results": 2, "topic": "general"}
+
+    def test_sync_client_is_shared(self):
+        client = make_client([])
+        client.search("a")
+        first = client.sync_client
+        client.search("b")
+        assert client.sync_client is first
+
+    @pytest.mark.asyncio
+    async def test_asearch_reuses_loop_client(self):
+        requests = []
+        client = make_client(requests)
+
+        await client.asearch("Weather in Lisbon")
+        first = client.async_client
+        await client.asearch("Weather in Porto")
+
+        assert client.async_client is first
+        assert len(requests) == 2
+        await client.aclose()
+
+    @pytest.mark.asyncio
+    async def test_error_status(self):
+        client = make_client([], status_code=432, body={"detail": {"error": "Plan limit exceeded"}})
+
+        with pytest.raises(TavilyError, match="Error 432: Plan limit exceeded"):
+            await client.asearch("Weather in Lisbon")
+
+
+class TestTavilyTools:
+
+    def test_sync_invoke(self):
+        requests = []
+        with patch("src.agent.tools.get_tavily_client", return_value=make_client(requests)):
+            result = search_weather.invoke({"location": "Lisbon", "date": "2025-05-01"})
+
+        assert result["query"] == "Weather in Lisbon on 2025-05-01"
+
+    @pytest.mark.asyncio
+    async def test_async_invoke(self):
+        requests = []
+        with patch("src.agent.tools.get_tavily_client", return_value=make_client(requests)):
+            result = await search_flights.ainvoke({"origin": "Lisbon", "destination": "Paris", "dates": ""})
+
+        assert result["query"] == "Flight options from Lisbon to Paris"
+
+    @pytest.mark.asyncio
+    async def test_errors_are_reported_to_the_model(self):
+        with patch("src.agent.tools.get_tavily_client", return_value=make_client([], status_code=500, body={})):
+            result = await search_weather.ainvoke({"location": "Lisbon"})
+
+        assert result == {"error": "Error 500: Internal Server Error"}
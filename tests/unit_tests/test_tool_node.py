@@ -0,0 +1,140 @@
+import asyncio
+import time
+from typing import Annotated
+
+import pytest
+from langchain_core.messages import AIMessage
+from langchain_core.tools import tool
+from langgraph.prebuilt import InjectedState
+
+from src.agent.tool_node import ConcurrentToolNode
+
+running = {"hotels": 0, "max_hotels": 0}
+
+
+@tool
+async def slow_hotels(location: str) -> str:
+    """Find hotels."""
+    running["hotels"] += 1
+    running["max_hotels"] = max(running["max_hotels"], running["hotels"])
+    await asyncio.sleep(0.05)
+    running["hotels"] -= 1
+    return f"hotels in {location}"
+
+
+@tool
+async def slow_restaurants(location: str) -> str:
+    """Find restaurants."""
+    await asyncio.sleep(0.05)
+    return f"restaurants in {location}"
+
+
+@tool
+async def hanging_weather(location: str) -> str:
+    """Find the weather."""
+    await asyncio.sleep(10)
+    return "sunny"
+
+
+@tool
+def broken_flights(origin: str) -> str:
+    """Find flights."""
+    raise RuntimeError("upstream unavailable")
+
+
+@tool
+def blocking_weather(location: str) -> str:
+    """Find the weather."""
+    time.sleep(0.05)
+    return f"sunny in {location}"
+
+
+@tool
+async def known_places(location: str, places: Annotated[dict, InjectedState("places")] = None) -> str:
+    """List the places found so far."""
+    return f"{location}: {sorted(places or {})}"
+
+
+def ai_message(*calls):
+    return AIMessage("", tool_calls=[{"name": name, "args": args, "id": f"call_{i}"} for i, (name, args) in enumerate(calls)])
+
+
+TOOLS = [slow_hotels, slow_restaurants, hanging_weather, broken_flights, blocking_weather, known_places]
+
+
+class TestConcurrentToolNode:
+
+    @pytest.mark.asyncio
+    async def test_calls_run_concurrently_in_order(self):
+        node = ConcurrentToolNode(TOOLS)
+        message = ai_message(("slow_restaurants", {"location": "Lisbon"}), ("slow_hotels", {"location": "Lisbon"}))
+
+        start = time.perf_counter()
+        result = await node.ainvoke({"messages": [message]})
+        elapsed = time.perf_counter() - start
+
+        assert [m.content for m in result["messages"]] == ["restaurants in Lisbon", "hotels in Lisbon"]
+        assert [m.tool_call_id for m in result["messages"]] == ["call_0", "call_1"]
+        assert elapsed < 0.09
+
+    @pytest.mark.asyncio
+    async def test_per_tool_concurrency_limit(self):
+        running["max_hotels"] = 0
+        node = ConcurrentToolNode(TOOLS, max_concurrency={"slow_hotels": 2})
+        message = ai_message(*[("slow_hotels", {"location": f"city {i}"}) for i in range(5)])
+
+        result = await node.ainvoke({"messages": [message]})
+
+        assert len(result["messages"]) == 5
+        assert running["max_hotels"] == 2
+
+    @pytest.mark.asyncio
+    async def test_failures_and_timeouts_keep_partial_results(self):
+        node = ConcurrentToolNode(TOOLS, timeouts={"hanging_weather": 0.05})
+        message = ai_message(
+            ("hanging_weather", {"location": "Lisbon"}),
+            ("broken_flights", {"origin": "Lisbon"}),
+            ("slow_hotels", {"location": "Lisbon"}),
+            ("unknown_tool", {}),
+        )
+
+        weather, flights, hotels, unknown = (await node.ainvoke({"messages": [message]}))["messages"]
+
+        assert weather.status == "error" and "timed out" in weather.content
+        assert flights.status == "error" and "upstream unavailable" in flights.content
+        assert hotels.status == "success" and hotels.content == "hotels in Lisbon"
+        assert unknown.status == "error" and "not a valid tool" in unknown.content
+
+    def test_sync_invoke(self):
+        node = ConcurrentToolNode(TOOLS)
+
+        result = node.invoke({"messages": [ai_message(("slow_hotels", {"location": "Porto"}))]})
+
+        assert result["messages"][0].content == "hotels in Porto"
+
+    @pytest.mark.asyncio
+    async def test_sync_invoke_inside_a_running_loop(self):
+        node = ConcurrentToolNode(TOOLS, timeouts={"hanging_weather": 0.05})
+        message = ai_message(
+            ("blocking_weather", {"location": "Porto"}),
+            ("blocking_weather", {"location": "Faro"}),
+            ("slow_hotels", {"location": "Porto"}),
+            ("hanging_weather", {"location": "Porto"}),
+        )
+
+        start = time.perf_counter()
+        porto, faro, hotels, hanging = node.invoke({"messages": [message]})["messages"]
+
+        assert time.perf_counter() - start < 0.5
+        assert (porto.content, faro.content, hotels.content) == ("sunny in Porto", "sunny in Faro", "hotels in Porto")
+        assert hanging.status == "error" and "timed out" in hanging.content
+
+    @pytest.mark.asyncio
+    async def test_graph_state_is_injected(self):
+        node = ConcurrentToolNode(TOOLS)
+        state = {"messages": [ai_message(("known_places", {"location": "Lisbon"}))], "places": {"id1": {}}}
+
+        (sync_result,) = node.invoke(state)["messages"]
+        (async_result,) = (await node.ainvoke(state))["messages"]
+
+        assert sync_result.content == async_result.content == "Lisbon: ['id1']"
@@ -0,0 +1,95 @@
+from unittest.mock import AsyncMock, patch
+
+import pytest
+from google.maps import places_v1
+from langchain_core.messages import AIMessage, HumanMessage
+
+from src.agent.google_places_client import SearchArea
+from src.agent.place_handles import place_handle
+from src.agent.place_records import PlaceRecord
+from src.agent.place_registry import chosen_hotel, place_delta, search_key
+from src.agent.tools import search_attractions, search_hotels, search_restaurants
+
+
+def place():
+    return places_v1.Place(id="p1", display_name={"text": "Hotel"}, rating=4.2)
+
+
+class TestFieldMaskTiers:
+
+    @pytest.mark.asyncio
+    async def test_default_tier(self):
+        with patch("src.agent.tools.text_search_hotels", AsyncMock(return_value=[place()])) as search:
+            result = await search_hotels.ainvoke({"location": "Lisbon"})
+
+        assert search.call_args.kwargs["tier"] == "standard"
+        assert result.startswith("ref|name|id|address|maps|lat,lng\n")
+
+    @pytest.mark.asyncio
+    async def test_assistant_and_per_tool_tiers(self):
+        config = {
+            "configurable": {
+                "places_field_mask_tier": "minimal",
+                "tool_field_mask_tiers": {"search_restaurants": "rich"},
+            }
+        }
+        with patch("src.agent.tools.text_search_hotels", AsyncMock(return_value=[place()])) as hotels, \
+                patch("src.agent.tools.text_search_restaurants", AsyncMock(return_value=[place()])) as restaurants:
+            hotel_result = await search_hotels.ainvoke({"location": "Lisbon"}, config=config)
+            restaurant_result = await search_restaurants.ainvoke({"location": "Lisbon"}, config=config)
+
+        assert hotels.call_args.kwargs["tier"] == "minimal"
+        assert hotel_result.startswith("ref|name|id|maps\n")
+        assert restaurants.call_args.kwargs["tier"] == "rich"
+        assert "|4.2|" in restaurant_result
+
+
+def record(n, lat, lng):
+    return PlaceRecord(f"h{n}", f"Hotel {n}", maps_uri=f"https://maps.google.com/?cid={n}", lat=lat, lng=lng)
+
+
+def tool_call(tool, args, state):
+    return {"type": "tool_call", "name": tool.name, "id": "call_1", "args": {**args, "state": state}}
+
+
+class TestNearbySearch:
+
+    @staticmethod
+    def state(*messages):
+        registry = place_delta({
+            search_key("search_hotels", "Lisbon", None, "standard"): [record(1, 38.71, -9.14), record(2, 38.70, -9.20)],
+        })
+        return {"places": registry, "messages": list(messages)}
+
+    @pytest.mark.asyncio
+    async def test_centred_on_the_chosen_hotel(self):
+        state = self.state(AIMessage("Stay at https://maps.google.com/?cid=2 or https://maps.google.com/?cid=1"))
+        with patch("src.agent.tools.text_search_restaurants", AsyncMock(return_value=[place()])) as search:
+            result = await search_restaurants.ainvoke(tool_call(search_restaurants, {"location": "Lisbon"}, state))
+            await search_restaurants.ainvoke(tool_call(search_restaurants, {"location": "Porto"}, state))
+
+        assert search.call_args_list[0].kwargs["area"] == SearchArea(38.7, -9.2, 1500, "bias")
+        assert result.content.startswith(f"Results within 1500 m of {place_handle('h2')} ranked first\n")
+        # No hotel has been found for Porto
+        assert search.call_args_list[1].kwargs["area"] is None
+
+    @pytest.mark.asyncio
+    async def test_centred_on_a_day_of_places(self):
+        state = self.state(HumanMessage("We booked Hotel 1"))
+        near = f"{place_handle('h1')}, @{place_handle('h2')}"
+        with patch("src.agent.tools.text_search_attractions", AsyncMock(return_value=[place()])) as search:
+            result = await search_attractions.ainvoke(tool_call(
+                search_attractions, {"location": "Lisbon", "near": near, "restrict_to_area": True}, state,
+            ))
+
+        area = search.call_args.kwargs["area"]
+        assert (area.latitude, area.longitude, area.mode) == (38.705, -9.17, "restrict")
+        # Wide enough to take in both places
+        assert area.radius_meters == pytest.approx(2660, abs=10)
+        assert " near 38.705,-9.17 " in list(result.artifact["searches"])[0]
+
+    def test_hotel_named_by_the_user_is_chosen(self):
+        state = self.state(AIMessage("Stay at https://maps.google.com/?cid=2"), HumanMessage("We booked hotel 1 instead"))
+
+        assert chosen_hotel(state, " lisbon") == "h1"
+        assert chosen_hotel(self.state(), "Lisbon") is None